@@ -18,15 +18,16 @@ from discord.ext import tasks
 from discord.ext.commands import Bot
 
 from initbot_chat.commands import commands
-from initbot_chat.commands.utils import refresh_all_live_inis
+from initbot_chat.commands.utils import guild_scope, refresh_all_live_inis
 from initbot_chat.config import CFG
 from initbot_core.config import CORE_CFG
-from initbot_core.data.character import CharacterData, is_eligible_for_pruning
+from initbot_core.data.character import CharacterData
 from initbot_core.models.roll import contains_dice_rolls, render_dice_rolls_in_text
 from initbot_core.notify import send_notification
 from initbot_core.security import get_vulnerabilities, is_high_severity
+from initbot_core.state.async_state import AsyncState, run_on_state
 from initbot_core.state.factory import create_state_from_source
-from initbot_core.state.state import State
+from initbot_core.state.state import DEFAULT_SCOPE, State
 
 _log = logging.getLogger(__name__)
 
@@ -116,20 +117,28 @@ async def _fetch_member(
 
 
 async def _send_pruning_notifications(
-    guilds: Sequence[discord.Guild], state: State
+    guilds: Sequence[discord.Guild], state: State | AsyncState
 ) -> None:
     """Send pruning reminder DMs to all players with eligible characters."""
     threshold = CORE_CFG.prune_threshold_days
-    by_player_id: dict[int, list] = defaultdict(list)
-    for cdi in state.characters.get_all():
-        if is_eligible_for_pruning(cdi, threshold):
-            by_player_id[cdi.player_id].append(cdi)
-
-    for player_id, chars in by_player_id.items():
-        player = state.players.get_from_id(player_id)
-        if player.discord_id is None:
+
+    scopes = {DEFAULT_SCOPE} | {guild_scope(guild) for guild in guilds}
+
+    def get_eligible(state: State) -> dict[int, tuple[int | None, list]]:
+        by_player_id: dict[int, list] = defaultdict(list)
+        for scope in scopes:
+            for cdi in state.scoped(scope).characters.find_prunable(threshold):
+                by_player_id[cdi.player_id].append(cdi)
+        return {
+            player_id: (state.players.get_from_id(player_id).discord_id, chars)
+            for player_id, chars in by_player_id.items()
+        }
+
+    eligible = await run_on_state(state, get_eligible)
+    for player_id, (discord_id, chars) in eligible.items():
+        if discord_id is None:
             continue
-        member = await _fetch_member(guilds, player.discord_id)
+        member = await _fetch_member(guilds, discord_id)
         if not member:
             _log.warning(
                 "Could not find guild member for pruning notification: player_id=%d",
@@ -144,6 +153,14 @@ async def _pruning_notification() -> None:
     await _send_pruning_notifications(bot.guilds, bot.initbot_state)  # type: ignore
 
 
+@tasks.loop(seconds=CORE_CFG.state_maintenance_interval or 60 * 60)
+async def _state_maintenance() -> None:
+    try:
+        await run_on_state(bot.initbot_state, lambda s: s.maintain(), in_thread=True)  # type: ignore
+    except Exception:  # pylint: disable=broad-except
+        _log.exception("Data store maintenance failed")
+
+
 def _print_channel_diagnostic() -> None:
     print(
         "\nERROR: 'alert_channel_id' refers to an unknown channel.\n"
@@ -174,6 +191,9 @@ async def on_ready() -> None:
     if not _pruning_notification.is_running():
         _pruning_notification.start()
 
+    if CORE_CFG.state_maintenance_interval and not _state_maintenance.is_running():
+        _state_maintenance.start()
+
     if not CFG.alert_channel_id:
         _log.warning(
             "Security vulnerability checks are disabled. "
@@ -255,6 +275,9 @@ async def _bot_close() -> None:
         _udp_transport.close()
         _udp_transport = None
     await _original_bot_close()
+    state = getattr(bot, "initbot_state", None)
+    if state is not None:
+        state.close()
 
 
 def run() -> None:
@@ -263,6 +286,7 @@ def run() -> None:
     bot.initbot_state = create_state_from_source(  # type: ignore
         CFG.state,
         on_change=lambda: send_notification(CFG.notify_host, CFG.notify_port),
+        asynchronous=CORE_CFG.state_worker_thread,
     )
     bot.last_inis_message = {}  # type: ignore  # dict[int, LiveInisRef], keyed by guild id or DM channel id
     bot.setup_hook = _setup_hook  # type: ignore  # module-level function shadows bound method
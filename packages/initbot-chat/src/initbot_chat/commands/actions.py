@@ -3,14 +3,17 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
 import logging
+from collections.abc import Sequence
 from typing import Final
 
 from discord.ext import commands
 
-from initbot_chat.commands.utils import send_in_parts, sync_player
+from initbot_chat.commands.utils import run_in_guild, send_in_parts, sync_player
+from initbot_core.data.character import CharacterData
 from initbot_core.models.roll import contains_dice_rolls, render_dice_rolls_in_text
+from initbot_core.state.state import State
 
-_SUBCOMMANDS: Final = frozenset({"list", "add", "update", "remove"})
+_SUBCOMMANDS: Final = frozenset({"list", "add", "update", "remove", "move"})
 
 
 def _split_actions_args(
@@ -25,13 +28,14 @@ def _split_actions_args(
         if token.lower() in _SUBCOMMANDS:
             return list(args[:i]), token.lower(), list(args[i + 1 :])
     raise ValueError(
-        "Usage: `$actions [character] list|add|update|remove [args]`\n"
+        "Usage: `$actions [character] list|add|update|remove|move [args]`\n"
         "Example: `$actions add Mel attacks at d20+3 for 2d6 damage`"
     )
 
 
-async def _list_actions(ctx: commands.Context, char_name: str) -> None:
-    templates = ctx.bot.initbot_state.character_actions.get_all_for_character(char_name)
+async def _list_actions(
+    ctx: commands.Context, char_name: str, templates: Sequence[str]
+) -> None:
     if not templates:
         await ctx.send(f"{char_name} has no actions.", delete_after=5)
         return
@@ -45,7 +49,7 @@ async def _list_actions(ctx: commands.Context, char_name: str) -> None:
 
 
 @commands.command(
-    name="actions", usage="[character name] list|add|update|remove [args]"
+    name="actions", usage="[character name] list|add|update|remove|move [args]"
 )
 async def actions_cmd(ctx: commands.Context, *args: str) -> None:
     """Manage character actions.
@@ -60,6 +64,7 @@ async def actions_cmd(ctx: commands.Context, *args: str) -> None:
     - add TEMPLATE — add a new action template containing at least one dice roll
     - update NR TEMPLATE — change the template of the action with the given action number.
     - remove NR — delete the action with the given action number.
+    - move NR TO — move the action with the given action number to action number TO.
 
     You can specify a character name or omit it.
     If you manage only a single character, omit it: `$actions list`
@@ -68,16 +73,21 @@ async def actions_cmd(ctx: commands.Context, *args: str) -> None:
     The character name can be an abbreviation.
     For example, if the full name of a character is "Mediocre Mel", then typing "med" is sufficient: `$actions med list`
     """
-    player = sync_player(ctx.bot.initbot_state, ctx)
-    state = ctx.bot.initbot_state
     name_tokens, subcommand, sub_args = _split_actions_args(args)
-    cdi = state.characters.get_from_tokens(
-        name_tokens, ctx.author.name, player_id=player.id
-    )
-    char_actions = state.character_actions
+
+    def get_character(state: State) -> CharacterData:
+        player = sync_player(state, ctx)
+        return state.characters.get_from_tokens(
+            name_tokens, ctx.author.name, player_id=player.id
+        )
+
+    cdi = await run_in_guild(ctx, get_character)
 
     if subcommand == "list":
-        await _list_actions(ctx, cdi.name)
+        templates = await run_in_guild(
+            ctx, lambda s: s.character_actions.get_all_for_character(cdi.name)
+        )
+        await _list_actions(ctx, cdi.name, templates)
 
     elif subcommand == "add":
         if not sub_args:
@@ -89,7 +99,9 @@ async def actions_cmd(ctx: commands.Context, *args: str) -> None:
             raise ValueError(
                 f"Template must contain at least one dice roll (e.g. d20, 2d6+3). Got: '{template}'"
             )
-        index = char_actions.add(cdi.name, template)
+        index = await run_in_guild(
+            ctx, lambda s: s.character_actions.add(cdi.name, template)
+        )
         await ctx.send(f"Added action #{index} for {cdi.name}.", delete_after=5)
 
     elif subcommand == "update":
@@ -100,14 +112,24 @@ async def actions_cmd(ctx: commands.Context, *args: str) -> None:
             raise ValueError(
                 f"Template must contain at least one dice roll (e.g. d20, 2d6+3). Got: '{template}'"
             )
-        char_actions.update(cdi.name, int(sub_args[0]), template)
+        idx = int(sub_args[0])
+        await run_in_guild(
+            ctx, lambda s: s.character_actions.update(cdi.name, idx, template)
+        )
         await ctx.send(f"Updated action #{sub_args[0]} for {cdi.name}.", delete_after=5)
 
     elif subcommand == "remove":
         if not sub_args or not sub_args[0].isdigit():
             raise ValueError("Usage: `$actions [character] remove IDX`")
         idx = int(sub_args[0])
-        templates = char_actions.get_all_for_character(cdi.name)
+
+        def remove_action(state: State) -> Sequence[str]:
+            templates = state.character_actions.get_all_for_character(cdi.name)
+            if 1 <= idx <= len(templates):
+                state.character_actions.remove(cdi.name, idx)
+            return templates
+
+        templates = await run_in_guild(ctx, remove_action)
         if not 1 <= idx <= len(templates):
             count = len(templates)
             noun = "action" if count == 1 else "actions"
@@ -116,12 +138,22 @@ async def actions_cmd(ctx: commands.Context, *args: str) -> None:
                 delete_after=10,
             )
             return
-        char_actions.remove(cdi.name, idx)
         await ctx.send(
             f"Removed {cdi.name}'s action #{sub_args[0]} ({templates[idx - 1]})",
             delete_after=5,
         )
 
+    elif subcommand == "move":
+        if len(sub_args) != 2 or not all(arg.isdigit() for arg in sub_args):
+            raise ValueError("Usage: `$actions [character] move IDX TO`")
+        from_idx, to_idx = int(sub_args[0]), int(sub_args[1])
+        await run_in_guild(
+            ctx, lambda s: s.character_actions.move(cdi.name, from_idx, to_idx)
+        )
+        await ctx.send(
+            f"Moved {cdi.name}'s action #{from_idx} to #{to_idx}.", delete_after=5
+        )
+
 
 @commands.command(name="act", usage="[character name] NR")
 async def act_cmd(ctx: commands.Context, *args: str) -> None:
@@ -139,22 +171,22 @@ async def act_cmd(ctx: commands.Context, *args: str) -> None:
     The character name can be an abbreviation.
     For example, if the full name of a character is "Mediocre Mel", then typing "med" is sufficient: `$act med 1`
     """
-    player = sync_player(ctx.bot.initbot_state, ctx)
-    state = ctx.bot.initbot_state
+    list_only = not args or not args[-1].isdigit()
+    name_tokens = list(args) if list_only else list(args[:-1])
 
-    if not args or not args[-1].isdigit():
+    def get_actions(state: State) -> tuple[CharacterData, Sequence[str]]:
+        player = sync_player(state, ctx)
         cdi = state.characters.get_from_tokens(
-            list(args), ctx.author.name, player_id=player.id
+            name_tokens, ctx.author.name, player_id=player.id
         )
-        await _list_actions(ctx, cdi.name)
+        return cdi, state.character_actions.get_all_for_character(cdi.name)
+
+    cdi, templates = await run_in_guild(ctx, get_actions)
+    if list_only:
+        await _list_actions(ctx, cdi.name, templates)
         return
 
     index = int(args[-1])
-    cdi = state.characters.get_from_tokens(
-        list(args[:-1]), ctx.author.name, player_id=player.id
-    )
-
-    templates = state.character_actions.get_all_for_character(cdi.name)
     if not 1 <= index <= len(templates):
         raise ValueError(
             f"{cdi.name} has {len(templates)} action(s); index {index} is out of range."
@@ -2,28 +2,31 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
+import functools
 import logging
 import time
-from collections.abc import Iterable
+from collections.abc import AsyncIterator, Iterable, Sequence
 from datetime import datetime
+from typing import Final
 
 from discord.ext import commands
 
 from initbot_chat.commands.utils import (
     player_name,
     refresh_live_inis,
+    run_in_guild,
     send_in_parts,
     sync_player,
 )
 from initbot_core.character_name import validate_character_name
 from initbot_core.config import CORE_CFG
-from initbot_core.data.character import (
-    CharacterData,
-    is_eligible_for_pruning,
-)
+from initbot_core.data.character import CharacterData
+from initbot_core.data.player import PlayerData
 from initbot_core.models.roll import parse_dice_spec
 from initbot_core.state.state import State
 
+_CHARS_PAGE_SIZE: Final[int] = 100
+
 
 def characters(state: State) -> Iterable[CharacterData]:
     return state.characters.get_all()
@@ -50,7 +53,6 @@ async def init_dice(ctx: commands.Context, *args: str) -> None:
 
     The character name can be an abbreviation.
     """
-    player = sync_player(ctx.bot.initbot_state, ctx)
     tokens = list(args)
     if not tokens:
         raise ValueError(
@@ -67,12 +69,18 @@ async def init_dice(ctx: commands.Context, *args: str) -> None:
             f"'{spec}' is not a valid dice spec. Use a format like d20, d20+3, 2d6-1, or d20adv."
         ) from exc
 
-    cdi: CharacterData = ctx.bot.initbot_state.characters.get_from_tokens(
-        name, create=len(name) > 0, player_id=player.id
-    )
-    cdi.initiative_dice = spec
-    cdi.last_used = int(time.time())
-    ctx.bot.initbot_state.characters.update_and_store(cdi)
+    def set_dice(state: State) -> CharacterData:
+        player = sync_player(state, ctx)
+        with state.transaction():
+            cdi: CharacterData = state.characters.get_from_tokens(
+                name, create=len(name) > 0, player_id=player.id
+            )
+            cdi.initiative_dice = spec
+            cdi.last_used = int(time.time())
+            state.characters.update_and_store(cdi)
+        return cdi
+
+    cdi = await run_in_guild(ctx, set_dice)
     await ctx.send(f"{cdi.name}'s initiative dice is now {spec}", delete_after=3)
 
 
@@ -89,7 +97,6 @@ async def rename(ctx: commands.Context, *args: str) -> None:
 
     The new name needs to be one word (no spaces).
     """
-    player = sync_player(ctx.bot.initbot_state, ctx)
     tokens = list(args)
     if not tokens:
         raise ValueError(
@@ -98,12 +105,15 @@ async def rename(ctx: commands.Context, *args: str) -> None:
     new_name = tokens[-1]
     old_tokens = tokens[:-1]
     validate_character_name(new_name)
-    cdi: CharacterData = ctx.bot.initbot_state.characters.get_from_tokens(
-        old_tokens, create=False, player_id=player.id
-    )
-    old_name = cdi.name
-    ctx.bot.initbot_state.character_actions.rename_character(old_name, new_name)
-    cdi = ctx.bot.initbot_state.characters.rename_and_store(cdi, new_name)
+
+    def rename_character(state: State) -> tuple[str, CharacterData]:
+        player = sync_player(state, ctx)
+        cdi: CharacterData = state.characters.get_from_tokens(
+            old_tokens, create=False, player_id=player.id
+        )
+        return cdi.name, state.characters.rename_and_store(cdi, new_name)
+
+    old_name, cdi = await run_in_guild(ctx, rename_character)
     await ctx.send(f"Renamed {old_name} to {cdi.name}", delete_after=3)
     await refresh_live_inis(ctx)
 
@@ -118,12 +128,14 @@ async def remove(ctx: commands.Context, *args: str) -> None:
     The character name can be an abbreviation.
     For example, if the full name of a character is "Mediocre Mel", then typing "Med" is sufficient.
     That's as long as no other character name starts with "Med"."""
-    player = sync_player(ctx.bot.initbot_state, ctx)
-    cdi: CharacterData = ctx.bot.initbot_state.characters.get_from_tokens(
-        args, player_id=player.id
-    )
-    ctx.bot.initbot_state.character_actions.remove_all_for_character(cdi.name)
-    ctx.bot.initbot_state.characters.remove_and_store(cdi)
+
+    def remove_character(state: State) -> CharacterData:
+        player = sync_player(state, ctx)
+        cdi: CharacterData = state.characters.get_from_tokens(args, player_id=player.id)
+        state.characters.remove_and_store(cdi)
+        return cdi
+
+    cdi = await run_in_guild(ctx, remove_character)
     await ctx.send(f"Removed character {cdi.name}", delete_after=3)
     await refresh_live_inis(ctx)
 
@@ -131,14 +143,34 @@ async def remove(ctx: commands.Context, *args: str) -> None:
 @commands.command()
 async def chars(ctx: commands.Context) -> None:
     """Displays all characters known to the bot."""
-    sync_player(ctx.bot.initbot_state, ctx)
-    state = ctx.bot.initbot_state
-    players_by_id = {p.id: p for p in state.players.get_all()}
-    parts = (
-        f"- {idx}: **{cdi.name}** (_{players_by_id[cdi.player_id].name}_)\n"
-        for idx, cdi in enumerate(state.characters.get_all())
-    )
-    await send_in_parts(ctx, parts)
+
+    def get_page(
+        state: State, after_name: str | None
+    ) -> tuple[Sequence[CharacterData], dict[int, PlayerData]]:
+        if after_name is None:
+            sync_player(state, ctx)
+        page = state.characters.page(after_name, _CHARS_PAGE_SIZE)
+        return page, {
+            cdi.player_id: state.players.get_from_id(cdi.player_id) for cdi in page
+        }
+
+    async def parts() -> AsyncIterator[str]:
+        # One page at a time, so that neither the roster nor the reply is held
+        # in memory at once.
+        idx = 0
+        after_name = None
+        while True:
+            page, players_by_id = await run_in_guild(
+                ctx, functools.partial(get_page, after_name=after_name)
+            )
+            for cdi in page:
+                yield f"- {idx}: **{cdi.name}** (_{players_by_id[cdi.player_id].name}_)\n"
+                idx += 1
+            if len(page) < _CHARS_PAGE_SIZE:
+                return
+            after_name = page[-1].name
+
+    await send_in_parts(ctx, parts())
 
 
 @commands.command()
@@ -151,16 +183,20 @@ async def char(ctx: commands.Context, *args: str) -> None:
     The character name can be an abbreviation.
     For example, if the full name of a character is "Mediocre Mel", then typing "Med" is sufficient.
     That's as long as no other character name starts with "Med"."""
-    player = sync_player(ctx.bot.initbot_state, ctx)
-    state = ctx.bot.initbot_state
-    cdi: CharacterData = state.characters.get_from_tokens(args, player_id=player.id)
+
+    def get_character(state: State) -> tuple[CharacterData, str]:
+        player = sync_player(state, ctx)
+        cdi: CharacterData = state.characters.get_from_tokens(args, player_id=player.id)
+        return cdi, player_name(state, cdi)
+
+    cdi, owner_name = await run_in_guild(ctx, get_character)
     last_used_str = (
         datetime.fromtimestamp(cdi.last_used).strftime("%Y-%m-%d %H:%M")
         if cdi.last_used is not None
         else "never"
     )
     lines = [
-        f"**{cdi.name}** ({player_name(state, cdi)})",
+        f"**{cdi.name}** ({owner_name})",
         f"Initiative dice: {cdi.initiative_dice or '(not set)'}",
         f"Initiative: {cdi.initiative if cdi.initiative is not None else '(not rolled)'}",
         f"Last used: {last_used_str}",
@@ -174,20 +210,24 @@ async def unused(ctx: commands.Context, *args: str) -> None:
 
     By default, this command only lists the requesting player's own characters.
     Pass 'all_players' to list eligible characters belonging to any player."""
-    player = sync_player(ctx.bot.initbot_state, ctx)
-    state = ctx.bot.initbot_state
     show_all = "all_players" in args
     threshold = CORE_CFG.prune_threshold_days
-    eligible = [
-        cdi
-        for cdi in state.characters.get_all()
-        if is_eligible_for_pruning(cdi, threshold)
-        and (show_all or cdi.player_id == player.id)
-    ]
+
+    def get_unused(
+        state: State,
+    ) -> tuple[list[CharacterData], dict[int, PlayerData]]:
+        player = sync_player(state, ctx)
+        eligible = list(
+            state.characters.find_prunable(threshold, None if show_all else player.id)
+        )
+        return eligible, {
+            cdi.player_id: state.players.get_from_id(cdi.player_id) for cdi in eligible
+        }
+
+    eligible, players_by_id = await run_in_guild(ctx, get_unused)
     if not eligible:
         await ctx.send("You don't seem to have any unused characters.", delete_after=5)
         return
-    players_by_id = {p.id: p for p in state.players.get_all()}
     parts = (
         f"- **{cdi.name}** (_{players_by_id[cdi.player_id].name}_)\n"
         for cdi in eligible
@@ -202,22 +242,18 @@ async def prune(ctx: commands.Context, *args: str) -> None:
     By default, only prunes the requesting player's own characters.
     Pass 'all_players' to prune unused characters belonging to any player.
     Replies with the names of the pruned characters."""
-    player = sync_player(ctx.bot.initbot_state, ctx)
     show_all = "all_players" in args
     threshold = CORE_CFG.prune_threshold_days
-    to_prune = [
-        cdi
-        for cdi in ctx.bot.initbot_state.characters.get_all()
-        if is_eligible_for_pruning(cdi, threshold)
-        and (show_all or cdi.player_id == player.id)
-    ]
-    for cdi in to_prune:
-        ctx.bot.initbot_state.character_actions.remove_all_for_character(cdi.name)
-        ctx.bot.initbot_state.characters.remove_and_store(cdi)
-    if not to_prune:
+
+    def prune_characters(state: State) -> Sequence[str]:
+        player = sync_player(state, ctx)
+        return state.characters.prune_many(threshold, None if show_all else player.id)
+
+    pruned = await run_in_guild(ctx, prune_characters)
+    if not pruned:
         await ctx.send("No characters to prune.", delete_after=5)
         return
-    await ctx.send("Pruned: " + ", ".join(cdi.name for cdi in to_prune))
+    await ctx.send("Pruned: " + ", ".join(pruned))
     await refresh_live_inis(ctx)
 
 
@@ -231,17 +267,23 @@ async def touch(ctx: commands.Context, *args: str) -> None:
     The character name can be an abbreviation.
     For example, if the full name of a character is "Mediocre Mel", then typing "Med" is sufficient.
     That's as long as no other character name starts with "Med"."""
-    player = sync_player(ctx.bot.initbot_state, ctx)
     tokens: tuple = args if args else ((),)
-    touched = []
-    for token in tokens:
-        name_arg = (token,) if token else ()
-        cdi: CharacterData = ctx.bot.initbot_state.characters.get_from_tokens(
-            name_arg, player_id=player.id
-        )
-        cdi.last_used = int(time.time())
-        ctx.bot.initbot_state.characters.update_and_store(cdi)
-        touched.append(cdi.name)
+
+    def touch_characters(state: State) -> list[str]:
+        player = sync_player(state, ctx)
+        touched = []
+        with state.transaction():
+            for token in tokens:
+                name_arg = (token,) if token else ()
+                cdi: CharacterData = state.characters.get_from_tokens(
+                    name_arg, player_id=player.id
+                )
+                cdi.last_used = int(time.time())
+                state.characters.update_and_store(cdi)
+                touched.append(cdi.name)
+        return touched
+
+    touched = await run_in_guild(ctx, touch_characters)
     await ctx.send(
         "Marked as recently used: " + ", ".join(touched),
         delete_after=3,
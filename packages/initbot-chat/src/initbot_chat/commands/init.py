@@ -6,17 +6,21 @@ import logging
 import time
 from datetime import datetime
 
+from discord import Embed
 from discord.ext import commands
 
 from initbot_chat.commands.utils import (
     LiveInisRef,
     _live_inis_key,
     build_inis_embed,
+    guild_scope,
     refresh_live_inis,
+    run_in_guild,
     sync_player,
 )
 from initbot_core.data.character import CharacterData
 from initbot_core.models.roll import parse_dice_spec
+from initbot_core.state.state import State
 from initbot_core.utils import is_int
 
 _log = logging.getLogger(__name__)
@@ -43,7 +47,6 @@ async def init(ctx: commands.Context, *args: str) -> None:
 
     Thus, in the shortest (and most common case), one can simply use the command `$init` by itself to automatically roll and set a character's initiative.
     """
-    player = sync_player(ctx.bot.initbot_state, ctx)
     tokens = list(args)
     if len(tokens) > 4:
         raise ValueError("Too long")
@@ -59,20 +62,26 @@ async def init(ctx: commands.Context, *args: str) -> None:
     else:
         initiative = None
         name = tokens
-    cdi: CharacterData = ctx.bot.initbot_state.characters.get_from_tokens(
-        name, create=len(name) > 0, player_id=player.id
-    )
-    if initiative is None:
-        if cdi.initiative_dice is not None:
-            initiative = parse_dice_spec(cdi.initiative_dice).roll_one()
-        else:
-            raise ValueError(
-                f"No initiative dice set for {cdi.name}. Use `$init_dice {cdi.name} d20+3` first."
-            )
 
-    cdi.initiative = initiative
-    cdi.last_used = int(datetime.now().timestamp())
-    ctx.bot.initbot_state.characters.update_and_store(cdi)
+    def set_initiative(state: State) -> CharacterData:
+        player = sync_player(state, ctx)
+        with state.transaction():
+            cdi: CharacterData = state.characters.get_from_tokens(
+                name, create=len(name) > 0, player_id=player.id
+            )
+            if initiative is not None:
+                cdi.initiative = initiative
+            elif cdi.initiative_dice is not None:
+                cdi.initiative = parse_dice_spec(cdi.initiative_dice).roll_one()
+            else:
+                raise ValueError(
+                    f"No initiative dice set for {cdi.name}. Use `$init_dice {cdi.name} d20+3` first."
+                )
+            cdi.last_used = int(datetime.now().timestamp())
+            state.characters.update_and_store(cdi)
+        return cdi
+
+    cdi = await run_in_guild(ctx, set_initiative)
 
     await ctx.send(f"{cdi.name}'s initiative is now {cdi.initiative}", delete_after=3)
     await refresh_live_inis(ctx)
@@ -87,14 +96,19 @@ async def inis(ctx: commands.Context) -> None:
 
     Only characters whose initiative was set within the last 24 hours are shown.
     """
-    sync_player(ctx.bot.initbot_state, ctx)
-    embed = build_inis_embed(ctx.bot.initbot_state)
+
+    def get_embed(state: State) -> Embed:
+        sync_player(state, ctx)
+        return build_inis_embed(state)
+
+    embed = await run_in_guild(ctx, get_embed)
     msg = await ctx.send(embed=embed)
     if msg is not None:
         key = _live_inis_key(ctx)
         ctx.bot.last_inis_message[key] = LiveInisRef(
             message=msg,
             posted_at=int(time.time()),
+            scope=guild_scope(ctx.guild),
         )
         _log.debug("Stored live inis ref for key %d, message %d", key, msg.id)
 
@@ -4,10 +4,10 @@
 
 import logging
 import time
-from collections.abc import Callable, Iterable
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Final, Protocol
+from typing import Any, Final, Protocol, TypeVar
 
 import discord
 from discord import Embed, Message
@@ -17,10 +17,13 @@ from discord.ext.commands import Context
 from initbot_core.config import CORE_CFG
 from initbot_core.data.character import CharacterData
 from initbot_core.data.player import PlayerData
-from initbot_core.state.state import State
+from initbot_core.state.async_state import AsyncState, run_on_state
+from initbot_core.state.state import DEFAULT_SCOPE, State
 
 _log = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 _LIVE_INIS_TTL_SECONDS: Final[int] = 28800  # 8 hours
 
 
@@ -28,11 +31,12 @@ _LIVE_INIS_TTL_SECONDS: Final[int] = 28800  # 8 hours
 class LiveInisRef:
     message: Message
     posted_at: int
+    scope: int = DEFAULT_SCOPE
 
 
 class _BotProtocol(Protocol):
     last_inis_message: dict[int, LiveInisRef]
-    initbot_state: State
+    initbot_state: State | AsyncState
 
 
 def _web_configured(_ctx: commands.Context) -> bool:
@@ -46,6 +50,21 @@ def _web_configured(_ctx: commands.Context) -> bool:
 web_configured: Final[Callable[..., Any]] = commands.check(_web_configured)
 
 
+def guild_scope(guild: discord.Guild | None) -> int:
+    """Return the scope of a guild's characters; see CORE_CFG.state_guild_scopes."""
+    if guild is None or not CORE_CFG.state_guild_scopes:
+        return DEFAULT_SCOPE
+    return guild.id
+
+
+async def run_in_guild(ctx: Context, fn: Callable[[State], T]) -> T:
+    """Execute ``fn(state)`` with the bot's State scoped to the guild of ``ctx``."""
+    scope = guild_scope(ctx.guild)
+    return await run_on_state(
+        ctx.bot.initbot_state, lambda state: fn(state.scoped(scope))
+    )
+
+
 def sync_player(state: State, ctx: Context) -> PlayerData:
     """Upsert the player record for the Discord user."""
     return state.players.upsert_discord(discord_id=ctx.author.id, name=ctx.author.name)
@@ -56,12 +75,26 @@ def player_name(state: State, cdi: CharacterData) -> str:
     return state.players.get_from_id(cdi.player_id).name
 
 
+async def _aiter_parts(parts: Iterable[str] | AsyncIterable[str]) -> AsyncIterator[str]:
+    if isinstance(parts, AsyncIterable):
+        async for txt in parts:
+            yield txt
+    else:
+        for txt in parts:
+            yield txt
+
+
 async def send_in_parts(
     ctx: Context,
-    parts: Iterable[str],
+    parts: Iterable[str] | AsyncIterable[str],
 ) -> None:
+    """Send parts joined into as few messages below Discord's 2000 characters as possible.
+
+    Parts may come from an async iterator, e.g. one that reads them page by page,
+    and are consumed as the messages are sent.
+    """
     msg: str = ""
-    for txt in parts:
+    async for txt in _aiter_parts(parts):
         if len(msg) + len(txt) >= 2000:
             await ctx.send(msg)
             msg = ""
@@ -72,20 +105,13 @@ async def send_in_parts(
 
 def build_inis_embed(state: State) -> Embed:
     """Build the initiative-order embed from current state."""
-
-    def has_recent_initiative(cdi: CharacterData) -> bool:
-        return (
-            cdi.initiative is not None
-            and cdi.last_used is not None
-            and cdi.last_used > int(datetime.now().timestamp()) - 24 * 3600
-        )
-
-    sorted_characters = sorted(
-        filter(has_recent_initiative, state.characters.get_all()),
-        key=lambda c: c.initiative or 0,
-        reverse=True,
+    sorted_characters = state.characters.get_by_initiative(
+        int(datetime.now().timestamp()) - 24 * 3600
     )
-    players_by_id = {p.id: p for p in state.players.get_all()}
+    players_by_id = {
+        cdi.player_id: state.players.get_from_id(cdi.player_id)
+        for cdi in sorted_characters
+    }
     desc: str = "\n".join(
         f"{cdi.initiative}: **{cdi.name}** (*{players_by_id[cdi.player_id].name}*)"
         for cdi in sorted_characters
@@ -98,8 +124,12 @@ async def _refresh_for_guild(bot: _BotProtocol, guild_id: int) -> None:
     if ref is None or time.time() - ref.posted_at >= _LIVE_INIS_TTL_SECONDS:
         bot.last_inis_message.pop(guild_id, None)
         return
+    scope = ref.scope
     try:
-        await ref.message.edit(embed=build_inis_embed(bot.initbot_state))
+        embed = await run_on_state(
+            bot.initbot_state, lambda state: build_inis_embed(state.scoped(scope))
+        )
+        await ref.message.edit(embed=embed)
         _log.debug("Live inis embed updated for guild %d", guild_id)
     except discord.NotFound:
         _log.warning("Live inis message %d not found; clearing ref", ref.message.id)
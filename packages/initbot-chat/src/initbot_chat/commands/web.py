@@ -8,16 +8,22 @@ from discord.ext import commands
 
 from initbot_chat.commands.utils import sync_player, web_configured
 from initbot_core.config import CORE_CFG
+from initbot_core.state.async_state import run_on_state
+from initbot_core.state.state import State
 
 
 @commands.command()
 @web_configured
 async def web(ctx: commands.Context) -> None:
     """Sends a personal, single-use web app login link via DM."""
-    player = sync_player(ctx.bot.initbot_state, ctx)
-    if player.discord_id is None:
-        raise RuntimeError("sync_player returned a player without a discord_id")
-    token = ctx.bot.initbot_state.web_login_tokens.create(discord_id=player.discord_id)
+
+    def create_token(state: State) -> str:
+        player = sync_player(state, ctx)
+        if player.discord_id is None:
+            raise RuntimeError("sync_player returned a player without a discord_id")
+        return state.web_login_tokens.create(discord_id=player.discord_id)
+
+    token = await run_on_state(ctx.bot.initbot_state, create_token)
     if CORE_CFG.web_hostname:
         url = f"https://{CORE_CFG.web_hostname}/{CORE_CFG.web_url_path_prefix}/{token}/"
     else:
@@ -22,7 +22,7 @@ class Settings(BaseSettings):
     )
     state: str = Field(
         default="sqlite:./initbot.db",
-        description="The data store URI. Format: 'sqlite:/path/to/file.db'. The default creates initbot.db in the current working directory.",
+        description="The data store URI. Format: 'sqlite:/path/to/file.db', or 'memory:' to keep all data in memory of a single process, optionally snapshotted with 'memory:/path/to/snapshot.json'. The default creates initbot.db in the current working directory.",
     )
     max_inline_roll_message_length: int = Field(
         default=90,
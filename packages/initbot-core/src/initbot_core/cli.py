@@ -0,0 +1,261 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+"""Back up, compact, export and import an SQLite data store while the bot and web app run.
+
+Run with: initbot-state backup initbot.db initbot-backup.db
+          initbot-state compact initbot.db initbot-compact.db
+          initbot-state export initbot.db > initbot.jsonl
+          initbot-state import new.db < initbot.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import sqlite3
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any, Final, TextIO
+
+from initbot_core.state.sql import SCHEMA_VERSION, SqlState
+
+# Tables in the order in which they are exported and imported. Login tokens live for
+# a minute and the change log is rebuilt by triggers on import, so neither is exported.
+_EXPORTED_TABLES: Final[tuple[str, ...]] = (
+    "_sqlplayerdata",
+    "_sqlcharacterdata",
+    "_sqlcharacteraction",
+    "_sqlsessionsecret",
+)
+_EXPORT_FORMAT: Final[int] = 1
+_DEFAULT_BACKUP_PAGES: Final[int] = 256
+_DEFAULT_BACKUP_PAUSE: Final[float] = 0.05
+# Restarts of a stepwise backup after which it copies everything in one step.
+_MAX_BACKUP_RESTARTS: Final[int] = 10
+
+
+class _BackupRestartedTooOften(Exception):
+    pass
+
+
+def _sqlite_path(source: str) -> Path:
+    """Accept a plain path or a STATE value like 'sqlite:/data/app.sqlite'."""
+    state_type, _, state_source = source.partition(":")
+    if state_type == "sqlite" and state_source:
+        return Path(state_source)
+    if state_type == "memory":
+        raise SystemExit(f"Not an SQLite data store: {source!r}")
+    return Path(source)
+
+
+def _connect_read_only(path: Path) -> sqlite3.Connection:
+    if not path.exists():
+        raise SystemExit(f"Data store does not exist: {str(path)!r}")
+    return sqlite3.connect(
+        f"{path.absolute().as_uri()}?mode=ro", uri=True, isolation_level=None
+    )
+
+
+def backup(
+    source: Path,
+    target: Path,
+    pages: int = _DEFAULT_BACKUP_PAGES,
+    pause: float = _DEFAULT_BACKUP_PAUSE,
+) -> None:
+    """Copy the database to target, which must not exist, with the backup API.
+
+    Copies ``pages`` pages per step and sleeps ``pause`` seconds between steps.
+    The source is only locked during a step, so writers get in between; if one
+    does, SQLite restarts the copy from a consistent snapshot. So that steady
+    writes cannot restart it forever, the copy is finally done in a single step
+    after _MAX_BACKUP_RESTARTS restarts; in WAL mode writers do not wait for it.
+    """
+    if target.exists():
+        raise FileExistsError(target)
+    src = _connect_read_only(source)
+    dst = sqlite3.connect(target)
+    try:
+        restarts = 0
+        last_remaining: int | None = None
+
+        def progress(_status: int, remaining: int, total: int) -> None:
+            nonlocal restarts, last_remaining
+            print(f"\r{total - remaining}/{total} pages", end="", file=sys.stderr)
+            if last_remaining is not None and remaining >= last_remaining:
+                restarts += 1
+                if restarts >= _MAX_BACKUP_RESTARTS:
+                    raise _BackupRestartedTooOften
+            last_remaining = remaining
+            if remaining:
+                time.sleep(pause)
+
+        try:
+            src.backup(dst, pages=pages, progress=progress)
+        except _BackupRestartedTooOften:
+            print(
+                f"\nRestarted {_MAX_BACKUP_RESTARTS} times, copying in one step",
+                end="",
+                file=sys.stderr,
+            )
+            src.backup(dst)
+        print(file=sys.stderr)
+    finally:
+        dst.close()
+        src.close()
+
+
+def compact(source: Path, target: Path) -> None:
+    """Write a compacted copy of the database to target, which must not exist.
+
+    Uses SqlState.vacuum_into(), which reads one consistent snapshot while the bot
+    and web app keep writing. Swap the copy in while they are stopped.
+    """
+    if not source.exists():
+        raise SystemExit(f"Data store does not exist: {str(source)!r}")
+    state = SqlState(f"sqlite:{source}", cache=False, readers=0)
+    try:
+        state.vacuum_into(target)
+    finally:
+        state.close()
+
+
+def _rows(db: sqlite3.Connection, table: str) -> Iterator[dict[str, Any]]:
+    cursor = db.execute(f"SELECT * FROM {table}")  # noqa: S608
+    columns = [description[0] for description in cursor.description]
+    for row in cursor:
+        yield dict(zip(columns, row, strict=True))
+
+
+def export_jsonl(source: Path, out: TextIO) -> int:
+    """Write the data store to out as JSON Lines; return the number of rows.
+
+    The first line records the format and schema version. Every further line is
+    one row, e.g. ``{"table": "_sqlplayerdata", "row": {"id": 1, ...}}``. Rows are
+    streamed from one read transaction, so the export is consistent.
+    """
+    db = _connect_read_only(source)
+    count = 0
+    try:
+        db.execute("BEGIN")
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        out.write(json.dumps({"format": _EXPORT_FORMAT, "schema": version}) + "\n")
+        for table in _EXPORTED_TABLES:
+            for row in _rows(db, table):
+                out.write(json.dumps({"table": table, "row": row}) + "\n")
+                count += 1
+        db.execute("COMMIT")
+    finally:
+        db.close()
+    return count
+
+
+def _columns(db: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+
+
+def import_jsonl(target: Path, lines: Iterable[str]) -> int:
+    """Create the data store target from a JSON Lines export; return the number of rows.
+
+    Consecutive rows of one table are inserted with a single executemany() call
+    that consumes them lazily, so memory use does not grow with the export.
+    """
+    if target.exists():
+        raise FileExistsError(target)
+    records = (json.loads(line) for line in lines if line.strip())
+    header = next(records, None)
+    if header is None or header.get("format") != _EXPORT_FORMAT:
+        raise ValueError("Not an initbot-state export")
+    if header.get("schema") != SCHEMA_VERSION:
+        raise ValueError(
+            f"Export has schema version {header.get('schema')},"
+            f" this release expects {SCHEMA_VERSION}"
+        )
+    SqlState(f"sqlite:{target}").close()
+    db = sqlite3.connect(target, isolation_level=None)
+    count = 0
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        for table, group in itertools.groupby(records, lambda record: record["table"]):
+            if table not in _EXPORTED_TABLES:
+                raise ValueError(f"Unknown table in export: {table!r}")
+            first = next(group)
+            columns = list(first["row"])
+            unknown = set(columns) - _columns(db, table)
+            if unknown:
+                raise ValueError(f"Unknown columns of {table}: {sorted(unknown)}")
+            cursor = db.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)})"  # noqa: S608
+                f" VALUES ({', '.join('?' * len(columns))})",
+                (
+                    tuple(record["row"][column] for column in columns)
+                    for record in itertools.chain((first,), group)
+                ),
+            )
+            count += cursor.rowcount
+        db.execute("COMMIT")
+    except BaseException:
+        db.execute("ROLLBACK")
+        db.close()
+        target.unlink()
+        raise
+    db.close()
+    return count
+
+
+def run(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="initbot-state", description=__doc__.splitlines()[0]
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    backup_parser = commands.add_parser(
+        "backup", help="copy the database without blocking writers"
+    )
+    backup_parser.add_argument("source", help="database file or STATE value")
+    backup_parser.add_argument("target", type=Path, help="new database file")
+    backup_parser.add_argument(
+        "--pages",
+        type=int,
+        default=_DEFAULT_BACKUP_PAGES,
+        help="pages copied per step (default: %(default)s)",
+    )
+    backup_parser.add_argument(
+        "--pause",
+        type=float,
+        default=_DEFAULT_BACKUP_PAUSE,
+        help="seconds to sleep between steps (default: %(default)s)",
+    )
+    compact_parser = commands.add_parser(
+        "compact", help="write a copy of the database without free pages"
+    )
+    compact_parser.add_argument("source", help="database file or STATE value")
+    compact_parser.add_argument("target", type=Path, help="new database file")
+    export_parser = commands.add_parser(
+        "export", help="write the data store as JSON Lines to stdout"
+    )
+    export_parser.add_argument("source", help="database file or STATE value")
+    import_parser = commands.add_parser(
+        "import", help="create a data store from JSON Lines on stdin"
+    )
+    import_parser.add_argument("target", help="new database file or STATE value")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "backup":
+            backup(_sqlite_path(args.source), args.target, args.pages, args.pause)
+        elif args.command == "compact":
+            compact(_sqlite_path(args.source), args.target)
+        elif args.command == "export":
+            count = export_jsonl(_sqlite_path(args.source), sys.stdout)
+            print(f"Exported {count} rows", file=sys.stderr)
+        else:
+            count = import_jsonl(_sqlite_path(args.target), sys.stdin)
+            print(f"Imported {count} rows", file=sys.stderr)
+    except (FileExistsError, ValueError) as err:
+        raise SystemExit(f"initbot-state {args.command}: {err}") from err
+
+
+if __name__ == "__main__":
+    run()
@@ -24,6 +24,62 @@ class CoreSettings(BaseSettings):
         default="",
         description="Public hostname when running behind a reverse proxy (e.g. 'example.com'). Set WEB_HOSTNAME in .env.",
     )
+    state_cache: bool = Field(
+        default=False,
+        description="Keep the character roster in memory and write changes through to the data store. Writes by other processes are detected via SQLite's PRAGMA data_version, so the cache stays correct when the chat bot and web app share a database.",
+    )
+    state_readers: int = Field(
+        default=4,
+        ge=0,
+        description="Maximum number of read-only SQLite connections that serve queries concurrently with the single writer connection, e.g. tracker refreshes while the chat bot writes or maintenance checkpoints the WAL (0 runs all queries on the writer).",
+    )
+    state_player_cache_size: int = Field(
+        default=1024,
+        ge=0,
+        description="Number of players kept in memory for lookups by id or Discord id, least recently used first out (0 disables the cache). Writes by other processes are detected via SQLite's PRAGMA data_version.",
+    )
+    state_busy_timeout: float = Field(
+        default=5.0,
+        ge=0,
+        description="Seconds an SQLite connection waits for another process, e.g. the web app while the chat bot writes, to release the write lock before failing with 'database is locked'.",
+    )
+    state_busy_retries: int = Field(
+        default=3,
+        ge=0,
+        description="How often a write that ran into the busy timeout is retried after a random, exponentially growing delay. Writes inside a transaction are not retried.",
+    )
+    state_statement_stats: bool = Field(
+        default=False,
+        description="Time every SQLite query and keep call counts and latency histograms per statement, available via State.stats(). Maintenance logs the statements that took the most time, and statements slower than STATE_SLOW_STATEMENT_MS are logged as they happen.",
+    )
+    state_slow_statement_ms: float = Field(
+        default=100.0,
+        ge=0,
+        description="Milliseconds above which a query is logged as slow while STATE_STATEMENT_STATS is on.",
+    )
+    state_snapshot_interval: float = Field(
+        default=60.0,
+        ge=0,
+        description="Seconds between snapshots of a 'memory:/path/to/snapshot.json' data store to its file, written only if something changed (0 writes a snapshot only on shutdown).",
+    )
+    state_maintenance_interval: float = Field(
+        default=60 * 60,
+        ge=0,
+        description="Seconds between maintenance runs of an SQLite data store: a WAL checkpoint, size metrics in the log and PRAGMA optimize (0 disables maintenance).",
+    )
+    state_wal_truncate_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        ge=0,
+        description="WAL file size in bytes above which maintenance truncates the WAL file instead of only copying its pages into the database.",
+    )
+    state_guild_scopes: bool = Field(
+        default=False,
+        description="Give every Discord guild its own list of characters, so that name abbreviations and the initiative order only consider the characters of that guild. Characters created before enabling this, and those created in direct messages, belong to scope 0, which is also what the web app shows unless its SCOPE is set to a guild ID. Characters of different guilds may share a name.",
+    )
+    state_worker_thread: bool = Field(
+        default=False,
+        description="Run all data store access on one dedicated thread so that slow SQLite operations (lock waits, WAL checkpoints) never stall the asyncio event loop of the chat bot or web app.",
+    )
 
 
 CORE_CFG = CoreSettings()
@@ -6,7 +6,7 @@ import time
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class NewCharacterData:
     """Creation input — passed into add_store_and_get."""
 
@@ -17,7 +17,7 @@ class NewCharacterData:
     last_used: int | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class CharacterData:
     """Data handle returned by the storage layer and mutated in place before update_and_store."""
 
@@ -28,8 +28,13 @@ class CharacterData:
     last_used: int | None = None
 
 
+def pruning_cutoff(threshold_days: int) -> int:
+    """Returns the timestamp before which a character's last use makes it prunable."""
+    return int(time.time()) - threshold_days * 86400
+
+
 def is_eligible_for_pruning(cdi: CharacterData, threshold_days: int) -> bool:
     """Returns True if the character has not been used recently enough."""
     if cdi.last_used is None:
         return True
-    return cdi.last_used < int(time.time()) - threshold_days * 86400
+    return cdi.last_used < pruning_cutoff(threshold_days)
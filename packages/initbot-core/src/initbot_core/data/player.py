@@ -5,7 +5,7 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class PlayerData:
     id: int  # Internal primary key, auto-assigned, used as foreign key by other entities
     discord_id: int | None  # Discord snowflake; None for standalone players
@@ -0,0 +1,176 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import asyncio
+import logging
+import queue
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any, Final, TypeVar
+
+from initbot_core.state.state import State
+
+_log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DEFAULT_MAX_PENDING: Final[int] = 64
+_DEFAULT_MAX_BATCH: Final[int] = 16
+
+
+@dataclass
+class _Request:
+    fn: Callable[[State], Any]
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
+    result: Any = None
+    error: BaseException | None = None
+
+
+class _AsyncNamespace:
+    """Awaitable view of one sub-state, e.g. ``async_state.characters``."""
+
+    def __init__(self, owner: "AsyncState", name: str) -> None:
+        self._owner = owner
+        self._name = name
+
+    def __getattr__(self, method: str) -> Callable[..., Any]:
+        namespace = self._name
+
+        async def call(*args: object, **kwargs: object) -> object:
+            return await self._owner.run(
+                lambda state: getattr(getattr(state, namespace), method)(
+                    *args, **kwargs
+                )
+            )
+
+        return call
+
+
+class AsyncState:
+    """Serves a State from one dedicated database thread.
+
+    Calls are queued in a bounded queue and executed in order on the worker thread,
+    so the event loop never blocks on SQLite.
+    The worker drains up to ``max_batch`` queued calls per wakeup and hands their
+    results back to each event loop with a single callback.
+
+    ``run(fn)`` executes ``fn(state)`` on the worker thread; use it for anything that
+    touches more than one sub-state or needs ``state.transaction()``.
+    The sub-states are also exposed as awaitable proxies:
+    ``await async_state.characters.get_all()``.
+    """
+
+    def __init__(
+        self,
+        state: State,
+        max_pending: int = _DEFAULT_MAX_PENDING,
+        max_batch: int = _DEFAULT_MAX_BATCH,
+    ) -> None:
+        if max_pending < 1 or max_batch < 1:
+            raise ValueError("max_pending and max_batch must be positive")
+        self._state = state
+        self._max_batch = max_batch
+        self._requests: queue.Queue[_Request | None] = queue.Queue(maxsize=max_pending)
+        # Reserves a queue slot from the event loop, so put_nowait() never blocks it.
+        self._slots = asyncio.Semaphore(max_pending)
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._serve, name="initbot-state", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def state(self) -> State:
+        """The wrapped State; only safe to use from within ``run()`` callbacks."""
+        return self._state
+
+    async def run(self, fn: Callable[[State], T]) -> T:
+        """Execute ``fn(state)`` on the database thread and return its result."""
+        if self._closed:
+            raise RuntimeError("AsyncState is closed")
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        request = _Request(fn=fn, future=loop.create_future(), loop=loop)
+        try:
+            self._requests.put_nowait(request)
+        except BaseException:
+            self._slots.release()
+            raise
+        return await request.future
+
+    def close(self) -> None:
+        """Finish the queued calls, stop the database thread and close the State."""
+        if self._closed:
+            return
+        self._closed = True
+        self._requests.put(None)
+        self._thread.join()
+        self._state.close()
+
+    def __getattr__(self, name: str) -> _AsyncNamespace:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _AsyncNamespace(self, name)
+
+    def _serve(self) -> None:
+        stop = False
+        while not stop:
+            batch = [self._requests.get()]
+            while len(batch) < self._max_batch:
+                try:
+                    batch.append(self._requests.get_nowait())
+                except queue.Empty:
+                    break
+            done: list[_Request] = []
+            for request in batch:
+                if request is None:
+                    stop = True
+                    continue
+                try:
+                    request.result = request.fn(self._state)
+                except BaseException as exc:  # pylint: disable=broad-exception-caught
+                    request.error = exc
+                done.append(request)
+            self._deliver(done)
+
+    def _deliver(self, done: list[_Request]) -> None:
+        by_loop: dict[asyncio.AbstractEventLoop, list[_Request]] = {}
+        for request in done:
+            by_loop.setdefault(request.loop, []).append(request)
+        for loop, requests in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(self._complete, requests)
+            except RuntimeError:
+                _log.warning(
+                    "Dropping %d state results for a closed loop", len(requests)
+                )
+
+    def _complete(self, requests: list[_Request]) -> None:
+        for request in requests:
+            self._slots.release()
+            if request.future.done():  # the awaiting task was cancelled
+                continue
+            if request.error is not None:
+                request.future.set_exception(request.error)
+            else:
+                request.future.set_result(request.result)
+
+
+async def run_on_state(
+    state: State | AsyncState, fn: Callable[[State], T], in_thread: bool = False
+) -> T:
+    """Execute ``fn(state)``, on the database thread if ``state`` is an AsyncState.
+
+    A plain State runs ``fn`` on the event loop, unless ``in_thread`` moves it to a
+    worker thread; use that for slow calls such as ``maintain()``, and for reads,
+    which a SqlState then serves from its read-only connections without waiting for
+    writes on other threads.
+    """
+    if isinstance(state, AsyncState):
+        return await state.run(fn)
+    if in_thread:
+        return await asyncio.to_thread(fn, state)
+    return fn(state)
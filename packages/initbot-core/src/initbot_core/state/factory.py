@@ -3,15 +3,57 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
 from collections.abc import Callable
+from typing import Literal, overload
 
+from initbot_core.state.async_state import AsyncState
+from initbot_core.state.memory import MemoryState
 from initbot_core.state.sql import SqlState
 from initbot_core.state.state import State
 
 
+@overload
 def create_state_from_source(
-    source: str, on_change: Callable[[], None] | None = None
-) -> State:
+    source: str,
+    on_change: Callable[[], None] | None = None,
+    cache: bool | None = None,
+    asynchronous: Literal[False] = False,
+) -> State: ...
+
+
+@overload
+def create_state_from_source(
+    source: str,
+    on_change: Callable[[], None] | None = None,
+    cache: bool | None = None,
+    *,
+    asynchronous: Literal[True],
+) -> AsyncState: ...
+
+
+@overload
+def create_state_from_source(
+    source: str,
+    on_change: Callable[[], None] | None = None,
+    cache: bool | None = None,
+    *,
+    asynchronous: bool,
+) -> State | AsyncState: ...
+
+
+def create_state_from_source(
+    source: str,
+    on_change: Callable[[], None] | None = None,
+    cache: bool | None = None,
+    asynchronous: bool = False,
+) -> State | AsyncState:
     name = source.split(":", maxsplit=1)[0]
+    state: State
     if name == "sqlite":
-        return SqlState(source, on_change)
-    raise ValueError(f"Unknown kind of data store: {name}; supported: sqlite")
+        state = SqlState(source, on_change, cache)
+    elif name == "memory":
+        state = MemoryState(source, on_change)
+    else:
+        raise ValueError(
+            f"Unknown kind of data store: {name}; supported: sqlite, memory"
+        )
+    return AsyncState(state) if asynchronous else state
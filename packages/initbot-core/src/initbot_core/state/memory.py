@@ -0,0 +1,770 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+"""A State that keeps everything in memory, optionally snapshotted to a JSON file.
+
+Select it with ``memory:`` for a throwaway game night, or ``memory:/path/to/file.json``
+to load that snapshot at startup and write it back periodically and on close().
+Only one process can use a memory state, so the chat bot and the web app cannot
+share one; it is also the baseline that the SQLite backend is benchmarked against.
+"""
+
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Final, TypeVar
+
+from initbot_core.config import CORE_CFG
+from initbot_core.data.character import (
+    CharacterData,
+    NewCharacterData,
+    is_eligible_for_pruning,
+)
+from initbot_core.data.player import PlayerData
+from initbot_core.state.state import (
+    _WEB_LOGIN_TOKEN_TTL,
+    DEFAULT_SCOPE,
+    CharacterActionState,
+    CharacterState,
+    PlayerState,
+    SessionSecretState,
+    State,
+    StateChanges,
+    WebLoginTokenState,
+    _DeferrableNotifier,
+)
+from initbot_core.state.validation import check_state_directory
+from initbot_core.utils import PrefixIndex, normalize_str
+
+_log = logging.getLogger(__name__)
+
+_K = TypeVar("_K")
+_V = TypeVar("_V")
+
+# Format 2 added the scope of each character; format 1 snapshots load into DEFAULT_SCOPE.
+# Format 3 added the scope of each character's actions, which earlier formats key by
+# the then globally unique character name alone.
+_SNAPSHOT_FORMAT: Final[int] = 3
+_READABLE_SNAPSHOT_FORMATS: Final[tuple[int, ...]] = (1, 2, 3)
+
+# Keys whose latest change is remembered for get_changes_since(), like the SQL
+# changelog; older callers get an incomplete StateChanges and reload.
+_CHANGES_RETAINED: Final[int] = 1000
+
+
+def _character_name(cdi: CharacterData) -> str:
+    return cdi.name
+
+
+def _name_taken_error(name: str) -> ValueError:
+    return ValueError(
+        f"A character named '{name}' already exists "
+        f"(character names must be unique ignoring case)"
+    )
+
+
+@dataclass
+class _Tables:
+    """The data of a MemoryState; records are replaced on change, never mutated."""
+
+    # Characters by scope; names are unique within each scope.
+    characters: dict[int, PrefixIndex[CharacterData]] = field(default_factory=dict)
+    players: dict[int, PlayerData] = field(default_factory=dict)
+    player_ids_by_discord_id: dict[int, int] = field(default_factory=dict)
+    next_player_id: int = 1
+    # Action templates by scope and character name.
+    actions: dict[int, dict[str, list[str]]] = field(default_factory=dict)
+    # token -> (discord_id, expires_at, used)
+    tokens: dict[str, tuple[int, int, bool]] = field(default_factory=dict)
+    session_secret: tuple[str, int] | None = None
+    revision: int = 0
+    # Revision of the latest change per (entity, key), oldest first; characters are
+    # keyed by (scope, name), players by id.
+    changes: dict[tuple[str, tuple[int, str] | int], int] = field(default_factory=dict)
+    # Changes before this revision happened in an earlier process.
+    first_logged_revision: int = 0
+
+    def roster(self, scope: int) -> PrefixIndex[CharacterData]:
+        roster = self.characters.get(scope)
+        if roster is None:
+            roster = self.characters[scope] = PrefixIndex((), _character_name)
+        return roster
+
+    def log(self, entity: str, key: tuple[int, str] | int) -> None:
+        self.revision += 1
+        self.changes.pop((entity, key), None)
+        self.changes[(entity, key)] = self.revision
+        if len(self.changes) > _CHANGES_RETAINED:
+            # Callers at an older revision would miss the forgotten key.
+            forgotten = self.changes.pop(next(iter(self.changes)))
+            self.first_logged_revision = max(self.first_logged_revision, forgotten)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "format": _SNAPSHOT_FORMAT,
+            "revision": self.revision,
+            "characters": [
+                {**asdict(cdi), "scope": scope}
+                for scope, roster in self.characters.items()
+                for cdi in roster
+            ],
+            "players": [asdict(player) for player in self.players.values()],
+            "actions": [
+                {"scope": scope, "character": name, "templates": templates}
+                for scope, actions in self.actions.items()
+                for name, templates in actions.items()
+            ],
+            "tokens": self.tokens,
+            "session_secret": self.session_secret,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> "_Tables":
+        if data.get("format") not in _READABLE_SNAPSHOT_FORMATS:
+            raise ValueError(f"Unsupported snapshot format: {data.get('format')!r}")
+        players = [PlayerData(**player) for player in data["players"]]
+        characters: dict[int, list[CharacterData]] = {}
+        scopes_by_name: dict[str, int] = {}
+        for cdi in data["characters"]:
+            scope = cdi.pop("scope", DEFAULT_SCOPE)
+            characters.setdefault(scope, []).append(CharacterData(**cdi))
+            scopes_by_name[cdi["name"]] = scope
+        actions: dict[int, dict[str, list[str]]] = {}
+        if data["format"] >= 3:
+            for entry in data["actions"]:
+                actions.setdefault(entry["scope"], {})[entry["character"]] = list(
+                    entry["templates"]
+                )
+        else:
+            for name, templates in data["actions"].items():
+                scope = scopes_by_name.get(name, DEFAULT_SCOPE)
+                actions.setdefault(scope, {})[name] = list(templates)
+        return cls(
+            characters={
+                scope: PrefixIndex(roster, _character_name)
+                for scope, roster in characters.items()
+            },
+            players={player.id: player for player in players},
+            player_ids_by_discord_id={
+                player.discord_id: player.id
+                for player in players
+                if player.discord_id is not None
+            },
+            next_player_id=max((player.id for player in players), default=0) + 1,
+            actions=actions,
+            tokens={token: tuple(entry) for token, entry in data["tokens"].items()},
+            session_secret=(
+                tuple(data["session_secret"]) if data["session_secret"] else None
+            ),
+            revision=data["revision"],
+            first_logged_revision=data["revision"],
+        )
+
+
+@dataclass(frozen=True)
+class _Savepoint:
+    """What a rollback needs besides the undo log: its length and the scalars."""
+
+    undo_depth: int
+    next_player_id: int
+    session_secret: tuple[str, int] | None
+    revision: int
+    # At most _CHANGES_RETAINED entries, whose order matters, so copied whole.
+    changes: dict[tuple[str, tuple[int, str] | int], int]
+    first_logged_revision: int
+
+
+class _Shared:
+    """The tables shared by the sub-states, with the lock that guards them."""
+
+    def __init__(self, notify: Callable[[], None]) -> None:
+        self.tables = _Tables()
+        self.lock = threading.RLock()
+        self.notify = notify
+        # Counts every write, including tokens and actions, to tell when to snapshot.
+        self.writes = 0
+        # Inside a transaction, one entry per saved item that restores it, oldest
+        # first; writers save what they are about to change with the save_*()
+        # methods, so that a rollback costs as much as the writes it undoes.
+        self.undo_log: list[Callable[[], None]] | None = None
+
+    def save_item(self, table: dict[_K, _V], key: _K) -> None:
+        """Let a rollback restore table[key] as it is now, or remove it if absent."""
+        if self.undo_log is None:
+            return
+        if key in table:
+            value = table[key]
+            self.undo_log.append(lambda: table.__setitem__(key, value))
+        else:
+            self.undo_log.append(lambda: table.pop(key, None))
+
+    def save_character(self, scope: int, name: str) -> None:
+        """Let a rollback restore the character *name* in *scope* as it is now."""
+        if self.undo_log is None:
+            return
+        roster = self.tables.roster(scope)
+        cdi = roster.get(name)
+        if cdi is not None:
+            self.undo_log.append(lambda: roster.insert(cdi))
+        else:
+            self.undo_log.append(
+                lambda: roster.delete(name) if roster.get(name) is not None else None
+            )
+
+    def save_actions(self, scope: int, name: str) -> None:
+        """Let a rollback restore the action templates of *name* in *scope*."""
+        if self.undo_log is None:
+            return
+        actions = self.tables.actions.setdefault(scope, {})
+        templates = actions.get(name)
+        if templates is not None:
+            # Template lists are changed in place, so save a copy.
+            saved = list(templates)
+            self.undo_log.append(lambda: actions.__setitem__(name, saved))
+        else:
+            self.undo_log.append(lambda: actions.pop(name, None))
+
+    def savepoint(self) -> _Savepoint:
+        if self.undo_log is None:
+            self.undo_log = []
+        tables = self.tables
+        return _Savepoint(
+            undo_depth=len(self.undo_log),
+            next_player_id=tables.next_player_id,
+            session_secret=tables.session_secret,
+            revision=tables.revision,
+            changes=dict(tables.changes),
+            first_logged_revision=tables.first_logged_revision,
+        )
+
+    def rollback(self, savepoint: _Savepoint) -> None:
+        undo_log = self.undo_log or []
+        while len(undo_log) > savepoint.undo_depth:
+            undo_log.pop()()
+        tables = self.tables
+        tables.next_player_id = savepoint.next_player_id
+        tables.session_secret = savepoint.session_secret
+        tables.revision = savepoint.revision
+        tables.changes = savepoint.changes
+        tables.first_logged_revision = savepoint.first_logged_revision
+
+
+class _MemoryCharacterState(CharacterState):
+    def __init__(self, shared: _Shared, scope: int = DEFAULT_SCOPE) -> None:
+        self._shared = shared
+        self._scope = scope
+
+    def _roster(self) -> PrefixIndex[CharacterData]:
+        return self._shared.tables.roster(self._scope)
+
+    def _actions(self) -> dict[str, list[str]]:
+        return self._shared.tables.actions.get(self._scope, {})
+
+    def get_all(self) -> Sequence[CharacterData]:
+        # Callers mutate returned objects before update_and_store, so hand out copies.
+        with self._shared.lock:
+            return [replace(cdi) for cdi in self._roster()]
+
+    def page(self, after_name: str | None, limit: int) -> Sequence[CharacterData]:
+        with self._shared.lock:
+            return [replace(cdi) for cdi in self._roster().page(after_name, limit)]
+
+    def get_all_for_player(self, player_id: int) -> Sequence[CharacterData]:
+        with self._shared.lock:
+            return [
+                replace(cdi) for cdi in self._roster() if cdi.player_id == player_id
+            ]
+
+    def find_prunable(
+        self, threshold_days: int, player_id: int | None = None
+    ) -> Sequence[CharacterData]:
+        with self._shared.lock:
+            return [
+                replace(cdi)
+                for cdi in self._roster()
+                if (player_id is None or cdi.player_id == player_id)
+                and is_eligible_for_pruning(cdi, threshold_days)
+            ]
+
+    def prune_many(
+        self, threshold_days: int, player_id: int | None = None
+    ) -> Sequence[str]:
+        with self._shared.lock:
+            tables = self._shared.tables
+            names = [cdi.name for cdi in self.find_prunable(threshold_days, player_id)]
+            for name in names:
+                self._shared.save_character(self._scope, name)
+                self._shared.save_actions(self._scope, name)
+                self._roster().delete(name)
+                self._actions().pop(name, None)
+                tables.log("character", (self._scope, name))
+            if names:
+                self._shared.writes += 1
+                self._shared.notify()
+            return names
+
+    def _match_name(self, name: str) -> CharacterData:
+        with self._shared.lock:
+            return replace(self._roster().match(name))
+
+    def _get_from_normalized_name(self, normalized: str) -> CharacterData | None:
+        with self._shared.lock:
+            cdi = self._roster().get_normalized(normalized)
+            return replace(cdi) if cdi is not None else None
+
+    def _add_store_and_get(self, char_data: NewCharacterData) -> CharacterData:
+        last_used = (
+            char_data.last_used if char_data.last_used is not None else int(time.time())
+        )
+        cdi = CharacterData(
+            name=char_data.name,
+            player_id=char_data.player_id,
+            initiative=char_data.initiative,
+            initiative_dice=char_data.initiative_dice,
+            last_used=last_used,
+        )
+        with self._shared.lock:
+            roster = self._roster()
+            # Lost a race against another thread since the uniqueness check.
+            if roster.get_normalized(normalize_str(cdi.name)) is not None:
+                raise _name_taken_error(cdi.name)
+            self._shared.save_character(self._scope, cdi.name)
+            roster.insert(replace(cdi))
+            self._shared.tables.log("character", (self._scope, cdi.name))
+            self._shared.writes += 1
+            self._shared.notify()
+        return cdi
+
+    def _rename_and_store(
+        self, char_data: CharacterData, new_name: str
+    ) -> CharacterData:
+        with self._shared.lock:
+            tables = self._shared.tables
+            roster = self._roster()
+            conflict = roster.get_normalized(normalize_str(new_name))
+            if conflict is not None and conflict.name != char_data.name:
+                raise _name_taken_error(new_name)
+            current = roster.get(char_data.name)
+            cdi = replace(char_data, name=new_name)
+            if current is not None:
+                for name in (char_data.name, new_name):
+                    self._shared.save_character(self._scope, name)
+                    self._shared.save_actions(self._scope, name)
+                roster.rename(char_data.name, replace(current, name=new_name))
+                actions = self._actions()
+                if char_data.name in actions:
+                    actions[new_name] = actions.pop(char_data.name)
+                tables.log("character", (self._scope, char_data.name))
+                tables.log("character", (self._scope, new_name))
+            self._shared.writes += 1
+            self._shared.notify()
+        return cdi
+
+    def update_and_store(self, char_data: CharacterData) -> None:
+        with self._shared.lock:
+            tables = self._shared.tables
+            roster = self._roster()
+            if roster.get(char_data.name) is not None:
+                self._shared.save_character(self._scope, char_data.name)
+                roster.insert(replace(char_data))
+                tables.log("character", (self._scope, char_data.name))
+            self._shared.writes += 1
+            self._shared.notify()
+
+    def remove_and_store(self, char_data: CharacterData) -> None:
+        with self._shared.lock:
+            tables = self._shared.tables
+            roster = self._roster()
+            if roster.get(char_data.name) is not None:
+                self._shared.save_character(self._scope, char_data.name)
+                self._shared.save_actions(self._scope, char_data.name)
+                roster.delete(char_data.name)
+                self._actions().pop(char_data.name, None)
+                tables.log("character", (self._scope, char_data.name))
+            self._shared.writes += 1
+            self._shared.notify()
+
+
+class _MemoryPlayerState(PlayerState):
+    def __init__(self, shared: _Shared) -> None:
+        self._shared = shared
+
+    def _put(self, player: PlayerData) -> PlayerData:
+        tables = self._shared.tables
+        self._shared.save_item(tables.players, player.id)
+        tables.players[player.id] = player
+        if player.discord_id is not None:
+            self._shared.save_item(tables.player_ids_by_discord_id, player.discord_id)
+            tables.player_ids_by_discord_id[player.discord_id] = player.id
+        tables.log("player", player.id)
+        self._shared.writes += 1
+        self._shared.notify()
+        return replace(player)
+
+    def _new_id(self) -> int:
+        tables = self._shared.tables
+        player_id = tables.next_player_id
+        tables.next_player_id += 1
+        return player_id
+
+    def upsert_discord(self, discord_id: int, name: str) -> PlayerData:
+        with self._shared.lock:
+            tables = self._shared.tables
+            player_id = tables.player_ids_by_discord_id.get(discord_id)
+            if player_id is None:
+                player_id = self._new_id()
+            elif tables.players[player_id].name == name:
+                return replace(tables.players[player_id])
+            return self._put(PlayerData(player_id, discord_id, name))
+
+    def upsert_standalone(self, name: str) -> PlayerData | str:
+        with self._shared.lock:
+            lowered = name.lower()
+            existing = next(
+                (
+                    player
+                    for player in self._shared.tables.players.values()
+                    if player.name.lower() == lowered
+                ),
+                None,
+            )
+            if existing is not None:
+                if existing.discord_id is not None:
+                    return "taken"
+                return replace(existing)
+            return self._put(PlayerData(self._new_id(), None, name))
+
+    def get_from_id(self, player_id: int) -> PlayerData:
+        with self._shared.lock:
+            player = self._shared.tables.players.get(player_id)
+        if player is None:
+            raise KeyError(f"No player with id={player_id}")
+        return replace(player)
+
+    def get_from_discord_id(self, discord_id: int) -> PlayerData | None:
+        with self._shared.lock:
+            tables = self._shared.tables
+            player_id = tables.player_ids_by_discord_id.get(discord_id)
+            return replace(tables.players[player_id]) if player_id is not None else None
+
+    def get_all(self) -> Sequence[PlayerData]:
+        with self._shared.lock:
+            return [replace(player) for player in self._shared.tables.players.values()]
+
+    def page(self, after_id: int | None, limit: int) -> Sequence[PlayerData]:
+        with self._shared.lock:
+            tables = self._shared.tables
+            page = []
+            # Ids are handed out in order and never reused, so walk them instead
+            # of sorting all players.
+            for player_id in range((after_id or 0) + 1, tables.next_player_id):
+                if len(page) == limit:
+                    break
+                player = tables.players.get(player_id)
+                if player is not None:
+                    page.append(replace(player))
+            return page
+
+
+class _MemoryWebLoginTokenState(WebLoginTokenState):
+    def __init__(self, shared: _Shared) -> None:
+        self._shared = shared
+
+    def create(self, discord_id: int) -> str:
+        token = secrets.token_urlsafe(32)
+        now = int(time.time())
+        with self._shared.lock:
+            self._shared.save_item(self._shared.tables.tokens, token)
+            self._shared.tables.tokens[token] = (
+                discord_id,
+                now + _WEB_LOGIN_TOKEN_TTL,
+                False,
+            )
+            self._shared.writes += 1
+        return token
+
+    def find_valid(self, token: str) -> int | None:
+        now = int(time.time())
+        with self._shared.lock:
+            entry = self._shared.tables.tokens.get(token)
+        if entry is None:
+            return None
+        discord_id, expires_at, used = entry
+        return discord_id if not used and expires_at > now else None
+
+    def consume(self, token: str) -> int | None:
+        now = int(time.time())
+        with self._shared.lock:
+            entry = self._shared.tables.tokens.get(token)
+            if entry is None:
+                return None
+            discord_id, expires_at, used = entry
+            if used or expires_at <= now:
+                return None
+            self._shared.save_item(self._shared.tables.tokens, token)
+            self._shared.tables.tokens[token] = (discord_id, expires_at, True)
+            self._shared.writes += 1
+            return discord_id
+
+    def mark_used(self, token: str) -> None:
+        with self._shared.lock:
+            entry = self._shared.tables.tokens.get(token)
+            if entry is not None:
+                self._shared.save_item(self._shared.tables.tokens, token)
+                self._shared.tables.tokens[token] = (entry[0], entry[1], True)
+                self._shared.writes += 1
+
+    def prune_expired(self) -> None:
+        now = int(time.time())
+        with self._shared.lock:
+            tokens = self._shared.tables.tokens
+            for token in [t for t, entry in tokens.items() if entry[1] <= now]:
+                self._shared.save_item(tokens, token)
+                del tokens[token]
+            self._shared.writes += 1
+
+
+class _MemoryCharacterActionState(CharacterActionState):
+    def __init__(self, shared: _Shared, scope: int = DEFAULT_SCOPE) -> None:
+        self._shared = shared
+        self._scope = scope
+
+    def _templates(self, character_name: str) -> list[str]:
+        return self._shared.tables.actions.get(self._scope, {}).get(character_name, [])
+
+    @staticmethod
+    def _check_index(templates: list[str], index: int) -> None:
+        if not 1 <= index <= len(templates):
+            raise IndexError(f"Action index {index} out of range (1-{len(templates)})")
+
+    def get_all_for_character(self, character_name: str) -> Sequence[str]:
+        with self._shared.lock:
+            return list(self._templates(character_name))
+
+    def add(self, character_name: str, template: str) -> int:
+        with self._shared.lock:
+            tables = self._shared.tables
+            cdi = tables.roster(self._scope).get(character_name)
+            if cdi is None:
+                raise KeyError(f"Unable to find character with name '{character_name}'")
+            self._shared.save_actions(self._scope, character_name)
+            actions = tables.actions.setdefault(self._scope, {})
+            templates = actions.setdefault(character_name, [])
+            templates.append(template)
+            self._shared.writes += 1
+            return len(templates)
+
+    def update(self, character_name: str, index: int, template: str) -> None:
+        with self._shared.lock:
+            templates = self._templates(character_name)
+            self._check_index(templates, index)
+            self._shared.save_actions(self._scope, character_name)
+            templates[index - 1] = template
+            self._shared.writes += 1
+
+    def remove(self, character_name: str, index: int) -> None:
+        with self._shared.lock:
+            templates = self._templates(character_name)
+            self._check_index(templates, index)
+            self._shared.save_actions(self._scope, character_name)
+            del templates[index - 1]
+            self._shared.writes += 1
+
+    def move(self, character_name: str, from_index: int, to_index: int) -> None:
+        with self._shared.lock:
+            templates = self._templates(character_name)
+            self._check_index(templates, from_index)
+            self._check_index(templates, to_index)
+            self._shared.save_actions(self._scope, character_name)
+            templates.insert(to_index - 1, templates.pop(from_index - 1))
+            self._shared.writes += 1
+
+
+class _MemorySessionSecretState(SessionSecretState):
+    def __init__(self, shared: _Shared) -> None:
+        self._shared = shared
+
+    def _load(self) -> tuple[str, int] | None:
+        with self._shared.lock:
+            return self._shared.tables.session_secret
+
+    def _store(self, secret: str, expires_at: int) -> None:
+        with self._shared.lock:
+            self._shared.tables.session_secret = (secret, expires_at)
+            self._shared.writes += 1
+
+
+class MemoryState(State):
+    def __init__(
+        self,
+        source: str,
+        on_change: Callable[[], None] | None = None,
+        snapshot_interval: float | None = None,
+    ) -> None:
+        state_type, state_source = source.split(":", maxsplit=1)
+        if state_type != "memory":
+            raise ValueError(f"Unsupported state type: {state_type}")
+
+        self._notifier = _DeferrableNotifier(on_change)
+        self._shared = _Shared(self._notifier)
+        self._transaction_depth = 0
+        self._path = Path(state_source) if state_source else None
+        self._saved_writes = 0
+        if self._path is not None:
+            check_state_directory(source, self._path.parent)
+            if self._path.exists():
+                self._shared.tables = _Tables.from_json(
+                    json.loads(self._path.read_text(encoding="utf-8"))
+                )
+                _log.info("Loaded snapshot %s", self._path)
+
+        self._characters = _MemoryCharacterState(self._shared)
+        self._players = _MemoryPlayerState(self._shared)
+        self._web_login_tokens = _MemoryWebLoginTokenState(self._shared)
+        self._character_actions = _MemoryCharacterActionState(self._shared)
+        self._session_secret = _MemorySessionSecretState(self._shared)
+
+        interval = (
+            CORE_CFG.state_snapshot_interval
+            if snapshot_interval is None
+            else snapshot_interval
+        )
+        self._stop = threading.Event()
+        self._snapshotter: threading.Thread | None = None
+        if self._path is not None and interval > 0:
+            self._snapshotter = threading.Thread(
+                target=self._snapshot_periodically,
+                args=(interval,),
+                name="initbot-snapshot",
+                daemon=True,
+            )
+            self._snapshotter.start()
+
+    @property
+    def characters(self) -> CharacterState:
+        return self._characters
+
+    @property
+    def players(self) -> PlayerState:
+        return self._players
+
+    @property
+    def web_login_tokens(self) -> WebLoginTokenState:
+        return self._web_login_tokens
+
+    @property
+    def character_actions(self) -> CharacterActionState:
+        return self._character_actions
+
+    @property
+    def session_secret(self) -> SessionSecretState:
+        return self._session_secret
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        # Holding the lock for the whole block keeps other threads out, like the
+        # writer's thread lock that SqlState holds for a transaction: their writes
+        # wait instead of being rolled back with this block. A rollback replays the
+        # undo log that the writes in the block left, instead of copying all tables.
+        with self._shared.lock:
+            savepoint = self._shared.savepoint()
+            outermost = not self._transaction_depth
+            self._transaction_depth += 1
+            self._notifier.deferring = True
+            try:
+                yield
+            except BaseException:
+                self._shared.rollback(savepoint)
+                if outermost:
+                    self._notifier.discard()
+                raise
+            finally:
+                if outermost:
+                    self._shared.undo_log = None
+                self._transaction_depth -= 1
+                self._notifier.deferring = self._transaction_depth > 0
+        if outermost:
+            self._notifier.flush()
+
+    def get_revision(self) -> int:
+        with self._shared.lock:
+            return self._shared.tables.revision
+
+    def _characters_in_scope(self, scope: int) -> CharacterState:
+        return _MemoryCharacterState(self._shared, scope)
+
+    def _character_actions_in_scope(self, scope: int) -> CharacterActionState:
+        if scope == DEFAULT_SCOPE:
+            return self._character_actions
+        return _MemoryCharacterActionState(self._shared, scope)
+
+    def _get_changes_since(self, revision: int, scope: int) -> StateChanges:
+        with self._shared.lock:
+            tables = self._shared.tables
+            changes = StateChanges(revision=tables.revision)
+            if revision >= tables.revision:
+                return changes
+            if revision < tables.first_logged_revision:
+                changes.complete = False
+                return changes
+            changed = []
+            for key, changed_at in reversed(tables.changes.items()):
+                if changed_at <= revision:
+                    break
+                changed.append(key)
+            for _entity, key in reversed(changed):
+                if isinstance(key, tuple):
+                    character_scope, name = key
+                    if character_scope != scope:
+                        continue
+                    cdi = tables.roster(scope).get(name)
+                    if cdi is not None:
+                        changes.characters.append(replace(cdi))
+                    else:
+                        changes.removed_characters.append(name)
+                else:
+                    player = tables.players.get(int(key))
+                    if player is not None:
+                        changes.players.append(replace(player))
+                    else:
+                        changes.removed_players.append(int(key))
+            return changes
+
+    def save(self) -> None:
+        """Write a snapshot if anything changed since the last one."""
+        if self._path is None:
+            return
+        with self._shared.lock:
+            writes = self._shared.writes
+            if writes == self._saved_writes and self._path.exists():
+                return
+            data = self._shared.tables.to_json()
+        # Write a sibling file and rename it, so that a crash never leaves a
+        # truncated snapshot behind.
+        scratch = self._path.with_name(f".{self._path.name}.tmp")
+        scratch.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(scratch, self._path)
+        self._saved_writes = writes
+
+    def close(self) -> None:
+        """Stop the periodic snapshots and write a final one."""
+        self._stop.set()
+        if self._snapshotter is not None:
+            self._snapshotter.join()
+            self._snapshotter = None
+        self.save()
+
+    def _snapshot_periodically(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.save()
+            except OSError:
+                _log.exception("Could not write snapshot %s", self._path)
@@ -2,25 +2,110 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
+import bisect
+import functools
+import logging
+import random
+import re
 import secrets
 import sqlite3
+import threading
 import time
-from collections.abc import Callable, Sequence
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass, replace
 from pathlib import Path
+from time import perf_counter
+from typing import Any, Final, TypeVar
 
 from initbot_core.config import CORE_CFG
-from initbot_core.data.character import CharacterData, NewCharacterData
+from initbot_core.data.character import (
+    CharacterData,
+    NewCharacterData,
+    is_eligible_for_pruning,
+    pruning_cutoff,
+)
 from initbot_core.data.player import PlayerData
 from initbot_core.state.state import (
     _WEB_LOGIN_TOKEN_TTL,
+    DEFAULT_SCOPE,
+    LOCK_WAIT_BUCKETS,
+    STATEMENT_LATENCY_BUCKETS,
+    CacheInfo,
     CharacterActionState,
     CharacterState,
+    LockStats,
+    MaintenanceReport,
     PlayerState,
     SessionSecretState,
     State,
+    StateChanges,
+    StatementStats,
+    StateStats,
     WebLoginTokenState,
+    _DeferrableNotifier,
 )
 from initbot_core.state.validation import check_state_directory
+from initbot_core.utils import PrefixIndex, normalize_str, prefix_upper_bound
+
+_log = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+_MAX_PARAMS: Final[int] = 999
+
+# Rows per page() that iter_all() reads when the caller does not choose.
+_ITER_BATCH_SIZE: Final[int] = 500
+
+# Backoff before retrying a write that ran into the busy timeout: a random delay of
+# up to base * 2**attempt seconds, capped, so that two processes that collided do
+# not retry in lockstep.
+_BUSY_RETRY_BASE_DELAY: Final[float] = 0.05
+_BUSY_RETRY_MAX_DELAY: Final[float] = 2.0
+
+# How many statements, those with the largest total time, maintain() logs.
+_LOGGED_STATEMENTS: Final[int] = 5
+
+
+# The primary result code; sqlite3.SQLITE_BUSY only exists from Python 3.11 on.
+_SQLITE_BUSY: Final[int] = 5
+
+
+def _is_busy(err: sqlite3.OperationalError) -> bool:
+    # SQLITE_BUSY, also when SQLite returns it without waiting for the busy timeout,
+    # e.g. because another connection wrote since this one's read transaction began.
+    # Extended codes such as SQLITE_BUSY_SNAPSHOT keep it in their low byte.
+    errorcode = getattr(err, "sqlite_errorcode", None)
+    if errorcode is None:  # Python 3.10
+        return str(err).startswith("database is locked")
+    return errorcode & 0xFF == _SQLITE_BUSY
+
+
+def _wait_before_retry(attempt: int) -> None:
+    delay = min(_BUSY_RETRY_MAX_DELAY, _BUSY_RETRY_BASE_DELAY * 2**attempt)
+    _log.debug("Database is locked, retrying in up to %.2f s", delay)
+    time.sleep(random.uniform(0, delay))
+
+
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+@functools.lru_cache(maxsize=256)
+def _statement_template(sql: str) -> str:
+    """Collapse whitespace and placeholder lists, e.g. of IN (?, ?, ?), into one key."""
+    return " ".join(_PLACEHOLDER_LIST.sub("?, ...", sql).split())
+
+
+class _StatementCounter:
+    __slots__ = ("calls", "histogram", "max_seconds", "total_seconds")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.histogram = [0] * len(STATEMENT_LATENCY_BUCKETS)
+
 
 _CREATE_TABLES = """
 CREATE TABLE IF NOT EXISTS _sqlcharacterdata (
@@ -28,7 +113,8 @@ CREATE TABLE IF NOT EXISTS _sqlcharacterdata (
     player_id INTEGER,
     initiative INTEGER,
     initiative_dice TEXT,
-    last_used INTEGER
+    last_used INTEGER,
+    name_key TEXT
 );
 CREATE TABLE IF NOT EXISTS _sqlplayerdata (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -64,35 +150,453 @@ class _ChangeNotifyMixin:
             self._on_change()
 
 
+@dataclass(frozen=True, slots=True)
+class _Result:
+    """The rows and row count of a statement run by _Connections.execute()."""
+
+    rows: list[Any]
+    rowcount: int
+
+    def fetchone(self) -> Any:  # noqa: ANN401
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self) -> list[Any]:
+        return self.rows
+
+
+class _Connections:
+    """The writer connection of a SqlState plus a small pool of read-only ones.
+
+    Threads share the writer, so ``write_lock`` serializes them: a transaction
+    holds it from BEGIN to COMMIT or ROLLBACK and every other statement on the
+    writer takes it, so that no thread's write ends up in, and is rolled back
+    with, another thread's transaction.
+
+    Queries instead borrow a reader, which in WAL mode reads the last commit
+    without waiting for the write lock, e.g. while another thread's transaction or
+    a WAL checkpoint holds it. Readers are opened on demand, up to
+    ``max_readers``; when all are busy, the query runs on the writer. The thread of
+    an open transaction queries the writer, so that it sees its own writes.
+
+    Another process may hold the write lock, e.g. the web app while the chat bot
+    writes. Every connection waits up to ``busy_timeout`` seconds for it; a write
+    that still fails is retried ``busy_retries`` times after a backoff, unless it
+    is part of a transaction, which could have read data that is stale by then.
+
+    With ``statement_stats``, every query is timed and counted per statement
+    template, and those taking ``slow_statement`` seconds or longer are logged.
+    Statements run directly on ``writer`` are not.
+    """
+
+    def __init__(
+        self,
+        writer: sqlite3.Connection,
+        busy_retries: int = 0,
+        statement_stats: bool = False,
+        slow_statement: float = 0.1,
+        reader_uri: str | None = None,
+        max_readers: int = 0,
+        busy_timeout: float = 5.0,
+    ) -> None:
+        self.writer = writer
+        self._busy_retries = busy_retries
+        self._reader_uri = reader_uri if max_readers > 0 else None
+        self._max_readers = max_readers
+        self._busy_timeout = busy_timeout
+        self._readers: list[sqlite3.Connection] = []
+        self._idle: list[sqlite3.Connection] = []
+        self._trace_callback: Callable[[str], object] | None = None
+        self._lock = threading.Lock()
+        self.write_lock = threading.RLock()
+        # Thread running the open transaction on the writer, if any.
+        self.transaction_thread: int | None = None
+        # Write lock contention, see LockStats.
+        self._writes = 0
+        self._busy = 0
+        self._retries = 0
+        self._failures = 0
+        self._wait_seconds = 0.0
+        self._wait_histogram = [0] * len(LOCK_WAIT_BUCKETS)
+        self._statements: dict[str, _StatementCounter] | None = (
+            {} if statement_stats else None
+        )
+        self._slow_statement = slow_statement
+
+    def _measure(self, sql: str) -> AbstractContextManager[None]:
+        if self._statements is None:
+            return nullcontext()
+        return self._measured(sql)
+
+    @contextmanager
+    def _measured(self, sql: str) -> Iterator[None]:
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self._record_statement(sql, perf_counter() - started)
+
+    def _record_statement(self, sql: str, seconds: float) -> None:
+        template = _statement_template(sql)
+        if seconds >= self._slow_statement:
+            _log.warning("Slow SQL statement (%.1f ms): %s", seconds * 1000, template)
+        bucket = bisect.bisect_left(STATEMENT_LATENCY_BUCKETS, seconds)
+        with self._lock:
+            if self._statements is None:
+                return
+            counter = self._statements.get(template)
+            if counter is None:
+                counter = self._statements[template] = _StatementCounter()
+            counter.calls += 1
+            counter.total_seconds += seconds
+            counter.max_seconds = max(counter.max_seconds, seconds)
+            counter.histogram[bucket] += 1
+
+    def statement_stats(self) -> dict[str, StatementStats]:
+        with self._lock:
+            return {
+                template: StatementStats(
+                    calls=counter.calls,
+                    total_seconds=counter.total_seconds,
+                    max_seconds=counter.max_seconds,
+                    histogram=tuple(counter.histogram),
+                )
+                for template, counter in (self._statements or {}).items()
+            }
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> _Result:
+        """Run a statement on the writer and fetch its rows, e.g. of RETURNING.
+
+        The rows are fetched under the write lock: until then the statement stays
+        open and SQLite would not commit its implicit transaction.
+        """
+        with self.write_lock, self._measure(sql):
+            cursor = self._execute_on_writer(sql, params)
+            return _Result(cursor.fetchall(), cursor.rowcount)
+
+    def data_version(self) -> int:
+        """PRAGMA data_version of the writer; it changes with commits of other processes."""
+        with self.write_lock:
+            return self.writer.execute("PRAGMA data_version").fetchone()[0]
+
+    def _execute_on_writer(
+        self, sql: str, params: Sequence[Any] = ()
+    ) -> sqlite3.Cursor:
+        if self.transaction_thread is not None:
+            try:
+                return self.writer.execute(sql, params)
+            except sqlite3.OperationalError as err:
+                if _is_busy(err):
+                    with self._lock:
+                        self._busy += 1
+                        self._failures += 1
+                raise
+        started = perf_counter()
+        attempt = 0
+        while True:
+            try:
+                cursor = self.writer.execute(sql, params)
+            except sqlite3.OperationalError as err:
+                if not _is_busy(err):
+                    raise
+                if attempt >= self._busy_retries:
+                    _log.warning(
+                        "Database is locked, gave up after %d retries", attempt
+                    )
+                    self._record_write(perf_counter() - started, attempt, failed=True)
+                    raise
+            else:
+                self._record_write(perf_counter() - started, attempt, failed=False)
+                return cursor
+            _wait_before_retry(attempt)
+            attempt += 1
+
+    def _record_write(self, wait: float, retries: int, failed: bool) -> None:
+        bucket = bisect.bisect_left(LOCK_WAIT_BUCKETS, wait)
+        with self._lock:
+            self._writes += 1
+            self._busy += retries + failed
+            self._retries += retries
+            self._failures += failed
+            self._wait_seconds += wait
+            self._wait_histogram[bucket] += 1
+
+    def lock_stats(self) -> LockStats:
+        with self._lock:
+            return LockStats(
+                writes=self._writes,
+                busy=self._busy,
+                retries=self._retries,
+                failures=self._failures,
+                wait_seconds=self._wait_seconds,
+                wait_histogram=tuple(self._wait_histogram),
+            )
+
+    def fetchall(
+        self,
+        sql: str,
+        params: Sequence[Any] = (),
+        row_factory: Callable[[sqlite3.Cursor, tuple], Any] | None = None,
+    ) -> list[Any]:
+        with self._reading() as db, self._measure(sql):
+            cursor = db.cursor()
+            cursor.row_factory = row_factory
+            return cursor.execute(sql, params).fetchall()
+
+    def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Any:  # noqa: ANN401
+        with self._reading() as db, self._measure(sql):
+            # Close the cursor before giving the connection back; an unfinished
+            # statement would keep a reader's snapshot, or the implicit transaction
+            # of the writer's next write, open.
+            cursor = db.execute(sql, params)
+            try:
+                return cursor.fetchone()
+            finally:
+                cursor.close()
+
+    def set_trace_callback(self, callback: Callable[[str], object] | None) -> None:
+        """Like sqlite3.Connection.set_trace_callback, for every connection."""
+        with self.write_lock, self._lock:
+            self._trace_callback = callback
+            for db in (self.writer, *self._readers):
+                db.set_trace_callback(callback)
+
+    @contextmanager
+    def _reading(self) -> Iterator[sqlite3.Connection]:
+        in_own_transaction = self.transaction_thread == threading.get_ident()
+        reader = None if in_own_transaction else self._acquire()
+        if reader is None:
+            with self.write_lock:
+                yield self.writer
+            return
+        try:
+            yield reader
+        finally:
+            with self._lock:
+                self._idle.append(reader)
+
+    def _acquire(self) -> sqlite3.Connection | None:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            if self._reader_uri is None or len(self._readers) >= self._max_readers:
+                return None
+            reader = sqlite3.connect(
+                self._reader_uri,
+                timeout=self._busy_timeout,
+                uri=True,
+                check_same_thread=False,
+                isolation_level=None,  # autocommit: each query sees the latest commit
+            )
+            reader.execute("PRAGMA query_only=ON;")
+            reader.set_trace_callback(self._trace_callback)
+            self._readers.append(reader)
+            return reader
+
+    def close(self) -> None:
+        with self._lock:
+            for reader in self._readers:
+                reader.close()
+            self._readers.clear()
+            self._idle.clear()
+            self._reader_uri = None
+        with self.write_lock:
+            self.writer.close()
+
+    @contextmanager
+    def savepoint(self, name: str) -> Iterator[None]:
+        """Run a block of writes atomically, nested in the open transaction if any."""
+        with self.write_lock:
+            owner = self.transaction_thread
+            self.writer.execute(f"SAVEPOINT {name};")
+            self.transaction_thread = threading.get_ident()
+            try:
+                yield
+                self.writer.execute(f"RELEASE {name};")
+            except BaseException:
+                self.writer.execute(f"ROLLBACK TO {name};")
+                self.writer.execute(f"RELEASE {name};")
+                raise
+            finally:
+                self.transaction_thread = owner
+
+
+_CHARACTER_COLUMNS = "name, player_id, initiative, initiative_dice, last_used"
+
+
+def _character_name(cdi: CharacterData) -> str:
+    return cdi.name
+
+
+def _character_from_row(_cursor: sqlite3.Cursor, row: tuple) -> CharacterData:
+    return CharacterData(*row)
+
+
+def _player_from_row(_cursor: sqlite3.Cursor, row: tuple) -> PlayerData:
+    return PlayerData(*row)
+
+
 class _SqlCharacterState(_ChangeNotifyMixin, CharacterState):
+    """The characters of one scope.
+
+    Every query filters on the scope. Names are unique ignoring case within a
+    scope only, matching the UNIQUE index on (scope, name_key).
+    """
+
     def __init__(
-        self, db: sqlite3.Connection, on_change: Callable[[], None] | None = None
+        self,
+        db: _Connections,
+        on_change: Callable[[], None] | None = None,
+        scope: int = DEFAULT_SCOPE,
     ) -> None:
         super().__init__(on_change)
         self._db = db
+        self._scope = scope
 
     def get_all(self) -> Sequence[CharacterData]:
-        rows = self._db.execute(
-            "SELECT name, player_id, initiative, initiative_dice, last_used"
-            " FROM _sqlcharacterdata"
-        ).fetchall()
-        return [CharacterData(*row) for row in rows]
+        return self._db.fetchall(
+            f"SELECT {_CHARACTER_COLUMNS} FROM _sqlcharacterdata WHERE scope=?",  # noqa: S608
+            (self._scope,),
+            row_factory=_character_from_row,
+        )
+
+    def iter_all(self, batch_size: int | None = None) -> Iterator[CharacterData]:
+        # An open statement would hold the shared connection until exhausted.
+        return self._iter_pages(batch_size or _ITER_BATCH_SIZE)
+
+    def page(self, after_name: str | None, limit: int) -> Sequence[CharacterData]:
+        # The order of PrefixIndex; names are never empty, so ("", "") comes first.
+        after = (
+            ("", "") if after_name is None else (normalize_str(after_name), after_name)
+        )
+        return self._db.fetchall(
+            f"SELECT {_CHARACTER_COLUMNS} FROM _sqlcharacterdata"  # noqa: S608
+            " WHERE scope=? AND (name_key, name)>(?, ?)"
+            " ORDER BY name_key, name LIMIT ?",
+            (self._scope, *after, limit),
+            row_factory=_character_from_row,
+        )
+
+    def discard_cache(self) -> None:
+        """Forget cached rows, e.g. after a rollback. No-op without a cache."""
+
+    def get_all_for_player(self, player_id: int) -> Sequence[CharacterData]:
+        return self._db.fetchall(
+            f"SELECT {_CHARACTER_COLUMNS} FROM _sqlcharacterdata"  # noqa: S608
+            " WHERE scope=? AND player_id=?",
+            (self._scope, player_id),
+            row_factory=_character_from_row,
+        )
+
+    def get_by_initiative(self, since: int) -> Sequence[CharacterData]:
+        # Walks the (scope, initiative) index backwards; no sort step needed.
+        return self._db.fetchall(
+            f"SELECT {_CHARACTER_COLUMNS} FROM _sqlcharacterdata"  # noqa: S608
+            " WHERE scope=? AND initiative IS NOT NULL AND last_used>?"
+            " ORDER BY initiative DESC",
+            (self._scope, since),
+            row_factory=_character_from_row,
+        )
+
+    def _prunable_where(
+        self, threshold_days: int, player_id: int | None
+    ) -> tuple[str, tuple[int, ...]]:
+        where = "scope=? AND (last_used IS NULL OR last_used<?)"
+        params: tuple[int, ...] = (self._scope, pruning_cutoff(threshold_days))
+        if player_id is not None:
+            where += " AND player_id=?"
+            params += (player_id,)
+        return where, params
+
+    def find_prunable(
+        self, threshold_days: int, player_id: int | None = None
+    ) -> Sequence[CharacterData]:
+        where, params = self._prunable_where(threshold_days, player_id)
+        return self._db.fetchall(
+            f"SELECT {_CHARACTER_COLUMNS} FROM _sqlcharacterdata WHERE {where}",  # noqa: S608
+            params,
+            row_factory=_character_from_row,
+        )
+
+    def prune_many(
+        self, threshold_days: int, player_id: int | None = None
+    ) -> Sequence[str]:
+        # The actions of the removed characters go with them, see _SqlCharacterActionState.
+        where, params = self._prunable_where(threshold_days, player_id)
+        names = [
+            row[0]
+            for row in self._db.execute(
+                f"DELETE FROM _sqlcharacterdata WHERE {where} RETURNING name",  # noqa: S608
+                params,
+            ).fetchall()
+        ]
+        if names:
+            self._notify()
+        return names
+
+    def _select_one_or_none(
+        self, where: str, params: tuple[str, ...]
+    ) -> CharacterData | None:
+        """Return the single row matching *where*, or None for zero or several rows."""
+        rows = self._db.fetchall(
+            f"SELECT {_CHARACTER_COLUMNS} FROM _sqlcharacterdata"  # noqa: S608
+            f" WHERE scope=? AND {where} LIMIT 2",
+            (self._scope, *params),
+        )
+        return CharacterData(*rows[0]) if len(rows) == 1 else None
+
+    def _match_name(self, name: str) -> CharacterData:
+        # Same precedence as get_exact_or_unique_prefix_match, but each step is
+        # a lookup on the (scope, name) or (scope, name_key) index instead of a scan.
+        normalized = normalize_str(name)
+        upper = prefix_upper_bound(normalized)
+        cdi = (
+            self._select_one_or_none("name=?", (name,))
+            or self._select_one_or_none("name_key=?", (normalized,))
+            or (
+                self._select_one_or_none(
+                    "name_key>=? AND name_key<?", (normalized, upper)
+                )
+                if upper is not None
+                else self._select_one_or_none("name_key>=?", (normalized,))
+            )
+        )
+        if cdi is None:
+            raise KeyError(f"Unable to find unique match for {name}")
+        return cdi
+
+    def _get_from_normalized_name(self, normalized: str) -> CharacterData | None:
+        row = self._db.fetchone(
+            f"SELECT {_CHARACTER_COLUMNS} FROM _sqlcharacterdata"  # noqa: S608
+            " WHERE scope=? AND name_key=? LIMIT 1",
+            (self._scope, normalized),
+        )
+        return CharacterData(*row) if row is not None else None
 
     def _add_store_and_get(self, char_data: NewCharacterData) -> CharacterData:
         last_used = (
             char_data.last_used if char_data.last_used is not None else int(time.time())
         )
-        self._db.execute(
-            "INSERT INTO _sqlcharacterdata (name, player_id, initiative, initiative_dice, last_used)"
-            " VALUES (?, ?, ?, ?, ?)",
-            (
-                char_data.name,
-                char_data.player_id,
-                char_data.initiative,
-                char_data.initiative_dice,
-                last_used,
-            ),
-        )
+        try:
+            self._db.execute(
+                "INSERT INTO _sqlcharacterdata"
+                " (name, player_id, initiative, initiative_dice, last_used, name_key, scope)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    char_data.name,
+                    char_data.player_id,
+                    char_data.initiative,
+                    char_data.initiative_dice,
+                    last_used,
+                    normalize_str(char_data.name),
+                    self._scope,
+                ),
+            )
+        except sqlite3.IntegrityError as err:
+            # Lost a race against the other process between the uniqueness check and the insert.
+            raise ValueError(
+                f"A character named '{char_data.name}' already exists "
+                f"(character names must be unique ignoring case)"
+            ) from err
         self._notify()
         return CharacterData(
             name=char_data.name,
@@ -105,10 +609,16 @@ class _SqlCharacterState(_ChangeNotifyMixin, CharacterState):
     def _rename_and_store(
         self, char_data: CharacterData, new_name: str
     ) -> CharacterData:
-        self._db.execute(
-            "UPDATE _sqlcharacterdata SET name=? WHERE name=?",
-            (new_name, char_data.name),
-        )
+        try:
+            self._db.execute(
+                "UPDATE _sqlcharacterdata SET name=?, name_key=? WHERE name=? AND scope=?",
+                (new_name, normalize_str(new_name), char_data.name, self._scope),
+            )
+        except sqlite3.IntegrityError as err:
+            raise ValueError(
+                f"A character named '{new_name}' already exists "
+                f"(character names must be unique ignoring case)"
+            ) from err
         self._notify()
         return CharacterData(
             name=new_name,
@@ -122,33 +632,281 @@ class _SqlCharacterState(_ChangeNotifyMixin, CharacterState):
         self._db.execute(
             "UPDATE _sqlcharacterdata"
             " SET player_id=?, initiative=?, initiative_dice=?, last_used=?"
-            " WHERE name=?",
+            " WHERE name=? AND scope=?",
             (
                 char_data.player_id,
                 char_data.initiative,
                 char_data.initiative_dice,
                 char_data.last_used,
                 char_data.name,
+                self._scope,
             ),
         )
         self._notify()
 
     def remove_and_store(self, char_data: CharacterData) -> None:
         self._db.execute(
-            "DELETE FROM _sqlcharacterdata WHERE name=?",
-            (char_data.name,),
+            "DELETE FROM _sqlcharacterdata WHERE name=? AND scope=?",
+            (char_data.name, self._scope),
         )
         self._notify()
 
 
+class _CachedSqlCharacterState(_SqlCharacterState):
+    """Write-through variant of _SqlCharacterState that serves reads from memory.
+
+    SQLite increments PRAGMA data_version whenever another connection commits to
+    the database, so a single pragma per read is enough to notice writes by the
+    other process and reload the roster. Writes made through this object update
+    the cached roster directly and do not change data_version.
+
+    The roster is only read and changed under ``_lock``, which is never held across
+    a query: a transaction holds the write lock of _Connections while it calls in
+    here, so waiting for the write lock under ``_lock`` could deadlock.
+    """
+
+    def __init__(
+        self,
+        db: _Connections,
+        on_change: Callable[[], None] | None = None,
+        scope: int = DEFAULT_SCOPE,
+    ) -> None:
+        super().__init__(db, on_change, scope)
+        self._roster: PrefixIndex[CharacterData] | None = None
+        self._data_version: int = -1
+        self._lock = threading.Lock()
+        # Bumped by every write through this object, so that a reload racing with
+        # it does not cache the rows it read before the write.
+        self._generation = 0
+
+    def _read_roster(self, read: Callable[[PrefixIndex[CharacterData]], _T]) -> _T:
+        """Return read(roster) under the lock, reloading the roster first if stale."""
+        # Read the version before the rows: a commit that lands in between is
+        # then picked up again on the next call instead of being missed.
+        version = self._db.data_version()
+        with self._lock:
+            if self._roster is not None and version == self._data_version:
+                return read(self._roster)
+            generation = self._generation
+        roster = PrefixIndex(super().get_all(), _character_name)
+        with self._lock:
+            if generation == self._generation:
+                self._roster = roster
+                self._data_version = version
+            return read(roster)
+
+    def _update_roster(
+        self, update: Callable[[PrefixIndex[CharacterData]], None]
+    ) -> None:
+        """Apply a write that reached the database to the cached roster, if any."""
+        with self._lock:
+            self._generation += 1
+            if self._roster is not None:
+                update(self._roster)
+
+    def discard_cache(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._roster = None
+
+    def get_all(self) -> Sequence[CharacterData]:
+        # Callers mutate returned objects before update_and_store, so hand out copies.
+        return self._read_roster(lambda roster: [replace(cdi) for cdi in roster])
+
+    def iter_all(self, batch_size: int | None = None) -> Iterator[CharacterData]:
+        if batch_size is not None:
+            yield from self._iter_pages(batch_size)
+            return
+        # Snapshot the references so that writes during iteration are harmless.
+        for cdi in self._read_roster(list):
+            yield replace(cdi)
+
+    def page(self, after_name: str | None, limit: int) -> Sequence[CharacterData]:
+        return self._read_roster(
+            lambda roster: [replace(cdi) for cdi in roster.page(after_name, limit)]
+        )
+
+    def get_all_for_player(self, player_id: int) -> Sequence[CharacterData]:
+        return self._read_roster(
+            lambda roster: [
+                replace(cdi) for cdi in roster if cdi.player_id == player_id
+            ]
+        )
+
+    def find_prunable(
+        self, threshold_days: int, player_id: int | None = None
+    ) -> Sequence[CharacterData]:
+        return self._read_roster(
+            lambda roster: [
+                replace(cdi)
+                for cdi in roster
+                if (player_id is None or cdi.player_id == player_id)
+                and is_eligible_for_pruning(cdi, threshold_days)
+            ]
+        )
+
+    def prune_many(
+        self, threshold_days: int, player_id: int | None = None
+    ) -> Sequence[str]:
+        names = super().prune_many(threshold_days, player_id)
+
+        def delete(roster: PrefixIndex[CharacterData]) -> None:
+            for name in names:
+                if roster.get(name) is not None:
+                    roster.delete(name)
+
+        self._update_roster(delete)
+        return names
+
+    def _match_name(self, name: str) -> CharacterData:
+        return self._read_roster(lambda roster: replace(roster.match(name)))
+
+    def get_by_initiative(self, since: int) -> Sequence[CharacterData]:
+        # Sort the cached roster instead of querying.
+        return CharacterState.get_by_initiative(self, since)
+
+    def _get_from_normalized_name(self, normalized: str) -> CharacterData | None:
+        cdi = self._read_roster(lambda roster: roster.get_normalized(normalized))
+        return replace(cdi) if cdi is not None else None
+
+    def _add_store_and_get(self, char_data: NewCharacterData) -> CharacterData:
+        cdi = super()._add_store_and_get(char_data)
+        self._update_roster(lambda roster: roster.insert(replace(cdi)))
+        return cdi
+
+    def _rename_and_store(
+        self, char_data: CharacterData, new_name: str
+    ) -> CharacterData:
+        cdi = super()._rename_and_store(char_data, new_name)
+
+        def rename(roster: PrefixIndex[CharacterData]) -> None:
+            if roster.get(char_data.name) is not None:
+                roster.rename(char_data.name, replace(cdi))
+
+        self._update_roster(rename)
+        return cdi
+
+    def update_and_store(self, char_data: CharacterData) -> None:
+        super().update_and_store(char_data)
+
+        def update(roster: PrefixIndex[CharacterData]) -> None:
+            if roster.get(char_data.name) is not None:
+                roster.insert(replace(char_data))
+
+        self._update_roster(update)
+
+    def remove_and_store(self, char_data: CharacterData) -> None:
+        super().remove_and_store(char_data)
+
+        def remove(roster: PrefixIndex[CharacterData]) -> None:
+            if roster.get(char_data.name) is not None:
+                roster.delete(char_data.name)
+
+        self._update_roster(remove)
+
+
 class _SqlPlayerState(_ChangeNotifyMixin, PlayerState):
+    """Player records with a bounded LRU cache for lookups by id and Discord id.
+
+    Every player is looked up on most commands and requests, but players rarely
+    change. The upserts write through to the cache; writes by other processes are
+    noticed via PRAGMA data_version, like in _CachedSqlCharacterState. As there,
+    ``_lock`` is never held across a query.
+    """
+
     def __init__(
-        self, db: sqlite3.Connection, on_change: Callable[[], None] | None = None
+        self,
+        db: _Connections,
+        on_change: Callable[[], None] | None = None,
+        cache_size: int | None = None,
     ) -> None:
         super().__init__(on_change)
         self._db = db
+        self._cache_size = (
+            CORE_CFG.state_player_cache_size if cache_size is None else cache_size
+        )
+        self._by_id: OrderedDict[int, PlayerData] = OrderedDict()
+        self._by_discord_id: OrderedDict[int, PlayerData] = OrderedDict()
+        self._lock = threading.Lock()
+        self._data_version = self._read_data_version()
+        # Bumped by every write through this object, so that a lookup racing with
+        # it does not put the row it read before the write into the cache.
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+
+    def _read_data_version(self) -> int:
+        return self._db.data_version()
+
+    def discard_cache(self) -> None:
+        with self._lock:
+            self._by_id.clear()
+            self._by_discord_id.clear()
+            self._generation += 1
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                hits=self._hits,
+                misses=self._misses,
+                maxsize=self._cache_size,
+                currsize=len(self._by_id),
+            )
+
+    def _remember(self, player: PlayerData, generation: int | None = None) -> None:
+        if not self._cache_size:
+            return
+        with self._lock:
+            if generation is None:
+                self._generation += 1
+            elif generation != self._generation:
+                return
+            for cache, key in (
+                (self._by_id, player.id),
+                (self._by_discord_id, player.discord_id),
+            ):
+                if key is None:
+                    continue
+                cache[key] = replace(player)
+                cache.move_to_end(key)
+                if len(cache) > self._cache_size:
+                    cache.popitem(last=False)
+
+    def _lookup(
+        self,
+        cache: OrderedDict[int, PlayerData],
+        key: int,
+        query: Callable[[], PlayerData | None],
+    ) -> PlayerData | None:
+        if not self._cache_size:
+            return query()
+        version = self._read_data_version()
+        with self._lock:
+            if version != self._data_version:
+                self._by_id.clear()
+                self._by_discord_id.clear()
+                self._data_version = version
+                # Rows that lookups in flight read before the other process's
+                # commit must not be cached after the clear.
+                self._generation += 1
+            player = cache.get(key)
+            if player is not None:
+                cache.move_to_end(key)
+                self._hits += 1
+                return replace(player)
+            self._misses += 1
+            generation = self._generation
+        player = query()
+        if player is not None:
+            self._remember(player, generation)
+        return player
 
     def upsert_discord(self, discord_id: int, name: str) -> PlayerData:
+        # Called at the start of every chat command: skip the write, and the change
+        # notification sent to the web app, unless the display name changed.
+        existing = self.get_from_discord_id(discord_id)
+        if existing is not None and existing.name == name:
+            return existing
         row = self._db.execute(
             "INSERT INTO _sqlplayerdata (discord_id, name) VALUES (?, ?)"
             " ON CONFLICT(discord_id) DO UPDATE SET name=excluded.name"
@@ -158,13 +916,15 @@ class _SqlPlayerState(_ChangeNotifyMixin, PlayerState):
         if row is None:
             raise RuntimeError("UPSERT into _sqlplayerdata returned no row")
         self._notify()
-        return PlayerData(*row)
+        player = PlayerData(*row)
+        self._remember(player)
+        return player
 
     def upsert_standalone(self, name: str) -> PlayerData | str:
-        existing = self._db.execute(
+        existing = self._db.fetchone(
             "SELECT id, discord_id, name FROM _sqlplayerdata WHERE lower(name)=lower(?)",
             (name,),
-        ).fetchone()
+        )
         if existing is not None:
             player = PlayerData(*existing)
             if player.discord_id is not None:
@@ -178,96 +938,228 @@ class _SqlPlayerState(_ChangeNotifyMixin, PlayerState):
         if row is None:
             raise RuntimeError("INSERT into _sqlplayerdata returned no row")
         self._notify()
-        return PlayerData(*row)
+        player = PlayerData(*row)
+        self._remember(player)
+        return player
+
+    def _query_one(self, where: str, key: int) -> PlayerData | None:
+        row = self._db.fetchone(
+            f"SELECT id, discord_id, name FROM _sqlplayerdata WHERE {where}=?",  # noqa: S608
+            (key,),
+        )
+        return PlayerData(*row) if row is not None else None
 
     def get_from_id(self, player_id: int) -> PlayerData:
-        row = self._db.execute(
-            "SELECT id, discord_id, name FROM _sqlplayerdata WHERE id=?",
-            (player_id,),
-        ).fetchone()
-        if row is None:
+        player = self._lookup(
+            self._by_id, player_id, lambda: self._query_one("id", player_id)
+        )
+        if player is None:
             raise KeyError(f"No player with id={player_id}")
-        return PlayerData(*row)
+        return player
 
     def get_from_discord_id(self, discord_id: int) -> PlayerData | None:
-        row = self._db.execute(
-            "SELECT id, discord_id, name FROM _sqlplayerdata WHERE discord_id=?",
-            (discord_id,),
-        ).fetchone()
-        return PlayerData(*row) if row is not None else None
+        return self._lookup(
+            self._by_discord_id,
+            discord_id,
+            lambda: self._query_one("discord_id", discord_id),
+        )
 
     def get_all(self) -> Sequence[PlayerData]:
-        rows = self._db.execute(
+        return self._db.fetchall(
+            "SELECT id, discord_id, name FROM _sqlplayerdata",
+            row_factory=_player_from_row,
+        )
+
+    def iter_all(self, batch_size: int | None = None) -> Iterator[PlayerData]:
+        return self._iter_pages(batch_size or _ITER_BATCH_SIZE)
+
+    def page(self, after_id: int | None, limit: int) -> Sequence[PlayerData]:
+        return self._db.fetchall(
             "SELECT id, discord_id, name FROM _sqlplayerdata"
-        ).fetchall()
-        return [PlayerData(*row) for row in rows]
+            " WHERE id>? ORDER BY id LIMIT ?",
+            (after_id or 0, limit),
+            row_factory=_player_from_row,
+        )
+
+
+# Actions are ordered by sparse positions, so that removing or moving one action
+# does not renumber the others. Moves take the midpoint between the neighbouring
+# positions; only when two neighbours are adjacent are the character's actions
+# spread out again.
+_ACTION_POSITION_GAP: Final[int] = 1024
+# The surrogate id of the character named by the parameters, scope and name, via the
+# UNIQUE (scope, name) index.
+_CHARACTER_ID: Final[str] = (
+    "(SELECT id FROM _sqlcharacterdata WHERE scope=? AND name=?)"
+)
+_NTH_ACTION_ID: Final[str] = (
+    f"SELECT id FROM _sqlcharacteraction WHERE character_id={_CHARACTER_ID}"  # noqa: S608
+    " ORDER BY position, id LIMIT 1 OFFSET ?"
+)
 
 
 class _SqlCharacterActionState(CharacterActionState):
-    # No foreign-key constraint on character_name: adding PRAGMA foreign_keys=ON
-    # to existing deployments risks breaking them. Referential integrity is
-    # maintained at the command layer instead: initbot_chat.commands.character
-    # calls remove_all_for_character() before deleting a character.
-    def __init__(self, db: sqlite3.Connection) -> None:
+    """Actions reference their character's surrogate id with ON DELETE CASCADE.
+
+    Renaming a character therefore updates a single row, and removing or pruning
+    one deletes its actions in the same statement. The methods still take names;
+    each query resolves the name within the scope to the id first.
+    """
+
+    def __init__(self, db: _Connections, scope: int = DEFAULT_SCOPE) -> None:
         self._db = db
+        self._scope = scope
 
     def get_all_for_character(self, character_name: str) -> Sequence[str]:
-        rows = self._db.execute(
-            "SELECT template FROM _sqlcharacteraction WHERE character_name=? ORDER BY position",
-            (character_name,),
-        ).fetchall()
+        rows = self._db.fetchall(
+            "SELECT template FROM _sqlcharacteraction"  # noqa: S608
+            f" WHERE character_id={_CHARACTER_ID} ORDER BY position, id",
+            (self._scope, character_name),
+        )
         return [row[0] for row in rows]
 
+    def get_all_for_characters(
+        self, character_names: Iterable[str]
+    ) -> Mapping[str, Sequence[str]]:
+        names = list(dict.fromkeys(character_names))
+        actions: dict[str, list[str]] = {name: [] for name in names}
+        # Stay below SQLite's historical limit of 999 host parameters per statement.
+        for start in range(0, len(names), _MAX_PARAMS - 1):
+            chunk = names[start : start + _MAX_PARAMS - 1]
+            placeholders = ",".join("?" * len(chunk))
+            for name, template in self._db.fetchall(
+                "SELECT c.name, a.template FROM _sqlcharacterdata AS c"  # noqa: S608
+                " JOIN _sqlcharacteraction AS a ON a.character_id=c.id"
+                f" WHERE c.scope=? AND c.name IN ({placeholders})"
+                " ORDER BY a.character_id, a.position, a.id",
+                (self._scope, *chunk),
+            ):
+                actions[name].append(template)
+        return actions
+
+    def _count(self, character_name: str) -> int:
+        row = self._db.fetchone(
+            f"SELECT COUNT(*) FROM _sqlcharacteraction WHERE character_id={_CHARACTER_ID}",  # noqa: S608
+            (self._scope, character_name),
+        )
+        return row[0] if row is not None else 0
+
+    def _index_error(self, character_name: str, index: int) -> IndexError:
+        return IndexError(
+            f"Action index {index} out of range (1-{self._count(character_name)})"
+        )
+
     def add(self, character_name: str, template: str) -> int:
+        # The (character_id, position) index answers MAX() without a scan. Inserts
+        # nothing if there is no such character.
         row = self._db.execute(
-            "INSERT INTO _sqlcharacteraction (character_name, position, template)"
-            " VALUES (?, (SELECT COUNT(*) FROM _sqlcharacteraction WHERE character_name=?), ?)"
-            " RETURNING position + 1",
-            (character_name, character_name, template),
+            "INSERT INTO _sqlcharacteraction (character_id, position, template)"  # noqa: S608
+            " SELECT c.id, (SELECT COALESCE(MAX(position) + ?, 0)"
+            " FROM _sqlcharacteraction WHERE character_id=c.id), ?"
+            " FROM _sqlcharacterdata AS c WHERE c.scope=? AND c.name=?"
+            " RETURNING (SELECT COUNT(*) FROM _sqlcharacteraction"
+            f" WHERE character_id={_CHARACTER_ID})",
+            (
+                _ACTION_POSITION_GAP,
+                template,
+                self._scope,
+                character_name,
+                self._scope,
+                character_name,
+            ),
         ).fetchone()
         if row is None:
-            raise RuntimeError("INSERT into _sqlcharacteraction returned no row")
+            raise KeyError(f"Unable to find character with name '{character_name}'")
         return row[0]
 
     def update(self, character_name: str, index: int, template: str) -> None:
-        actions = self.get_all_for_character(character_name)
-        if not 1 <= index <= len(actions):
-            raise IndexError(f"Action index {index} out of range (1-{len(actions)})")
-        self._db.execute(
-            "UPDATE _sqlcharacteraction SET template=? WHERE character_name=? AND position=?",
-            (template, character_name, index - 1),
-        )
+        # A negative OFFSET counts as none in SQLite, hence the explicit lower bound.
+        if index >= 1:
+            cursor = self._db.execute(
+                f"UPDATE _sqlcharacteraction SET template=? WHERE id=({_NTH_ACTION_ID})",  # noqa: S608
+                (template, self._scope, character_name, index - 1),
+            )
+            if cursor.rowcount:
+                return
+        raise self._index_error(character_name, index)
 
     def remove(self, character_name: str, index: int) -> None:
-        actions = self.get_all_for_character(character_name)
-        if not 1 <= index <= len(actions):
-            raise IndexError(f"Action index {index} out of range (1-{len(actions)})")
-        pos = index - 1
-        self._db.execute(
-            "DELETE FROM _sqlcharacteraction WHERE character_name=? AND position=?",
-            (character_name, pos),
-        )
-        self._db.execute(
-            "UPDATE _sqlcharacteraction SET position=position-1 WHERE character_name=? AND position>?",
-            (character_name, pos),
-        )
+        # Positions are sparse, so the later actions keep theirs.
+        if index >= 1:
+            cursor = self._db.execute(
+                f"DELETE FROM _sqlcharacteraction WHERE id=({_NTH_ACTION_ID})",  # noqa: S608
+                (self._scope, character_name, index - 1),
+            )
+            if cursor.rowcount:
+                return
+        raise self._index_error(character_name, index)
 
-    def remove_all_for_character(self, character_name: str) -> None:
-        self._db.execute(
-            "DELETE FROM _sqlcharacteraction WHERE character_name=?",
-            (character_name,),
-        )
+    def move(self, character_name: str, from_index: int, to_index: int) -> None:
+        with self._db.savepoint("_initbot_move"):
+            count = self._count(character_name)
+            for index in (from_index, to_index):
+                if not 1 <= index <= count:
+                    raise IndexError(f"Action index {index} out of range (1-{count})")
+            if from_index == to_index:
+                return
+            row = self._db.fetchone(
+                _NTH_ACTION_ID, (self._scope, character_name, from_index - 1)
+            )
+            action_id = row[0]
+            position = self._free_position(character_name, action_id, to_index)
+            if position is None:
+                self._rebalance(character_name)
+                position = self._free_position(character_name, action_id, to_index)
+            self._db.execute(
+                "UPDATE _sqlcharacteraction SET position=? WHERE id=?",
+                (position, action_id),
+            )
+
+    def _free_position(
+        self, character_name: str, action_id: int, to_index: int
+    ) -> int | None:
+        """Return a position that sorts the action to to_index among the others.
 
-    def rename_character(self, old_name: str, new_name: str) -> None:
+        Returns None if the neighbouring positions leave no gap.
+        """
+        neighbours = [
+            row[0]
+            for row in self._db.fetchall(
+                "SELECT position FROM _sqlcharacteraction"  # noqa: S608
+                f" WHERE character_id={_CHARACTER_ID} AND id<>?"
+                " ORDER BY position, id LIMIT 2 OFFSET ?",
+                (self._scope, character_name, action_id, max(to_index - 2, 0)),
+            )
+        ]
+        if to_index == 1:
+            return neighbours[0] - _ACTION_POSITION_GAP
+        if len(neighbours) == 1:
+            return neighbours[0] + _ACTION_POSITION_GAP
+        before, after = neighbours
+        return (before + after) // 2 if after - before > 1 else None
+
+    def _rebalance(self, character_name: str) -> None:
         self._db.execute(
-            "UPDATE _sqlcharacteraction SET character_name=? WHERE character_name=?",
-            (new_name, old_name),
+            "UPDATE _sqlcharacteraction SET position=ranked.rank * ? FROM"  # noqa: S608
+            " (SELECT id, ROW_NUMBER() OVER (ORDER BY position, id) - 1 AS rank"
+            f"  FROM _sqlcharacteraction WHERE character_id={_CHARACTER_ID}) AS ranked"
+            " WHERE _sqlcharacteraction.id=ranked.id",
+            (_ACTION_POSITION_GAP, self._scope, character_name),
         )
 
 
 class _SqlWebLoginTokenState(WebLoginTokenState):
-    def __init__(self, db: sqlite3.Connection) -> None:
+    """Login tokens in _sqlweblogintoken, shared by the chat bot and the web app.
+
+    Tokens are random and never reused, so once a token is known to be used or
+    expired, that cannot change; such tokens are remembered with their expiry in
+    _spent and answered without a query, e.g. when a crawler fetches a login link
+    again. Entries are dropped with the expired rows by prune_expired().
+    """
+
+    def __init__(self, db: _Connections) -> None:
         self._db = db
+        self._spent: dict[str, int] = {}
 
     def create(self, discord_id: int) -> str:
         token = secrets.token_urlsafe(32)
@@ -279,18 +1171,37 @@ class _SqlWebLoginTokenState(WebLoginTokenState):
         return token
 
     def find_valid(self, token: str) -> int | None:
+        if token in self._spent:
+            return None
+        now = int(time.time())
+        row = self._db.fetchone(
+            "SELECT discord_id, expires_at, used FROM _sqlweblogintoken WHERE token=?",
+            (token,),
+        )
+        if row is None:
+            return None
+        discord_id, expires_at, used = row
+        if used or expires_at <= now:
+            self._spent[token] = expires_at
+            return None
+        return discord_id
+
+    def consume(self, token: str) -> int | None:
+        if token in self._spent:
+            return None
         now = int(time.time())
         row = self._db.execute(
-            "SELECT discord_id FROM _sqlweblogintoken WHERE token=? AND used=0 AND expires_at>?",
+            "UPDATE _sqlweblogintoken SET used=1 WHERE token=? AND used=0 AND expires_at>?"
+            " RETURNING discord_id, expires_at",
             (token, now),
         ).fetchone()
-        return row[0] if row is not None else None
+        if row is None:
+            return None
+        self._spent[token] = row[1]
+        return row[0]
 
     def mark_used(self, token: str) -> None:
-        self._db.execute(
-            "UPDATE _sqlweblogintoken SET used=1 WHERE token=?",
-            (token,),
-        )
+        self.consume(token)
 
     def prune_expired(self) -> None:
         now = int(time.time())
@@ -298,16 +1209,20 @@ class _SqlWebLoginTokenState(WebLoginTokenState):
             "DELETE FROM _sqlweblogintoken WHERE expires_at<=?",
             (now,),
         )
+        # Copied first; lookups on other threads may add entries meanwhile.
+        for token, expires_at in list(self._spent.items()):
+            if expires_at <= now:
+                self._spent.pop(token, None)
 
 
 class _SqlSessionSecretState(SessionSecretState):
-    def __init__(self, db: sqlite3.Connection) -> None:
+    def __init__(self, db: _Connections) -> None:
         self._db = db
 
     def _load(self) -> tuple[str, int] | None:
-        row = self._db.execute(
+        row = self._db.fetchone(
             "SELECT secret, expires_at FROM _sqlsessionsecret WHERE id=1"
-        ).fetchone()
+        )
         return (str(row[0]), int(row[1])) if row is not None else None
 
     def _store(self, secret: str, expires_at: int) -> None:
@@ -318,9 +1233,376 @@ class _SqlSessionSecretState(SessionSecretState):
         )
 
 
+def _migrate_legacy_schema(db: sqlite3.Connection) -> None:
+    """Create the tables and bring databases from before versioned migrations up to date.
+
+    Every step is idempotent because databases at user_version 0 may come from any
+    earlier release.
+    """
+    for statement in _CREATE_TABLES.strip().split(";"):
+        statement = statement.strip()
+        if statement:
+            db.execute(statement)
+
+    cursor = db.execute("PRAGMA table_info(_sqlcharacterdata);")
+    columns = [row[1] for row in cursor.fetchall()]
+
+    obsolete = {
+        "active",
+        "level",
+        "strength",
+        "agility",
+        "stamina",
+        "personality",
+        "intelligence",
+        "luck",
+        "initial_luck",
+        "hit_points",
+        "equipment",
+        "occupation",
+        "exp",
+        "alignment",
+        "initiative_modifier",
+        "initiative_time",
+        "hit_die",
+        "augur",
+        "cls",
+        "creation_time",
+        "user",
+    }
+    needs_rebuild = bool(obsolete & set(columns))
+
+    if "initiative_dice" not in columns:
+        db.execute(
+            "ALTER TABLE _sqlcharacterdata ADD COLUMN initiative_dice TEXT DEFAULT NULL;"
+        )
+    if "last_used" not in columns:
+        db.execute(
+            "ALTER TABLE _sqlcharacterdata ADD COLUMN last_used INTEGER DEFAULT NULL;"
+        )
+    if "player_id" not in columns:
+        db.execute(
+            "ALTER TABLE _sqlcharacterdata ADD COLUMN player_id INTEGER DEFAULT NULL;"
+        )
+
+    if needs_rebuild:
+        db.execute("""
+            CREATE TABLE _sqlcharacterdata_new (
+                name TEXT NOT NULL PRIMARY KEY,
+                player_id INTEGER,
+                initiative INTEGER,
+                initiative_dice TEXT,
+                last_used INTEGER,
+                name_key TEXT
+            );
+        """)
+        db.execute("""
+            INSERT INTO _sqlcharacterdata_new
+                (name, player_id, initiative, initiative_dice, last_used)
+            SELECT name, player_id, initiative, initiative_dice, last_used
+            FROM _sqlcharacterdata;
+        """)
+        db.execute("DROP TABLE _sqlcharacterdata;")
+        db.execute("ALTER TABLE _sqlcharacterdata_new RENAME TO _sqlcharacterdata;")
+    elif "name_key" not in columns:
+        db.execute("ALTER TABLE _sqlcharacterdata ADD COLUMN name_key TEXT;")
+
+    # name_key holds normalize_str(name). It is computed in Python because
+    # SQLite's lower() only folds ASCII.
+    unkeyed = db.execute(
+        "SELECT name FROM _sqlcharacterdata WHERE name_key IS NULL;"
+    ).fetchall()
+    db.executemany(
+        "UPDATE _sqlcharacterdata SET name_key=? WHERE name=?;",
+        [(normalize_str(name), name) for (name,) in unkeyed],
+    )
+    try:
+        db.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS _sqlcharacterdata_name_key"
+            " ON _sqlcharacterdata (name_key);"
+        )
+    except sqlite3.IntegrityError:
+        # Databases from before names were unique ignoring case may hold
+        # names that differ only in case. Keep them and index without the
+        # constraint; the uniqueness check in CharacterState still applies.
+        _log.warning(
+            "Character names that differ only in case exist; "
+            "name_key index created without a UNIQUE constraint"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS _sqlcharacterdata_name_key"
+            " ON _sqlcharacterdata (name_key);"
+        )
+
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS _sqlcharacterdata_player_id"
+        " ON _sqlcharacterdata (player_id);"
+    )
+
+    # Assign a grace-period last_used to rows that have none, so they
+    # are not immediately eligible for pruning after this migration.
+    grace_ts = int(time.time()) - CORE_CFG.prune_threshold_days * 86400 // 2
+    db.execute(
+        "UPDATE _sqlcharacterdata SET last_used=? WHERE last_used IS NULL;",
+        (grace_ts,),
+    )
+
+
+# Number of _changelog entries kept; older ones are deleted by a trigger. Changing
+# this requires a migration that recreates _changelog_truncate.
+_CHANGELOG_RETAINED: Final[int] = 1000
+
+
+def _add_changelog(db: sqlite3.Connection) -> None:
+    """Record every character and player change in _changelog via triggers.
+
+    Triggers rather than Python code maintain the log so that writes by every
+    process and every code path are covered. The AUTOINCREMENT revision never
+    goes backwards, even after the oldest entries have been truncated.
+    """
+    db.execute("""
+        CREATE TABLE _changelog (
+            revision INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            key NOT NULL,
+            op TEXT NOT NULL
+        );
+    """)
+    for table, entity, key in (
+        ("_sqlcharacterdata", "character", "name"),
+        ("_sqlplayerdata", "player", "id"),
+    ):
+        db.execute(f"""
+            CREATE TRIGGER {table}_log_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO _changelog (entity, key, op)
+                VALUES ('{entity}', NEW.{key}, 'upsert');
+            END;
+        """)  # noqa: S608
+        db.execute(f"""
+            CREATE TRIGGER {table}_log_update AFTER UPDATE ON {table} BEGIN
+                INSERT INTO _changelog (entity, key, op)
+                SELECT '{entity}', OLD.{key}, 'delete' WHERE OLD.{key} IS NOT NEW.{key};
+                INSERT INTO _changelog (entity, key, op)
+                VALUES ('{entity}', NEW.{key}, 'upsert');
+            END;
+        """)  # noqa: S608
+        db.execute(f"""
+            CREATE TRIGGER {table}_log_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO _changelog (entity, key, op)
+                VALUES ('{entity}', OLD.{key}, 'delete');
+            END;
+        """)  # noqa: S608
+    db.execute(f"""
+        CREATE TRIGGER _changelog_truncate AFTER INSERT ON _changelog BEGIN
+            DELETE FROM _changelog
+            WHERE revision <= NEW.revision - {_CHANGELOG_RETAINED};
+        END;
+    """)  # noqa: S608
+
+
+def _add_last_used_index(db: sqlite3.Connection) -> None:
+    """Index last_used so that finding characters to prune needs no table scan."""
+    db.execute(
+        "CREATE INDEX _sqlcharacterdata_last_used ON _sqlcharacterdata (last_used);"
+    )
+
+
+def _add_action_position_index(db: sqlite3.Connection) -> None:
+    """Index actions by character and position; every action query filters on both."""
+    db.execute(
+        "CREATE INDEX _sqlcharacteraction_position"
+        " ON _sqlcharacteraction (character_name, position);"
+    )
+
+
+def _spread_action_positions(db: sqlite3.Connection) -> None:
+    """Renumber action positions from contiguous to sparse, see _ACTION_POSITION_GAP."""
+    db.execute(
+        "UPDATE _sqlcharacteraction SET position=ranked.rank * ? FROM"
+        " (SELECT id, ROW_NUMBER() OVER"
+        "  (PARTITION BY character_name ORDER BY position, id) - 1 AS rank"
+        "  FROM _sqlcharacteraction) AS ranked"
+        " WHERE _sqlcharacteraction.id=ranked.id",
+        (_ACTION_POSITION_GAP,),
+    )
+
+
+def _add_character_scopes(db: sqlite3.Connection) -> None:
+    """Partition characters by scope, see State.scoped(); existing ones keep DEFAULT_SCOPE.
+
+    The composite indexes serve name matching and the initiative order within one
+    scope. Names become unique ignoring case per scope: the UNIQUE name_key index
+    gives way to a UNIQUE (scope, name_key) one, and _add_character_ids replaces the
+    name primary key with UNIQUE (scope, name). The change log records the scope of
+    character entries, see _get_changes_since.
+    """
+    db.execute(
+        "ALTER TABLE _sqlcharacterdata"
+        f" ADD COLUMN scope INTEGER NOT NULL DEFAULT {DEFAULT_SCOPE};"
+    )
+    db.execute("DROP INDEX _sqlcharacterdata_name_key;")
+    try:
+        db.execute(
+            "CREATE UNIQUE INDEX _sqlcharacterdata_scope_name_key"
+            " ON _sqlcharacterdata (scope, name_key);"
+        )
+    except sqlite3.IntegrityError:
+        # See _migrate_legacy_schema: names that differ only in case are kept.
+        _log.warning(
+            "Character names that differ only in case exist; "
+            "(scope, name_key) index created without a UNIQUE constraint"
+        )
+        db.execute(
+            "CREATE INDEX _sqlcharacterdata_scope_name_key"
+            " ON _sqlcharacterdata (scope, name_key);"
+        )
+    db.execute(
+        "CREATE INDEX _sqlcharacterdata_scope_initiative"
+        " ON _sqlcharacterdata (scope, initiative);"
+    )
+    # Entries logged before have no scope.
+    db.execute("ALTER TABLE _changelog ADD COLUMN scope INTEGER;")
+    for operation in ("insert", "update", "delete"):
+        db.execute(f"DROP TRIGGER _sqlcharacterdata_log_{operation};")
+    db.execute("""
+        CREATE TRIGGER _sqlcharacterdata_log_insert AFTER INSERT ON _sqlcharacterdata
+        BEGIN
+            INSERT INTO _changelog (entity, key, op, scope)
+            VALUES ('character', NEW.name, 'upsert', NEW.scope);
+        END;
+    """)
+    db.execute("""
+        CREATE TRIGGER _sqlcharacterdata_log_update AFTER UPDATE ON _sqlcharacterdata
+        BEGIN
+            INSERT INTO _changelog (entity, key, op, scope)
+            SELECT 'character', OLD.name, 'delete', OLD.scope
+            WHERE OLD.name IS NOT NEW.name OR OLD.scope IS NOT NEW.scope;
+            INSERT INTO _changelog (entity, key, op, scope)
+            VALUES ('character', NEW.name, 'upsert', NEW.scope);
+        END;
+    """)
+    db.execute("""
+        CREATE TRIGGER _sqlcharacterdata_log_delete AFTER DELETE ON _sqlcharacterdata
+        BEGIN
+            INSERT INTO _changelog (entity, key, op, scope)
+            VALUES ('character', OLD.name, 'delete', OLD.scope);
+        END;
+    """)
+
+
+def _add_character_ids(db: sqlite3.Connection) -> None:
+    """Give characters a surrogate id that actions reference, see _SqlCharacterActionState.
+
+    SQLite cannot add a primary or foreign key to a table, so both tables are
+    rebuilt; character ids are the old rowids, and names are unique per scope, see
+    _add_character_scopes. The character indexes and change log triggers are
+    recreated from their stored SQL, which keeps e.g. a (scope, name_key) index that
+    could not be made UNIQUE. Actions of characters that no longer exist have
+    nothing to reference and are dropped.
+    """
+    definitions = [
+        row[0]
+        for row in db.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name='_sqlcharacterdata'"
+            " AND type IN ('index', 'trigger') AND sql IS NOT NULL ORDER BY rowid"
+        )
+    ]
+    orphans = db.execute(
+        "SELECT COUNT(*) FROM _sqlcharacteraction WHERE character_name NOT IN"
+        " (SELECT name FROM _sqlcharacterdata)"
+    ).fetchone()[0]
+    if orphans:
+        _log.warning("Dropping %d actions of characters that do not exist", orphans)
+    db.execute(f"""
+        CREATE TABLE _sqlcharacterdata_new (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            player_id INTEGER,
+            initiative INTEGER,
+            initiative_dice TEXT,
+            last_used INTEGER,
+            name_key TEXT,
+            scope INTEGER NOT NULL DEFAULT {DEFAULT_SCOPE},
+            UNIQUE (scope, name)
+        );
+    """)
+    db.execute("""
+        INSERT INTO _sqlcharacterdata_new
+            (id, name, player_id, initiative, initiative_dice, last_used, name_key, scope)
+        SELECT rowid, name, player_id, initiative, initiative_dice, last_used, name_key, scope
+        FROM _sqlcharacterdata;
+    """)
+    db.execute("""
+        CREATE TABLE _sqlcharacteraction_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            character_id INTEGER NOT NULL
+                REFERENCES _sqlcharacterdata (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            template TEXT NOT NULL
+        );
+    """)
+    db.execute("""
+        INSERT INTO _sqlcharacteraction_new (id, character_id, position, template)
+        SELECT a.id, c.rowid, a.position, a.template
+        FROM _sqlcharacteraction AS a JOIN _sqlcharacterdata AS c
+        ON c.name=a.character_name;
+    """)
+    db.execute("DROP TABLE _sqlcharacteraction;")
+    db.execute("DROP TABLE _sqlcharacterdata;")
+    db.execute("ALTER TABLE _sqlcharacterdata_new RENAME TO _sqlcharacterdata;")
+    db.execute("ALTER TABLE _sqlcharacteraction_new RENAME TO _sqlcharacteraction;")
+    for definition in definitions:
+        db.execute(definition)
+    # Also serves the ON DELETE CASCADE lookups.
+    db.execute(
+        "CREATE INDEX _sqlcharacteraction_position"
+        " ON _sqlcharacteraction (character_id, position);"
+    )
+
+
+def _add_login_token_expiry_index(db: sqlite3.Connection) -> None:
+    """Index expires_at so that pruning expired login tokens needs no table scan."""
+    db.execute(
+        "CREATE INDEX _sqlweblogintoken_expires_at ON _sqlweblogintoken (expires_at);"
+    )
+
+
+def _add_character_name_order_index(db: sqlite3.Connection) -> None:
+    """Index characters by scope, name_key and name, the order page() reads them in."""
+    db.execute(
+        "CREATE INDEX _sqlcharacterdata_scope_key_name"
+        " ON _sqlcharacterdata (scope, name_key, name);"
+    )
+
+
+# Schema migrations in order; a database at PRAGMA user_version N has had the first
+# N applied. Append new migrations, never edit or reorder released ones.
+_MIGRATIONS: Final[tuple[Callable[[sqlite3.Connection], None], ...]] = (
+    _migrate_legacy_schema,
+    _add_changelog,
+    _add_last_used_index,
+    _add_action_position_index,
+    _spread_action_positions,
+    _add_character_scopes,
+    _add_character_ids,
+    _add_login_token_expiry_index,
+    _add_character_name_order_index,
+)
+
+# The PRAGMA user_version of a database with every migration applied.
+SCHEMA_VERSION: Final[int] = len(_MIGRATIONS)
+
+
 class SqlState(State):
     def __init__(
-        self, source: str, on_change: Callable[[], None] | None = None
+        self,
+        source: str,
+        on_change: Callable[[], None] | None = None,
+        cache: bool | None = None,
+        readers: int | None = None,
+        busy_timeout: float | None = None,
+        busy_retries: int | None = None,
+        statement_stats: bool | None = None,
     ) -> None:
         state_type, state_source = source.split(":", maxsplit=1)
         if state_type != "sqlite":
@@ -328,98 +1610,110 @@ class SqlState(State):
 
         path = Path(state_source)
         check_state_directory(source, path.parent)
+        self._path = None if state_source == ":memory:" else path
 
+        if busy_timeout is None:
+            busy_timeout = CORE_CFG.state_busy_timeout
+        if busy_retries is None:
+            busy_retries = CORE_CFG.state_busy_retries
         self._db = sqlite3.connect(
             path,
+            timeout=busy_timeout,
             check_same_thread=False,
             isolation_level=None,  # autocommit
         )
         self._db.execute("PRAGMA journal_mode=WAL;")
         self._db.execute("PRAGMA synchronous=NORMAL;")
 
-        for statement in _CREATE_TABLES.strip().split(";"):
-            statement = statement.strip()
-            if statement:
-                self._db.execute(statement)
-
-        self._migrate(self._db)
+        started = perf_counter()
+        applied = self._migrate(self._db, busy_retries)
+        # Per connection, and only outside a transaction; the actions of a removed
+        # character are deleted by the ON DELETE CASCADE of _sqlcharacteraction.
+        self._db.execute("PRAGMA foreign_keys=ON;")
+        _log.info(
+            "Opened %s in %.1f ms (%d schema migrations applied)",
+            source,
+            (perf_counter() - started) * 1000,
+            applied,
+        )
 
-        self._characters = _SqlCharacterState(self._db, on_change)
-        self._players = _SqlPlayerState(self._db, on_change)
-        self._web_login_tokens = _SqlWebLoginTokenState(self._db)
-        self._character_actions = _SqlCharacterActionState(self._db)
-        self._session_secret = _SqlSessionSecretState(self._db)
+        self._connections = _Connections(
+            self._db,
+            busy_retries,
+            CORE_CFG.state_statement_stats
+            if statement_stats is None
+            else statement_stats,
+            CORE_CFG.state_slow_statement_ms / 1000,
+            # Each reader of a :memory: database would see its own empty database.
+            reader_uri=None
+            if self._path is None
+            else f"{path.absolute().as_uri()}?mode=ro",
+            max_readers=CORE_CFG.state_readers if readers is None else readers,
+            busy_timeout=busy_timeout,
+        )
+        self._last_maintenance: MaintenanceReport | None = None
+        self._transaction_depth = 0
+        self._notifier = _DeferrableNotifier(on_change)
+        self._character_state_type = (
+            _CachedSqlCharacterState
+            if (CORE_CFG.state_cache if cache is None else cache)
+            else _SqlCharacterState
+        )
+        self._characters = self._character_state_type(self._connections, self._notifier)
+        # The character states of other scopes, created on first use and kept so
+        # that each keeps its cached roster.
+        self._scoped_characters: dict[int, _SqlCharacterState] = {}
+        self._scoped_characters_lock = threading.Lock()
+        self._players = _SqlPlayerState(self._connections, self._notifier)
+        self._web_login_tokens = _SqlWebLoginTokenState(self._connections)
+        self._character_actions = _SqlCharacterActionState(self._connections)
+        self._session_secret = _SqlSessionSecretState(self._connections)
 
     @staticmethod
-    def _migrate(db: sqlite3.Connection) -> None:
-        """Apply schema migrations for databases created by older versions."""
-        cursor = db.execute("PRAGMA table_info(_sqlcharacterdata);")
-        columns = [row[1] for row in cursor.fetchall()]
-
-        obsolete = {
-            "active",
-            "level",
-            "strength",
-            "agility",
-            "stamina",
-            "personality",
-            "intelligence",
-            "luck",
-            "initial_luck",
-            "hit_points",
-            "equipment",
-            "occupation",
-            "exp",
-            "alignment",
-            "initiative_modifier",
-            "initiative_time",
-            "hit_die",
-            "augur",
-            "cls",
-            "creation_time",
-            "user",
-        }
-        needs_rebuild = bool(obsolete & set(columns))
-
-        if "initiative_dice" not in columns:
-            db.execute(
-                "ALTER TABLE _sqlcharacterdata ADD COLUMN initiative_dice TEXT DEFAULT NULL;"
-            )
-        if "last_used" not in columns:
-            db.execute(
-                "ALTER TABLE _sqlcharacterdata ADD COLUMN last_used INTEGER DEFAULT NULL;"
-            )
-        if "player_id" not in columns:
-            db.execute(
-                "ALTER TABLE _sqlcharacterdata ADD COLUMN player_id INTEGER DEFAULT NULL;"
-            )
+    def _migrate(db: sqlite3.Connection, busy_retries: int = 0) -> int:
+        """Apply the migrations the database has not seen yet; return how many ran.
 
-        if needs_rebuild:
-            db.execute("""
-                CREATE TABLE _sqlcharacterdata_new (
-                    name TEXT NOT NULL PRIMARY KEY,
-                    player_id INTEGER,
-                    initiative INTEGER,
-                    initiative_dice TEXT,
-                    last_used INTEGER
-                );
-            """)
-            db.execute("""
-                INSERT INTO _sqlcharacterdata_new
-                    (name, player_id, initiative, initiative_dice, last_used)
-                SELECT name, player_id, initiative, initiative_dice, last_used
-                FROM _sqlcharacterdata;
-            """)
-            db.execute("DROP TABLE _sqlcharacterdata;")
-            db.execute("ALTER TABLE _sqlcharacterdata_new RENAME TO _sqlcharacterdata;")
-
-        # Assign a grace-period last_used to rows that have none, so they
-        # are not immediately eligible for pruning after this migration.
-        grace_ts = int(time.time()) - CORE_CFG.prune_threshold_days * 86400 // 2
-        db.execute(
-            "UPDATE _sqlcharacterdata SET last_used=? WHERE last_used IS NULL;",
-            (grace_ts,),
-        )
+        Each migration runs in its own transaction together with the user_version
+        bump. The version is checked again after taking the write lock because the
+        chat bot and the web app may start at the same time. Taking the write lock
+        is retried ``busy_retries`` times like a write, see _Connections.
+        """
+        applied = 0
+        attempt = 0
+        version = db.execute("PRAGMA user_version;").fetchone()[0]
+        if version > len(_MIGRATIONS):
+            _log.warning(
+                "Database schema version %d is newer than this release supports (%d)",
+                version,
+                len(_MIGRATIONS),
+            )
+        while version < len(_MIGRATIONS):
+            try:
+                db.execute("BEGIN IMMEDIATE;")
+            except sqlite3.OperationalError as err:
+                if not _is_busy(err):
+                    raise
+                if attempt >= busy_retries:
+                    _log.warning(
+                        "Database is locked, gave up migrating after %d retries",
+                        attempt,
+                    )
+                    raise
+                _wait_before_retry(attempt)
+                attempt += 1
+                continue
+            try:
+                version = db.execute("PRAGMA user_version;").fetchone()[0]
+                if version < len(_MIGRATIONS):
+                    _MIGRATIONS[version](db)
+                    version += 1
+                    db.execute(f"PRAGMA user_version={version};")
+                    applied += 1
+                db.execute("COMMIT;")
+            except BaseException:
+                db.execute("ROLLBACK;")
+                raise
+        return applied
 
     @property
     def characters(self) -> CharacterState:
@@ -440,3 +1734,236 @@ class SqlState(State):
     @property
     def session_secret(self) -> SessionSecretState:
         return self._session_secret
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        # The connection runs in autocommit mode, so the outermost block opens an
+        # explicit transaction and nested blocks use savepoints. BEGIN IMMEDIATE
+        # takes the write lock up front instead of upgrading a read lock later,
+        # which could fail with SQLITE_BUSY halfway through the block. The writer's
+        # thread lock is held throughout, so other threads wait instead of writing
+        # into this transaction.
+        with self._connections.write_lock:
+            savepoint = (
+                f"_initbot_{self._transaction_depth}"
+                if self._transaction_depth
+                else None
+            )
+            if savepoint:
+                self._db.execute(f"SAVEPOINT {savepoint};")
+            else:
+                # Taking the write lock is safe to retry, unlike the statements after it.
+                self._connections.execute("BEGIN IMMEDIATE;")
+            self._connections.transaction_thread = threading.get_ident()
+            self._transaction_depth += 1
+            self._notifier.deferring = True
+            try:
+                yield
+                self._connections.execute(
+                    f"RELEASE {savepoint};" if savepoint else "COMMIT;"
+                )
+            except BaseException:
+                if savepoint:
+                    self._db.execute(f"ROLLBACK TO {savepoint};")
+                    self._db.execute(f"RELEASE {savepoint};")
+                else:
+                    self._db.execute("ROLLBACK;")
+                    self._notifier.discard()
+                self._characters.discard_cache()
+                with self._scoped_characters_lock:
+                    for characters in self._scoped_characters.values():
+                        characters.discard_cache()
+                self._players.discard_cache()
+                raise
+            finally:
+                self._transaction_depth -= 1
+                self._notifier.deferring = self._transaction_depth > 0
+                if not self._transaction_depth:
+                    self._connections.transaction_thread = None
+        if not savepoint:
+            self._notifier.flush()
+
+    @staticmethod
+    def _wal_bytes(path: Path) -> int:
+        try:
+            return path.with_name(f"{path.name}-wal").stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def maintain(self) -> MaintenanceReport | None:
+        """Let SQLite refresh statistics, checkpoint the WAL and measure the database.
+
+        A PASSIVE checkpoint copies what it can into the database without waiting
+        for readers. Once the WAL file has grown beyond CORE_CFG.state_wal_truncate_bytes,
+        a TRUNCATE checkpoint waits for readers and shrinks it back to zero bytes.
+        Writes of this process wait for it, reads go to the read-only connections;
+        call it with run_on_state(..., in_thread=True) to keep the event loop free.
+        """
+        if self._path is None:
+            return None
+        db = self._connections
+        # Hold the write lock throughout, so that the checkpoint never runs inside
+        # another thread's transaction and the WAL sizes belong to this run.
+        with db.write_lock:
+            # Optimize first: the ANALYZE it may run writes to the WAL, which the
+            # checkpoint then includes.
+            db.execute("PRAGMA optimize;")
+            wal_bytes_before = self._wal_bytes(self._path)
+            mode = (
+                "TRUNCATE"
+                if wal_bytes_before > CORE_CFG.state_wal_truncate_bytes
+                else "PASSIVE"
+            )
+            busy, _, checkpointed = db.execute(
+                f"PRAGMA wal_checkpoint({mode});"
+            ).fetchone()
+            wal_bytes = self._wal_bytes(self._path)
+        page_size = db.fetchone("PRAGMA page_size;")[0]
+        page_count = db.fetchone("PRAGMA page_count;")[0]
+        freelist_count = db.fetchone("PRAGMA freelist_count;")[0]
+        report = MaintenanceReport(
+            checkpoint_mode=mode,
+            checkpoint_busy=bool(busy),
+            checkpointed_frames=max(checkpointed, 0),
+            wal_bytes_before=wal_bytes_before,
+            wal_bytes=wal_bytes,
+            db_bytes=page_size * page_count,
+            free_bytes=page_size * freelist_count,
+        )
+        _log.info(
+            "Maintained %s: %s checkpoint of %d frames%s, WAL %d -> %d bytes,"
+            " database %d bytes (%d free)",
+            self._path,
+            mode,
+            report.checkpointed_frames,
+            " (busy)" if report.checkpoint_busy else "",
+            report.wal_bytes_before,
+            report.wal_bytes,
+            report.db_bytes,
+            report.free_bytes,
+        )
+        statements = sorted(
+            self._connections.statement_stats().items(),
+            key=lambda item: item[1].total_seconds,
+            reverse=True,
+        )
+        for template, stats in statements[:_LOGGED_STATEMENTS]:
+            _log.info(
+                "%.1f ms in %d calls (max %.1f ms): %s",
+                stats.total_seconds * 1000,
+                stats.calls,
+                stats.max_seconds * 1000,
+                template,
+            )
+        self._last_maintenance = report
+        return report
+
+    def vacuum_into(self, target: Path) -> None:
+        """Write a compacted copy of the database to target, which must not exist.
+
+        Runs online: it reads a consistent snapshot while other connections keep
+        reading and writing. Swap the copy in while the applications are stopped.
+        """
+        if target.exists():
+            raise FileExistsError(target)
+        started = perf_counter()
+        self._connections.execute("VACUUM INTO ?;", (str(target),))
+        _log.info(
+            "Compacted %s into %s (%d bytes) in %.1f ms",
+            self._path,
+            target,
+            target.stat().st_size,
+            (perf_counter() - started) * 1000,
+        )
+
+    def lock_stats(self) -> LockStats:
+        return self._connections.lock_stats()
+
+    def stats(self) -> StateStats:
+        return replace(
+            super().stats(),
+            statements=self._connections.statement_stats(),
+            maintenance=self._last_maintenance,
+        )
+
+    def close(self) -> None:
+        self._connections.close()
+
+    def get_revision(self) -> int:
+        row = self._connections.fetchone(
+            "SELECT seq FROM sqlite_sequence WHERE name='_changelog'"
+        )
+        return int(row[0]) if row is not None else 0
+
+    def _characters_in_scope(self, scope: int) -> CharacterState:
+        if scope == DEFAULT_SCOPE:
+            return self._characters
+        with self._scoped_characters_lock:
+            characters = self._scoped_characters.get(scope)
+            if characters is None:
+                characters = self._character_state_type(
+                    self._connections, self._notifier, scope
+                )
+                self._scoped_characters[scope] = characters
+            return characters
+
+    def _character_actions_in_scope(self, scope: int) -> CharacterActionState:
+        if scope == DEFAULT_SCOPE:
+            return self._character_actions
+        return _SqlCharacterActionState(self._connections, scope)
+
+    def _get_changes_since(self, revision: int, scope: int) -> StateChanges:
+        # Without a common snapshot, rows may already reflect changes made after
+        # `current`; those are reported again by the next call, which is harmless.
+        current = self.get_revision()
+        if revision >= current:
+            return StateChanges(revision=current)
+        # Player entries have no scope, and neither do character entries logged
+        # before _add_character_scopes; both count for every scope.
+        changed = self._connections.fetchall(
+            "SELECT entity, key, MAX(revision) FROM _changelog"
+            " WHERE revision>? AND revision<=? AND (scope IS NULL OR scope=?)"
+            " GROUP BY entity, key ORDER BY 3",
+            (revision, current, scope),
+        )
+        # Entries are truncated oldest first, so if the oldest one left is no newer
+        # than revision + 1, nothing that the query above needed was missing.
+        oldest = self._connections.fetchone("SELECT MIN(revision) FROM _changelog")
+        if oldest[0] is None or oldest[0] > revision + 1:
+            return StateChanges(revision=current, complete=False)
+
+        changes = StateChanges(revision=current)
+        names = [key for entity, key, _ in changed if entity == "character"]
+        ids = [key for entity, key, _ in changed if entity == "player"]
+        # Stay below SQLite's historical limit of 999 host parameters per statement.
+        by_name: dict[str, CharacterData] = {}
+        for start in range(0, len(names), _MAX_PARAMS - 1):
+            chunk = names[start : start + _MAX_PARAMS - 1]
+            for row in self._connections.fetchall(
+                f"SELECT {_CHARACTER_COLUMNS} FROM _sqlcharacterdata"  # noqa: S608
+                f" WHERE scope=? AND name IN ({', '.join('?' * len(chunk))})",
+                (scope, *chunk),
+            ):
+                by_name[row[0]] = CharacterData(*row)
+        # Characters of unscoped entries that are not in this scope are reported
+        # as removed from it.
+        for name in names:
+            if name in by_name:
+                changes.characters.append(by_name[name])
+            else:
+                changes.removed_characters.append(name)
+        by_id: dict[int, PlayerData] = {}
+        for start in range(0, len(ids), _MAX_PARAMS):
+            chunk = ids[start : start + _MAX_PARAMS]
+            for row in self._connections.fetchall(
+                "SELECT id, discord_id, name FROM _sqlplayerdata"  # noqa: S608
+                f" WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ):
+                by_id[row[0]] = PlayerData(*row)
+        for player_id in ids:
+            if player_id in by_id:
+                changes.players.append(by_id[player_id])
+            else:
+                changes.removed_players.append(player_id)
+        return changes
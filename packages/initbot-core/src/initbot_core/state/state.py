@@ -5,23 +5,61 @@
 import secrets
 import time
 from abc import ABC, abstractmethod
-from collections.abc import Iterable, Sequence
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
 from typing import Final
 
 from initbot_core.character_name import validate_character_name
-from initbot_core.data.character import CharacterData, NewCharacterData
+from initbot_core.data.character import (
+    CharacterData,
+    NewCharacterData,
+    is_eligible_for_pruning,
+)
 from initbot_core.data.player import PlayerData
 from initbot_core.utils import (
     get_exact_or_unique_prefix_match,
     normalize_str,
 )
 
+# The scope of the characters of a State itself; see State.scoped().
+DEFAULT_SCOPE: Final[int] = 0
+
 
 class CharacterState(ABC):
     @abstractmethod
     def get_all(self) -> Sequence[CharacterData]:
         raise NotImplementedError()
 
+    def iter_all(self, batch_size: int | None = None) -> Iterator[CharacterData]:
+        """Yield all characters one by one instead of building a list first.
+
+        With a batch_size, characters are read one page() at a time in name order
+        instead, as implementations may also do without one; characters added,
+        renamed or removed meanwhile may or may not be yielded.
+        """
+        if batch_size is not None:
+            yield from self._iter_pages(batch_size)
+            return
+        yield from self.get_all()
+
+    def _iter_pages(self, batch_size: int) -> Iterator[CharacterData]:
+        after_name = None
+        while batch := self.page(after_name, batch_size):
+            yield from batch
+            after_name = batch[-1].name
+
+    @abstractmethod
+    def page(self, after_name: str | None, limit: int) -> Sequence[CharacterData]:
+        """Return up to limit characters in name order, starting after after_name.
+
+        Names are ordered ignoring case first, like prefix matches, then exactly.
+        Pass the name of the last character of a page to get the next one; this
+        keyset stays correct when characters are added or removed in between.
+        Implementations find the start of a page without reading the ones before.
+        """
+        raise NotImplementedError()
+
     def get_from_tokens(
         self,
         tokens: Iterable[str],
@@ -42,9 +80,51 @@ class CharacterState(ABC):
             return self.get_from_player_id(player_id)
         raise KeyError("No character name or player_id provided")
 
+    def get_all_for_player(self, player_id: int) -> Sequence[CharacterData]:
+        """Return all characters owned by the given player."""
+        return [cdi for cdi in self.get_all() if cdi.player_id == player_id]
+
+    def find_prunable(
+        self, threshold_days: int, player_id: int | None = None
+    ) -> Sequence[CharacterData]:
+        """Return the characters not used within threshold_days, optionally of one player."""
+        candidates = (
+            self.get_all() if player_id is None else self.get_all_for_player(player_id)
+        )
+        return [
+            cdi for cdi in candidates if is_eligible_for_pruning(cdi, threshold_days)
+        ]
+
+    @abstractmethod
+    def prune_many(
+        self, threshold_days: int, player_id: int | None = None
+    ) -> Sequence[str]:
+        """Remove the characters find_prunable() would return, and their actions.
+
+        Runs as one unit of work and returns the names of the removed characters.
+        """
+        raise NotImplementedError()
+
+    def get_by_initiative(self, since: int) -> Sequence[CharacterData]:
+        """Return the characters with an initiative that were used after since.
+
+        The highest initiative comes first.
+        """
+        return sorted(
+            (
+                cdi
+                for cdi in self.iter_all()
+                if cdi.initiative is not None
+                and cdi.last_used is not None
+                and cdi.last_used > since
+            ),
+            key=lambda cdi: cdi.initiative or 0,
+            reverse=True,
+        )
+
     def get_from_player_id(self, player_id: int) -> CharacterData:
         """Find the unique character owned by the given player."""
-        chars = [cdi for cdi in self.get_all() if cdi.player_id == player_id]
+        chars = self.get_all_for_player(player_id)
         if len(chars) == 1:
             return chars[0]
         raise KeyError(
@@ -57,45 +137,65 @@ class CharacterState(ABC):
         create: bool = False,
         player_id: int | None = None,
     ) -> CharacterData:
-        all_chars = self.get_all()
         try:
-            return get_exact_or_unique_prefix_match(
-                name, all_chars, lambda cdi: cdi.name
-            )
+            return self._match_name(name)
         except KeyError as err:
             if create and player_id is not None:
                 return self.add_store_and_get(
-                    NewCharacterData(name=name, player_id=player_id),
-                    existing=all_chars,
+                    NewCharacterData(name=name, player_id=player_id)
                 )
             raise KeyError(f"Unable to find character with name '{name}'") from err
 
+    def _match_name(self, name: str) -> CharacterData:
+        """Resolve an exact, case-insensitive exact, or unique prefix match.
+
+        Raises KeyError if there is no match or the prefix is ambiguous.
+        """
+        return get_exact_or_unique_prefix_match(
+            name, self.get_all(), lambda cdi: cdi.name
+        )
+
+    def _get_from_normalized_name(self, normalized: str) -> CharacterData | None:
+        """Return the character whose normalized name equals *normalized*, if any.
+
+        Only this scope counts; other scopes may have a character of the same name.
+        """
+        return next(
+            (cdi for cdi in self.get_all() if normalize_str(cdi.name) == normalized),
+            None,
+        )
+
+    def _check_name_available(
+        self, name: str, existing: Sequence[CharacterData] | None = None
+    ) -> None:
+        normalized = normalize_str(name)
+        if existing is not None:
+            conflict = next(
+                (cdi for cdi in existing if normalize_str(cdi.name) == normalized),
+                None,
+            )
+        else:
+            conflict = self._get_from_normalized_name(normalized)
+        if conflict is not None:
+            raise ValueError(
+                f"A character named '{conflict.name}' already exists "
+                f"(character names must be unique ignoring case)"
+            )
+
     def add_store_and_get(
         self,
         char_data: NewCharacterData,
         existing: Sequence[CharacterData] | None = None,
     ) -> CharacterData:
         validate_character_name(char_data.name)
-        normalized = normalize_str(char_data.name)
-        for char in existing if existing is not None else self.get_all():
-            if normalize_str(char.name) == normalized:
-                raise ValueError(
-                    f"A character named '{char.name}' already exists "
-                    f"(character names must be unique ignoring case)"
-                )
+        self._check_name_available(char_data.name, existing)
         return self._add_store_and_get(char_data)
 
     def rename_and_store(
         self, char_data: CharacterData, new_name: str
     ) -> CharacterData:
         validate_character_name(new_name)
-        normalized = normalize_str(new_name)
-        for existing in self.get_all():
-            if normalize_str(existing.name) == normalized:
-                raise ValueError(
-                    f"A character named '{existing.name}' already exists "
-                    f"(character names must be unique ignoring case)"
-                )
+        self._check_name_available(new_name)
         return self._rename_and_store(char_data, new_name)
 
     @abstractmethod
@@ -117,10 +217,23 @@ class CharacterState(ABC):
         raise NotImplementedError()
 
 
+@dataclass(frozen=True, slots=True)
+class CacheInfo:
+    """Lookup counters of a cache, in the manner of functools' cache_info()."""
+
+    hits: int = 0
+    misses: int = 0
+    maxsize: int = 0
+    currsize: int = 0
+
+
 class PlayerState(ABC):
     @abstractmethod
     def upsert_discord(self, discord_id: int, name: str) -> PlayerData:
-        """Find or create a Discord-linked player; update their display name."""
+        """Find or create a Discord-linked player; update their display name.
+
+        Neither writes nor notifies if the player exists with the given name.
+        """
         raise NotImplementedError()
 
     @abstractmethod
@@ -146,6 +259,34 @@ class PlayerState(ABC):
     def get_all(self) -> Sequence[PlayerData]:
         raise NotImplementedError()
 
+    def iter_all(self, batch_size: int | None = None) -> Iterator[PlayerData]:
+        """Yield all players one by one instead of building a list first.
+
+        With a batch_size, players are read one page() at a time in id order.
+        """
+        if batch_size is not None:
+            yield from self._iter_pages(batch_size)
+            return
+        yield from self.get_all()
+
+    def _iter_pages(self, batch_size: int) -> Iterator[PlayerData]:
+        after_id = None
+        while batch := self.page(after_id, batch_size):
+            yield from batch
+            after_id = batch[-1].id
+
+    @abstractmethod
+    def page(self, after_id: int | None, limit: int) -> Sequence[PlayerData]:
+        """Return up to limit players in id order, starting after after_id.
+
+        Keyed by id rather than by name, which players need not have unique.
+        """
+        raise NotImplementedError()
+
+    def cache_info(self) -> CacheInfo:
+        """Counters of the get_from_id() and get_from_discord_id() cache, if any."""
+        return CacheInfo()
+
 
 class WebLoginTokenState(ABC):
     """Stores short-lived, single-use tokens that authenticate a player via the web app."""
@@ -163,6 +304,15 @@ class WebLoginTokenState(ABC):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    def consume(self, token: str) -> int | None:
+        """Mark a valid token used and return its discord_id, in one atomic step.
+
+        Returns None if the token is unknown, already used, or expired, so of two
+        concurrent logins with the same token only one succeeds.
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def mark_used(self, token: str) -> None:
         """Invalidate a token after a successful login (single-use enforcement)."""
@@ -175,16 +325,33 @@ class WebLoginTokenState(ABC):
 
 
 class CharacterActionState(ABC):
-    """Stores ordered action templates for each character."""
+    """Stores ordered action templates for each character.
+
+    Actions belong to the character rather than to its name: renaming a character
+    keeps its actions, and removing or pruning one removes them.
+    """
 
     @abstractmethod
     def get_all_for_character(self, character_name: str) -> Sequence[str]:
         """Return all action templates for the given character, in insertion order."""
         raise NotImplementedError()
 
+    def get_all_for_characters(
+        self, character_names: Iterable[str]
+    ) -> Mapping[str, Sequence[str]]:
+        """Return the action templates of several characters at once.
+
+        Every given name is a key of the result, mapped to an empty sequence if the
+        character has no actions.
+        """
+        return {name: self.get_all_for_character(name) for name in character_names}
+
     @abstractmethod
     def add(self, character_name: str, template: str) -> int:
-        """Append a template and return its 1-based index."""
+        """Append a template and return its 1-based index.
+
+        Raises KeyError if there is no character with exactly that name.
+        """
         raise NotImplementedError()
 
     @abstractmethod
@@ -196,18 +363,16 @@ class CharacterActionState(ABC):
     def remove(self, character_name: str, index: int) -> None:
         """Delete the template at 1-based index. Raises IndexError if out of range.
 
-        Remaining actions renumber to fill the gap.
+        Later actions move up by one index.
         """
         raise NotImplementedError()
 
     @abstractmethod
-    def remove_all_for_character(self, character_name: str) -> None:
-        """Delete every action belonging to the given character."""
-        raise NotImplementedError()
+    def move(self, character_name: str, from_index: int, to_index: int) -> None:
+        """Move the template at 1-based from_index so that it ends up at to_index.
 
-    @abstractmethod
-    def rename_character(self, old_name: str, new_name: str) -> None:
-        """Update the character_name key for all actions belonging to old_name."""
+        Raises IndexError if either index is out of range.
+        """
         raise NotImplementedError()
 
 
@@ -219,7 +384,12 @@ _SESSION_SECRET_TTL: Final[int] = (
 
 
 class SessionSecretState(ABC):
-    """Stores the persistent session-signing secret used by the web app."""
+    """Stores the persistent session-signing secret used by the web app.
+
+    The secret is cached in the process until it expires.
+    """
+
+    _cached: tuple[str, int] | None = None
 
     @abstractmethod
     def _load(self) -> tuple[str, int] | None:
@@ -234,12 +404,131 @@ class SessionSecretState(ABC):
     def get_or_rotate(self) -> str:
         """Return the current secret, generating a new one if absent or expired."""
         now = int(time.time())
-        entry = self._load()
-        if entry is not None and entry[1] > now:
-            return entry[0]
-        new_secret = secrets.token_urlsafe(32)
-        self._store(new_secret, now + _SESSION_SECRET_TTL)
-        return new_secret
+        entry = self._cached
+        if entry is None or entry[1] <= now:
+            # Another process may have rotated the secret already.
+            entry = self._load()
+        if entry is None or entry[1] <= now:
+            entry = (secrets.token_urlsafe(32), now + _SESSION_SECRET_TTL)
+            self._store(*entry)
+        self._cached = entry
+        return entry[0]
+
+
+@dataclass
+class StateChanges:
+    """Characters and players changed after a given revision.
+
+    Changed rows are reported with their current values, removed rows by key.
+    If ``complete`` is False, the change log no longer reaches back to the
+    requested revision and the caller has to reload everything instead.
+    """
+
+    revision: int
+    complete: bool = True
+    characters: list[CharacterData] = field(default_factory=list)
+    removed_characters: list[str] = field(default_factory=list)
+    players: list[PlayerData] = field(default_factory=list)
+    removed_players: list[int] = field(default_factory=list)
+
+
+@dataclass(frozen=True, slots=True)
+class MaintenanceReport:
+    """What one maintenance run did, and the size of the data store afterwards."""
+
+    checkpoint_mode: str
+    checkpoint_busy: bool
+    checkpointed_frames: int
+    wal_bytes_before: int
+    wal_bytes: int
+    db_bytes: int
+    free_bytes: int
+
+
+# Upper bounds in seconds of the LockStats.wait_histogram buckets.
+LOCK_WAIT_BUCKETS: Final[tuple[float, ...]] = (0.001, 0.01, 0.1, 1.0, float("inf"))
+
+
+@dataclass(frozen=True, slots=True)
+class LockStats:
+    """Write lock contention counters of a data store shared with other processes.
+
+    Every statement that the writer connection runs outside a transaction, and every
+    transaction start, counts as one write. Its wait is the time until it got through, including
+    SQLite's busy timeout and the backoff between retries. wait_histogram[i] counts
+    the waits no longer than LOCK_WAIT_BUCKETS[i] and longer than the bound before.
+    """
+
+    writes: int = 0
+    busy: int = 0
+    retries: int = 0
+    failures: int = 0
+    wait_seconds: float = 0.0
+    wait_histogram: tuple[int, ...] = (0,) * len(LOCK_WAIT_BUCKETS)
+
+
+# Upper bounds in seconds of the StatementStats.histogram buckets.
+STATEMENT_LATENCY_BUCKETS: Final[tuple[float, ...]] = (
+    0.0001,
+    0.001,
+    0.01,
+    0.1,
+    1.0,
+    float("inf"),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class StatementStats:
+    """Calls and latencies of one SQL statement template, see State.stats().
+
+    histogram[i] counts the calls no longer than STATEMENT_LATENCY_BUCKETS[i] and
+    longer than the bound before.
+    """
+
+    calls: int
+    total_seconds: float
+    max_seconds: float
+    histogram: tuple[int, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class StateStats:
+    """A snapshot of the counters of a data store, see State.stats().
+
+    ``statements`` is empty unless statement stats are enabled; ``maintenance`` is
+    the report of the last maintenance run, if any.
+    """
+
+    player_cache: CacheInfo
+    locks: LockStats
+    statements: Mapping[str, StatementStats] = field(default_factory=dict)
+    maintenance: MaintenanceReport | None = None
+
+
+class _DeferrableNotifier:
+    """Forwards change notifications, holding them back while a transaction is open."""
+
+    def __init__(self, on_change: Callable[[], None] | None = None) -> None:
+        self._on_change = on_change
+        self.deferring = False
+        self._pending = False
+
+    def __call__(self) -> None:
+        if self.deferring:
+            self._pending = True
+        elif self._on_change:
+            self._on_change()
+
+    def flush(self) -> None:
+        """Send one notification if any were held back."""
+        if self._pending:
+            self._pending = False
+            if self._on_change:
+                self._on_change()
+
+    def discard(self) -> None:
+        self._pending = False
 
 
 class State(ABC):
@@ -267,3 +556,139 @@ class State(ABC):
     @abstractmethod
     def session_secret(self) -> SessionSecretState:
         raise NotImplementedError()
+
+    @abstractmethod
+    def transaction(self) -> AbstractContextManager[None]:
+        """Group the writes made inside a ``with`` block into one unit of work.
+
+        The writes are committed together when the block exits normally and rolled
+        back if it raises. Change notifications are held back and fire at most once,
+        after the commit. Transactions can be nested; an inner block that raises
+        only undoes its own writes.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_revision(self) -> int:
+        """Return the current revision; it grows with every character or player change."""
+        raise NotImplementedError()
+
+    def get_changes_since(self, revision: int) -> StateChanges:
+        """Return the characters and players changed after ``revision``.
+
+        Characters of other scopes count as removed.
+        """
+        return self._get_changes_since(revision, DEFAULT_SCOPE)
+
+    @abstractmethod
+    def _get_changes_since(self, revision: int, scope: int) -> StateChanges:
+        raise NotImplementedError()
+
+    def scoped(self, scope: int) -> "State":
+        """Return a view of this State whose characters are those of one scope.
+
+        Scopes partition the characters and their actions, e.g. one per Discord
+        guild, so that listing and matching names only considers a single table and
+        each scope can have its own character of any name. The State itself holds
+        the characters of DEFAULT_SCOPE. Everything else, including players,
+        transactions and revisions, is shared by all scopes. Closing a view closes
+        this State.
+        """
+        if scope == DEFAULT_SCOPE:
+            return self
+        return _ScopedState(self, scope)
+
+    @abstractmethod
+    def _characters_in_scope(self, scope: int) -> CharacterState:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def _character_actions_in_scope(self, scope: int) -> CharacterActionState:
+        raise NotImplementedError()
+
+    def maintain(self) -> MaintenanceReport | None:
+        """Run periodic housekeeping; returns None if the data store needs none."""
+        return None
+
+    def lock_stats(self) -> LockStats:
+        """Counters of waits for the write lock, if the data store has one."""
+        return LockStats()
+
+    def stats(self) -> StateStats:
+        """A snapshot of the counters of the data store, for metrics and diagnostics."""
+        return StateStats(
+            player_cache=self.players.cache_info(), locks=self.lock_stats()
+        )
+
+    @abstractmethod
+    def close(self) -> None:
+        """Release resources held by the data store; it must not be used afterwards."""
+        raise NotImplementedError()
+
+
+class _ScopedState(State):
+    """A State whose characters and actions are those of another scope, see State.scoped()."""
+
+    def __init__(self, state: State, scope: int) -> None:
+        self._state = state
+        self._scope = scope
+        # pylint: disable-next=protected-access
+        self._characters = state._characters_in_scope(scope)
+        # pylint: disable-next=protected-access
+        self._character_actions = state._character_actions_in_scope(scope)
+
+    @property
+    def characters(self) -> CharacterState:
+        return self._characters
+
+    @property
+    def players(self) -> PlayerState:
+        return self._state.players
+
+    @property
+    def web_login_tokens(self) -> WebLoginTokenState:
+        return self._state.web_login_tokens
+
+    @property
+    def character_actions(self) -> CharacterActionState:
+        return self._character_actions
+
+    @property
+    def session_secret(self) -> SessionSecretState:
+        return self._state.session_secret
+
+    def transaction(self) -> AbstractContextManager[None]:
+        return self._state.transaction()
+
+    def get_revision(self) -> int:
+        return self._state.get_revision()
+
+    def get_changes_since(self, revision: int) -> StateChanges:
+        return self._get_changes_since(revision, self._scope)
+
+    def _get_changes_since(self, revision: int, scope: int) -> StateChanges:
+        # pylint: disable-next=protected-access
+        return self._state._get_changes_since(revision, scope)
+
+    def scoped(self, scope: int) -> State:
+        return self._state.scoped(scope)
+
+    def _characters_in_scope(self, scope: int) -> CharacterState:
+        # pylint: disable-next=protected-access
+        return self._state._characters_in_scope(scope)
+
+    def _character_actions_in_scope(self, scope: int) -> CharacterActionState:
+        # pylint: disable-next=protected-access
+        return self._state._character_actions_in_scope(scope)
+
+    def maintain(self) -> MaintenanceReport | None:
+        return self._state.maintain()
+
+    def lock_stats(self) -> LockStats:
+        return self._state.lock_stats()
+
+    def stats(self) -> StateStats:
+        return self._state.stats()
+
+    def close(self) -> None:
+        self._state.close()
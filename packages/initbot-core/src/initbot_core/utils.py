@@ -3,10 +3,13 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
 import re
-from collections.abc import Callable, Iterable, MutableSequence, Sequence
-from typing import TypeVar
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Callable, Iterable, Iterator, MutableSequence, Sequence
+from itertools import islice
+from typing import Generic, TypeVar
 
 _INT_PATTERN = re.compile(r"^-?(0|([1-9][0-9]*))$")
+_MAX_SUGGESTIONS = 5
 
 
 A = TypeVar("A")
@@ -115,9 +118,15 @@ def get_unique_prefix_match(
     ]
     if len(matches) == 1:
         return matches[0]
-    raise KeyError(
-        f"Unable to find unique match for {str_to_match} in {[get_str_from_candidate(cnd) for cnd in candidates]}"
-    )
+    message = f"Unable to find unique match for {str_to_match}"
+    if matches:
+        suggestions = [
+            get_str_from_candidate(cnd) for cnd in matches[:_MAX_SUGGESTIONS]
+        ]
+        message += f" in {suggestions}"
+        if len(matches) > len(suggestions):
+            message += f" and {len(matches) - len(suggestions)} more"
+    raise KeyError(message)
 
 
 def get_exact_or_unique_prefix_match(
@@ -139,3 +148,154 @@ def get_exact_or_unique_prefix_match(
 
 def normalize_str(strng: str) -> str:
     return strng.lower().strip()
+
+
+_MAX_CODE_POINT = 0x10FFFF
+_SURROGATES = range(0xD800, 0xE000)
+
+
+def prefix_upper_bound(prefix: str) -> str | None:
+    """Return the smallest string greater than every string starting with *prefix*.
+
+    Together with *prefix* itself this yields a half-open range
+    ``prefix <= s < bound`` that selects exactly the strings with that prefix in
+    code point order, which is also the order of SQLite's BINARY collation over
+    UTF-8. Returns None if there is no such bound (empty prefix or only U+10FFFF).
+    """
+    while prefix:
+        code_point = ord(prefix[-1]) + 1
+        if code_point in _SURROGATES:
+            code_point = _SURROGATES.stop
+        if code_point <= _MAX_CODE_POINT:
+            return prefix[:-1] + chr(code_point)
+        prefix = prefix[:-1]
+    return None
+
+
+class PrefixIndex(Generic[A]):
+    """Sorted name index with the same contract as get_exact_or_unique_prefix_match.
+
+    Candidates are kept in a dict for exact lookups and in a list of
+    (normalized, exact) keys sorted for bisect, so case-insensitive and prefix
+    lookups take O(log n) instead of three linear passes over all candidates.
+    """
+
+    def __init__(
+        self,
+        candidates: Iterable[A] = (),
+        get_str_from_candidate: Callable[[A], str] = str,
+        max_suggestions: int = _MAX_SUGGESTIONS,
+    ) -> None:
+        self._get_str = get_str_from_candidate
+        self._max_suggestions = max_suggestions
+        self._by_str: dict[str, A] = {
+            self._get_str(candidate): candidate for candidate in candidates
+        }
+        self._keys: list[tuple[str, str]] = sorted(
+            (normalize_str(strng), strng) for strng in self._by_str
+        )
+
+    def __len__(self) -> int:
+        return len(self._by_str)
+
+    def __iter__(self) -> Iterator[A]:
+        return iter(self._by_str.values())
+
+    def get(self, strng: str) -> A | None:
+        """Return the candidate whose string is exactly *strng*, if any."""
+        return self._by_str.get(strng)
+
+    def insert(self, candidate: A) -> None:
+        """Add *candidate*, replacing any candidate with the same string."""
+        strng = self._get_str(candidate)
+        if strng not in self._by_str:
+            insort(self._keys, (normalize_str(strng), strng))
+        self._by_str[strng] = candidate
+
+    def delete(self, strng: str) -> None:
+        """Remove the candidate whose string is exactly *strng*. Raises KeyError if absent."""
+        del self._by_str[strng]
+        key = (normalize_str(strng), strng)
+        del self._keys[bisect_left(self._keys, key)]
+
+    def rename(self, old_strng: str, candidate: A) -> None:
+        """Replace the candidate stored under *old_strng* with *candidate*."""
+        self.delete(old_strng)
+        self.insert(candidate)
+
+    def _prefix_range(self, normalized: str) -> tuple[int, int]:
+        lower = bisect_left(self._keys, (normalized,))
+        upper_bound = prefix_upper_bound(normalized)
+        upper = (
+            bisect_left(self._keys, (upper_bound,), lower)
+            if upper_bound is not None
+            else len(self._keys)
+        )
+        return lower, upper
+
+    def get_normalized(self, normalized: str) -> A | None:
+        """Return a candidate whose normalized string equals *normalized*, if any."""
+        idx = bisect_left(self._keys, (normalized,))
+        if idx < len(self._keys) and self._keys[idx][0] == normalized:
+            return self._by_str[self._keys[idx][1]]
+        return None
+
+    def match(self, str_to_match: str) -> A:
+        """Return the exact, case-insensitive exact, or unique prefix match.
+
+        Raises KeyError if there is no match or the prefix is ambiguous. The error
+        message names at most max_suggestions close candidates.
+        """
+        exact = self._by_str.get(str_to_match)
+        if exact is not None:
+            return exact
+        normalized = normalize_str(str_to_match)
+        lower, upper = self._prefix_range(normalized)
+        if upper - lower == 1 or (
+            upper - lower > 1
+            and self._keys[lower][0] == normalized
+            and self._keys[lower + 1][0] != normalized
+        ):
+            return self._by_str[self._keys[lower][1]]
+        message = f"Unable to find unique match for {str_to_match}"
+        suggestions = self.suggest(str_to_match)
+        if suggestions:
+            message += f" (did you mean: {', '.join(suggestions)}?)"
+        raise KeyError(message)
+
+    def page(self, after: str | None, limit: int) -> list[A]:
+        """Return up to *limit* candidates in sort order, starting after *after*.
+
+        The order is that of the (normalized, exact) keys, so a page costs a bisect
+        plus *limit* steps however many candidates there are. *after* need not be
+        a candidate any more.
+        """
+        start = (
+            0
+            if after is None
+            else bisect_right(self._keys, (normalize_str(after), after))
+        )
+        return [self._by_str[strng] for _, strng in self._keys[start : start + limit]]
+
+    def suggest(self, str_to_match: str) -> list[str]:
+        """Return up to max_suggestions candidate strings close to *str_to_match*.
+
+        These are the candidates sharing its prefix or, if there are none, its
+        neighbours in sort order.
+        """
+        lower, upper = self._prefix_range(normalize_str(str_to_match))
+        if upper == lower:
+            lower = max(
+                0,
+                min(
+                    lower - self._max_suggestions // 2,
+                    len(self._keys) - self._max_suggestions,
+                ),
+            )
+            upper = len(self._keys)
+        return [
+            strng
+            for _, strng in islice(
+                self._keys, lower, min(upper, lower + self._max_suggestions)
+            )
+        ]
@@ -33,6 +33,7 @@ from initbot_core.security import (
     get_vulnerabilities,
     is_high_severity,
 )
+from initbot_core.state.async_state import AsyncState, run_on_state
 from initbot_core.state.factory import create_state_from_source
 from initbot_core.state.state import State
 from initbot_web.config import WebSettings
@@ -96,9 +97,11 @@ class _UdpProtocol(DatagramProtocol):
         self._notifier.notify_all()
 
 
-async def _periodic_tasks(vuln_state: VulnerabilityState, state: State) -> None:
+async def _periodic_tasks(
+    vuln_state: VulnerabilityState, state: State | AsyncState
+) -> None:
     while True:
-        state.web_login_tokens.prune_expired()
+        await run_on_state(state, lambda s: s.web_login_tokens.prune_expired())
         vulns = await get_vulnerabilities()
         for name, version, vuln_id, severity in vulns:
             _log.warning(
@@ -114,6 +117,15 @@ async def _periodic_tasks(vuln_state: VulnerabilityState, state: State) -> None:
         await sleep(24 * 60 * 60)
 
 
+async def _state_maintenance(state: State | AsyncState, interval: float) -> None:
+    while True:
+        await sleep(interval)
+        try:
+            await run_on_state(state, lambda s: s.maintain(), in_thread=True)
+        except Exception:  # pylint: disable=broad-except
+            _log.exception("Data store maintenance failed")
+
+
 def create_app(
     settings: WebSettings | None = None, web_url_path_prefix: str | None = None
 ) -> Starlette:
@@ -124,7 +136,16 @@ def create_app(
         send_notification("127.0.0.1", cfg.notify_port)
         send_notification(cfg.chat_notify_host, cfg.chat_notify_port)
 
-    state = create_state_from_source(cfg.state, on_change=_on_state_change)
+    sync_state = create_state_from_source(cfg.state, on_change=_on_state_change).scoped(
+        cfg.scope
+    )
+    # Key rotation would be desirable (itsdangerous supports it via a list of secrets)
+    # but Starlette's SessionMiddleware only accepts a single secret_key at this point.
+    session_secret = sync_state.session_secret.get_or_rotate()
+    # Hand the state to the worker thread only after the synchronous startup reads.
+    state: State | AsyncState = (
+        AsyncState(sync_state) if CORE_CFG.state_worker_thread else sync_state
+    )
     templates = Jinja2Templates(directory=str(Path(__file__).parent / "templates"))
     vuln_state = VulnerabilityState()
     url_path_prefix = (
@@ -138,16 +159,21 @@ def create_app(
             lambda: _UdpProtocol(notifier),
             local_addr=("0.0.0.0", cfg.notify_port),  # noqa: S104  # all interfaces needed: receives from loopback and Docker internal network
         )
-        task = create_task(_periodic_tasks(vuln_state, state))
+        tasks = [create_task(_periodic_tasks(vuln_state, state))]
+        if CORE_CFG.state_maintenance_interval:
+            tasks.append(
+                create_task(
+                    _state_maintenance(state, CORE_CFG.state_maintenance_interval)
+                )
+            )
         yield
-        task.cancel()
-        with suppress(CancelledError):
-            await task
+        for task in tasks:
+            task.cancel()
+            with suppress(CancelledError):
+                await task
         transport.close()
+        state.close()
 
-    # Key rotation would be desirable (itsdangerous supports it via a list of secrets)
-    # but Starlette's SessionMiddleware only accepts a single secret_key at this point.
-    session_secret = state.session_secret.get_or_rotate()
     https_only = bool(CORE_CFG.web_hostname)
     app = Starlette(
         routes=make_pwa_routes(url_path_prefix)
@@ -15,7 +15,11 @@ class WebSettings(BaseSettings):
 
     state: str = Field(
         default="sqlite:./initbot.db",
-        description="The data store URI. Format: 'sqlite:/path/to/file.db'. The default creates initbot.db in the current working directory.",
+        description="The data store URI. Format: 'sqlite:/path/to/file.db', or 'memory:' to keep all data in memory of a single process, optionally snapshotted with 'memory:/path/to/snapshot.json'. The default creates initbot.db in the current working directory.",
+    )
+    scope: int = Field(
+        default=0,
+        description="The scope whose characters the web app shows: 0, or the ID of a Discord guild if the chat bot runs with STATE_GUILD_SCOPES enabled.",
     )
     web_host: str = Field(
         default="127.0.0.1",
@@ -25,6 +25,7 @@ from initbot_core.data.character import CharacterData, NewCharacterData
 from initbot_core.data.player import PlayerData
 from initbot_core.models.roll import parse_dice_spec
 from initbot_core.security import VulnerabilityState
+from initbot_core.state.async_state import AsyncState, run_on_state
 from initbot_core.state.state import State
 
 STALE_SECONDS = 24 * 3600
@@ -195,6 +196,37 @@ def _apply_create(
     return char
 
 
+def _sync_snapshot(
+    state: State,
+    revision: int | None,
+    chars_by_name: dict[str, CharacterData],
+    players_by_id: dict[int, PlayerData],
+) -> int:
+    """Bring a connection's copy of the characters and players up to date.
+
+    Applies only the changes since ``revision`` and falls back to a full reload on
+    the first call or when the change log no longer reaches back that far.
+    Returns the revision the snapshot now reflects.
+    """
+    changes = state.get_changes_since(revision) if revision is not None else None
+    if changes is None or not changes.complete:
+        current = state.get_revision()
+        chars_by_name.clear()
+        chars_by_name.update((c.name, c) for c in state.characters.iter_all())
+        players_by_id.clear()
+        players_by_id.update((p.id, p) for p in state.players.iter_all())
+        return current
+    for name in changes.removed_characters:
+        chars_by_name.pop(name, None)
+    for cdi in changes.characters:
+        chars_by_name[cdi.name] = cdi
+    for player_id in changes.removed_players:
+        players_by_id.pop(player_id, None)
+    for player in changes.players:
+        players_by_id[player.id] = player
+    return changes.revision
+
+
 def _is_initiative_eligible(char: CharacterData, now: int) -> bool:
     return (
         char.initiative is not None
@@ -210,7 +242,7 @@ def _compute_desired_ranked(all_chars: Sequence[CharacterData], now: int) -> lis
 
 
 def make_routes(  # pylint: disable=too-many-locals,too-many-statements
-    state: State,
+    state: State | AsyncState,
     templates: Jinja2Templates,
     url_path_prefix: str,
     vuln_state: VulnerabilityState,
@@ -239,7 +271,10 @@ def make_routes(  # pylint: disable=too-many-locals,too-many-statements
             request.url.scheme,
             request.headers.get("x-forwarded-proto", "<absent>"),
         )
-        if state.web_login_tokens.find_valid(token) is None:
+        discord_id = await run_on_state(
+            state, lambda s: s.web_login_tokens.find_valid(token)
+        )
+        if discord_id is None:
             _log.warning("login GET: invalid or already-used token")
             return Response(status_code=403)
         return templates.TemplateResponse(request, "login.html", {})
@@ -247,10 +282,15 @@ def make_routes(  # pylint: disable=too-many-locals,too-many-statements
     async def login_post(request: Request) -> Response:
         """POST: consume token, write session, redirect to tracker."""
         token = request.path_params["token"]
-        discord_id = state.web_login_tokens.find_valid(token)
+
+        def consume_token(state: State) -> tuple[int | None, PlayerData | None]:
+            discord_id = state.web_login_tokens.consume(token)
+            if discord_id is None:
+                return None, None
+            return discord_id, state.players.get_from_discord_id(discord_id)
+
+        discord_id, player = await run_on_state(state, consume_token)
         if discord_id is not None:
-            state.web_login_tokens.mark_used(token)
-            player = state.players.get_from_discord_id(discord_id)
             _write_session(
                 request,
                 discord_id,
@@ -291,6 +331,9 @@ def make_routes(  # pylint: disable=too-many-locals,too-many-statements
         last_table_snapshot: tuple = ()
         last_player_snapshot: tuple = ()
         last_vuln = vuln_state.has_high_severity_vulnerabilities
+        chars_by_name: dict[str, CharacterData] = {}
+        players_by_id: dict[int, PlayerData] = {}
+        revision: int | None = None
 
         notify_q = request.app.state.notifier.register()
         notify_q.put_nowait(None)
@@ -298,10 +341,17 @@ def make_routes(  # pylint: disable=too-many-locals,too-many-statements
             while not await request.is_disconnected():
                 await notify_q.get()
                 now = int(datetime.now().timestamp())
-                all_chars = state.characters.get_all()
-                all_players = state.players.get_all()
-                players_by_id = {p.id: p for p in all_players}
-                chars_by_name = {c.name: c for c in all_chars}
+                # Only reads, so on a thread of its own a SqlState serves them from
+                # a read-only connection, concurrently with writes and checkpoints.
+                revision = await run_on_state(
+                    state,
+                    lambda s, rev=revision: _sync_snapshot(
+                        s, rev, chars_by_name, players_by_id
+                    ),
+                    in_thread=True,
+                )
+                all_chars = list(chars_by_name.values())
+                all_players = list(players_by_id.values())
 
                 desired_ranked = _compute_desired_ranked(all_chars, now)
 
@@ -402,36 +452,46 @@ def make_routes(  # pylint: disable=too-many-locals,too-many-statements
         data = await request.json()
         edit_char_name: str = str(data.get(_SIG_EDITCHAR, "")).strip()
         initval: str = str(data.get(_SIG_INITVAL, "")).strip()
-        if edit_char_name:
-            result = _apply_edit(
-                state,
-                edit_char_name,
-                str(data.get(_SIG_NEWCHARNAME, "")).strip(),
-                str(data.get(_SIG_EDITPLAYERID, "")).strip(),
-                initval,
-            )
-        else:
-            result = _apply_create(
-                state,
-                _SessionPlayer.from_session(request),
-                str(data.get(_SIG_NEWCHARNAME, "")).strip(),
-                initval,
-            )
-        if not isinstance(result, CharacterData):
-            return result
-        result.last_used = int(time.time())
-        state.characters.update_and_store(result)
-        _sk = request.session.get("session_key", "")
-        session_sort_versions[_sk] = session_sort_versions.get(_sk, 0) + 1
+        session_player = _SessionPlayer.from_session(request)
         nextchar: str = str(data.get(_SIG_NEXTCHAR, "")).strip()
         nextfield: str = str(data.get(_SIG_NEXTFIELD, "")).strip()
-        if nextfield:
+
+        def store_character(
+            state: State,
+        ) -> tuple[DatastarEvent | tuple[()] | CharacterData, CharacterData | None]:
+            with state.transaction():
+                if edit_char_name:
+                    result = _apply_edit(
+                        state,
+                        edit_char_name,
+                        str(data.get(_SIG_NEWCHARNAME, "")).strip(),
+                        str(data.get(_SIG_EDITPLAYERID, "")).strip(),
+                        initval,
+                    )
+                else:
+                    result = _apply_create(
+                        state,
+                        session_player,
+                        str(data.get(_SIG_NEWCHARNAME, "")).strip(),
+                        initval,
+                    )
+                if not isinstance(result, CharacterData):
+                    return result, None
+                result.last_used = int(time.time())
+                state.characters.update_and_store(result)
+            if not (nextfield and nextchar):
+                return result, result
             try:
-                next_c = (
-                    state.characters.get_from_name(nextchar) if nextchar else result
-                )
+                return result, state.characters.get_from_name(nextchar)
             except (KeyError, ValueError, TypeError):
-                next_c = result
+                return result, result
+
+        result, next_c = await run_on_state(state, store_character)
+        if not isinstance(result, CharacterData):
+            return result
+        _sk = request.session.get("session_key", "")
+        session_sort_versions[_sk] = session_sort_versions.get(_sk, 0) + 1
+        if nextfield and next_c is not None:
             extra: dict[str, SignalValue] = {}
             if nextfield == "player":
                 extra[_SIG_EDITPLAYERID] = str(next_c.player_id)
@@ -474,12 +534,15 @@ def make_routes(  # pylint: disable=too-many-locals,too-many-statements
         request: Request,
     ) -> DatastarEvent | tuple[()]:
         char_name: str = request.path_params.get("char_name", "")
-        try:
-            char = state.characters.get_from_name(char_name)
-        except (TypeError, ValueError, KeyError):
-            return ()
-        state.character_actions.remove_all_for_character(char.name)
-        state.characters.remove_and_store(char)
+
+        def delete(state: State) -> None:
+            try:
+                char = state.characters.get_from_name(char_name)
+            except (TypeError, ValueError, KeyError):
+                return
+            state.characters.remove_and_store(char)
+
+        await run_on_state(state, delete)
         return ()
 
     async def delete_character(request: Request) -> Response:
@@ -492,16 +555,22 @@ def make_routes(  # pylint: disable=too-many-locals,too-many-statements
         request: Request,
     ) -> DatastarEvent | tuple[()]:
         char_name: str = request.path_params.get("char_name", "")
-        try:
-            char = state.characters.get_from_name(char_name)
-        except (TypeError, ValueError, KeyError):
-            return ()
-        initiative_dice = char.initiative_dice
-        if not initiative_dice or not _has_valid_dice(initiative_dice):
+
+        def roll(state: State) -> bool:
+            try:
+                char = state.characters.get_from_name(char_name)
+            except (TypeError, ValueError, KeyError):
+                return False
+            initiative_dice = char.initiative_dice
+            if not initiative_dice or not _has_valid_dice(initiative_dice):
+                return False
+            char.initiative = parse_dice_spec(initiative_dice).roll_one()
+            char.last_used = int(time.time())
+            state.characters.update_and_store(char)
+            return True
+
+        if not await run_on_state(state, roll):
             return ()
-        char.initiative = parse_dice_spec(initiative_dice).roll_one()
-        char.last_used = int(time.time())
-        state.characters.update_and_store(char)
         _sk = request.session.get("session_key", "")
         session_sort_versions[_sk] = session_sort_versions.get(_sk, 0) + 1
         return ()
@@ -540,7 +609,7 @@ def make_routes(  # pylint: disable=too-many-locals,too-many-statements
             return templates.TemplateResponse(
                 request, "join.html", {"error": "Enter your name."}
             )
-        result = state.players.upsert_standalone(name)
+        result = await run_on_state(state, lambda s: s.players.upsert_standalone(name))
         if isinstance(result, str):
             return templates.TemplateResponse(
                 request, "join.html", {"error": "That name is already in use."}
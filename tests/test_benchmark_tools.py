@@ -0,0 +1,41 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+_PACKAGE_ROOT = Path(__file__).resolve().parents[1]
+
+# Arguments that keep each benchmark to a fraction of a second; they only need to
+# run against the current schema, not to measure anything.
+_TINY_RUNS = {
+    "benchmark_actions.py": ["--actions", "20", "--repeat", "1"],
+    "benchmark_records.py": ["--sizes", "10", "--repeat", "1"],
+    "benchmark_state.py": ["--sizes", "10", "--repeat", "1"],
+}
+
+
+def test_every_benchmark_has_a_tiny_run() -> None:
+    scripts = {path.name for path in (_PACKAGE_ROOT / "tools").glob("benchmark_*.py")}
+    assert scripts == set(_TINY_RUNS)
+
+
+@pytest.mark.parametrize(("script", "args"), _TINY_RUNS.items())
+def test_benchmark_runs(script: str, args: list[str], tmp_path: Path) -> None:
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(sys.path)
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, str(_PACKAGE_ROOT / "tools" / script), *args],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
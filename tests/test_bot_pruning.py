@@ -9,7 +9,7 @@ import discord
 import pytest
 
 from initbot_chat.bot import _send_pruning_notifications
-from initbot_core.data.character import NewCharacterData
+from initbot_core.data.character import NewCharacterData, is_eligible_for_pruning
 
 _FUTURE = int(time.time()) + 200 * 86400
 _PLAYER_ID = 42
@@ -28,13 +28,28 @@ def _recent_char(name: str) -> NewCharacterData:
     return cdi
 
 
+def _find_prunable(chars: list[NewCharacterData]) -> object:
+    def find_prunable(
+        threshold_days: int, player_id: int | None = None
+    ) -> list[NewCharacterData]:
+        return [
+            cdi
+            for cdi in chars
+            if (player_id is None or cdi.player_id == player_id)
+            and is_eligible_for_pruning(cdi, threshold_days)
+        ]
+
+    return find_prunable
+
+
 def _mock_state_with_player(
     *chars: NewCharacterData, discord_id: int = _DISCORD_ID
 ) -> MagicMock:
     mock_player = MagicMock()
     mock_player.discord_id = discord_id
     mock_state = MagicMock()
-    mock_state.characters.get_all.return_value = list(chars)
+    mock_state.scoped.return_value = mock_state
+    mock_state.characters.find_prunable.side_effect = _find_prunable(list(chars))
     mock_state.players.get_from_id.return_value = mock_player
     return mock_state
 
@@ -156,7 +171,8 @@ async def test_pruning_notification_skips_recent() -> None:
     char1 = _recent_char("RecentMel")
 
     mock_state = MagicMock()
-    mock_state.characters.get_all.return_value = [char1]
+    mock_state.scoped.return_value = mock_state
+    mock_state.characters.find_prunable.side_effect = _find_prunable([char1])
 
     member = MagicMock()
     member.send = AsyncMock()
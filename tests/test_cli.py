@@ -0,0 +1,176 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import io
+import itertools
+import json
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from initbot_core.cli import backup, compact, export_jsonl, import_jsonl, run
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.factory import create_state_from_source
+
+
+@pytest.fixture(name="db_path")
+def _db_path(tmp_path):
+    path = tmp_path / "initbot.db"
+    state = create_state_from_source(f"sqlite:{path}")
+    alice = state.players.upsert_discord(discord_id=1, name="alice")
+    with state.transaction():
+        for i in range(200):
+            state.characters.add_store_and_get(
+                NewCharacterData(name=f"Char{i:03}", player_id=alice.id)
+            )
+    state.scoped(7).characters.add_store_and_get(
+        NewCharacterData(name="Guildie", player_id=alice.id, initiative=3)
+    )
+    state.character_actions.add("Char001", "Char001 attacks at d20")
+    state.character_actions.add("Char001", "Char001 dodges at d20")
+    state.session_secret.get_or_rotate()
+    state.close()
+    return path
+
+
+def _dump(path):
+    db = sqlite3.connect(path)
+    try:
+        return {
+            table: sorted(db.execute(f"SELECT * FROM {table}").fetchall())  # noqa: S608
+            for table in (
+                "_sqlplayerdata",
+                "_sqlcharacterdata",
+                "_sqlcharacteraction",
+                "_sqlsessionsecret",
+            )
+        }
+    finally:
+        db.close()
+
+
+def test_backup_while_writing(db_path, tmp_path):
+    target = tmp_path / "backup.db"
+    state = create_state_from_source(f"sqlite:{db_path}")
+    started = threading.Event()
+
+    def write():
+        for i in range(20):
+            state.character_actions.add("Char002", f"Char002 tries {i} at d20")
+            started.set()
+            time.sleep(0.001)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    started.wait()
+    backup(db_path, target, pages=1, pause=0.001)
+    writer.join()
+    backed_up = create_state_from_source(f"sqlite:{target}")
+    assert backed_up.scoped(7).characters.get_from_name("Guildie").initiative == 3
+    assert len(backed_up.characters.get_all()) == 200
+    assert backed_up.character_actions.get_all_for_character("Char001") == [
+        "Char001 attacks at d20",
+        "Char001 dodges at d20",
+    ]
+    state.close()
+    backed_up.close()
+
+
+def test_backup_stops_restarting_under_steady_writes(
+    db_path, tmp_path, monkeypatch, capsys
+):
+    target = tmp_path / "backup.db"
+    state = create_state_from_source(f"sqlite:{db_path}")
+    writes = itertools.count()
+
+    def write_between_steps(_seconds):
+        state.character_actions.add("Char002", f"Char002 tries {next(writes)}")
+
+    monkeypatch.setattr(
+        "initbot_core.cli.time", SimpleNamespace(sleep=write_between_steps)
+    )
+    backup(db_path, target, pages=1)
+    assert "copying in one step" in capsys.readouterr().err
+    backed_up = create_state_from_source(f"sqlite:{target}")
+    assert len(backed_up.character_actions.get_all_for_character("Char002")) == (
+        next(writes)
+    )
+    state.close()
+    backed_up.close()
+
+
+def test_backup_refuses_existing_target(db_path):
+    with pytest.raises(FileExistsError):
+        backup(db_path, db_path)
+
+
+def test_compact(db_path, tmp_path):
+    state = create_state_from_source(f"sqlite:{db_path}")
+    state.characters.prune_many(-1)
+    state.close()
+    target = tmp_path / "compact.db"
+    compact(db_path, target)
+    assert _dump(target) == _dump(db_path)
+    db = sqlite3.connect(target)
+    assert db.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    db.close()
+    assert target.stat().st_size < db_path.stat().st_size
+    with pytest.raises(FileExistsError):
+        compact(db_path, target)
+
+
+def test_export_import_round_trip(db_path, tmp_path):
+    out = io.StringIO()
+    count = export_jsonl(db_path, out)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == count + 1
+    assert json.loads(lines[0])["format"] == 1
+
+    target = tmp_path / "imported.db"
+    assert import_jsonl(target, iter(lines)) == count
+    assert _dump(target) == _dump(db_path)
+    imported = create_state_from_source(f"sqlite:{target}")
+    assert imported.players.upsert_standalone("bob").id == 2
+    imported.close()
+
+
+def test_import_rejects_other_schema_versions(db_path, tmp_path):
+    out = io.StringIO()
+    export_jsonl(db_path, out)
+    header, *rows = out.getvalue().splitlines()
+    header = json.dumps({**json.loads(header), "schema": 1})
+    target = tmp_path / "imported.db"
+    with pytest.raises(ValueError, match="schema version 1"):
+        import_jsonl(target, [header, *rows])
+    assert not target.exists()
+
+
+def test_import_rolls_back_on_error(db_path, tmp_path):
+    out = io.StringIO()
+    export_jsonl(db_path, out)
+    lines = out.getvalue().splitlines()
+    lines.append(json.dumps({"table": "_sqlcharacterdata", "row": {"evil": 1}}))
+    target = tmp_path / "imported.db"
+    with pytest.raises(ValueError, match="Unknown columns"):
+        import_jsonl(target, lines)
+    assert not target.exists()
+
+
+def test_run(db_path, tmp_path, monkeypatch, capsys):
+    run(["export", f"sqlite:{db_path}"])
+    exported = capsys.readouterr().out
+    monkeypatch.setattr("sys.stdin", io.StringIO(exported))
+    run(["import", str(tmp_path / "imported.db")])
+    assert "Imported" in capsys.readouterr().err
+    with pytest.raises(SystemExit, match="backup: "):
+        run(["backup", str(db_path), str(db_path)])
+    run(["compact", f"sqlite:{db_path}", str(tmp_path / "compact.db")])
+    assert (tmp_path / "compact.db").exists()
+    with pytest.raises(SystemExit, match="does not exist"):
+        run(["compact", str(tmp_path / "missing.db"), str(tmp_path / "new.db")])
+    with pytest.raises(SystemExit, match="Not an SQLite data store"):
+        run(["export", "memory:"])
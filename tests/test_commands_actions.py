@@ -136,6 +136,40 @@ async def test_actions_remove_out_of_range(mock_ctx):
     assert "only has 1 action" in msg
 
 
+# ---------------------------------------------------------------------------
+# $actions move
+# ---------------------------------------------------------------------------
+
+
+async def test_actions_move(mock_ctx):
+    _add_char(mock_ctx)
+    for template in ("Mel attacks at d20+3", "Mel charges at d20+5", "Mel hides d6"):
+        mock_ctx.bot.initbot_state.character_actions.add("Mel", template)
+    await actions_cmd.callback(mock_ctx, "move", "3", "1")
+    assert "#3 to #1" in mock_ctx.send.call_args[0][0]
+    templates = mock_ctx.bot.initbot_state.character_actions.get_all_for_character(
+        "Mel"
+    )
+    assert templates == [
+        "Mel hides d6",
+        "Mel attacks at d20+3",
+        "Mel charges at d20+5",
+    ]
+
+
+async def test_actions_move_out_of_range(mock_ctx):
+    _add_char(mock_ctx)
+    mock_ctx.bot.initbot_state.character_actions.add("Mel", "Mel attacks at d20+3")
+    with pytest.raises(IndexError):
+        await actions_cmd.callback(mock_ctx, "move", "1", "2")
+
+
+async def test_actions_move_needs_two_numbers(mock_ctx):
+    _add_char(mock_ctx)
+    with pytest.raises(ValueError, match="move IDX TO"):
+        await actions_cmd.callback(mock_ctx, "move", "1")
+
+
 # ---------------------------------------------------------------------------
 # $act
 # ---------------------------------------------------------------------------
@@ -2,6 +2,8 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
+from unittest.mock import patch
+
 import pytest
 from discord.ext import commands
 
@@ -13,6 +15,7 @@ from initbot_chat.commands.character import (
     remove,
     rename,
 )
+from initbot_chat.commands.utils import send_in_parts
 from initbot_core.data.character import NewCharacterData
 
 
@@ -31,6 +34,35 @@ async def test_chars_with_character(mock_ctx):
     assert "Mel" in all_msgs
 
 
+async def test_chars_streams_pages(mock_ctx, monkeypatch):
+    monkeypatch.setattr("initbot_chat.commands.character._CHARS_PAGE_SIZE", 2)
+    for name in ("Mel", "Bob", "Max", "Kim", "Ann"):
+        mock_ctx.bot.initbot_state.characters.add_store_and_get(
+            NewCharacterData(name=name, player_id=mock_ctx.author.player_id)
+        )
+    page = mock_ctx.bot.initbot_state.characters.page
+    with patch.object(
+        type(mock_ctx.bot.initbot_state.characters), "page", autospec=True
+    ) as page_spy:
+        page_spy.side_effect = lambda _self, *args: page(*args)
+        await chars.callback(mock_ctx)
+    assert page_spy.call_count == 3
+    msg = mock_ctx.send.call_args[0][0]
+    assert msg.index("0: **Ann**") < msg.index("2: **Kim**") < msg.index("4: **Mel**")
+
+
+async def test_send_in_parts_accepts_async_iterables(mock_ctx):
+    async def parts():
+        for i in range(300):
+            yield f"line {i:03} " + "x" * 10
+
+    await send_in_parts(mock_ctx, parts())
+    sent = [call[0][0] for call in mock_ctx.send.call_args_list]
+    assert len(sent) > 1
+    assert all(len(msg) <= 2000 for msg in sent)
+    assert "line 299" in sent[-1]
+
+
 async def test_char_by_prefix(mock_ctx):
     mock_ctx.bot.initbot_state.characters.add_store_and_get(
         NewCharacterData(name="Mediocre Mel", player_id=mock_ctx.author.player_id)
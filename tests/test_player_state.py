@@ -2,8 +2,14 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
+import sqlite3
+from unittest.mock import patch
+
 import pytest
 
+from initbot_core.state.factory import create_state_from_source
+from initbot_core.state.sql import SqlState
+
 
 def test_player_upsert_creates_record(initbot_state):
     player = initbot_state.players.upsert_discord(discord_id=111222333, name="alice")
@@ -81,3 +87,88 @@ def test_upsert_standalone_returns_error_when_name_taken_by_discord_player(
     initbot_state.players.upsert_discord(discord_id=42, name="Alice")
     result = initbot_state.players.upsert_standalone("Alice")
     assert isinstance(result, str)
+
+
+def _player_queries(state):
+    statements: list[str] = []
+    state._connections.set_trace_callback(  # pylint: disable=protected-access
+        statements.append
+    )
+    return lambda: [s for s in statements if "FROM _sqlplayerdata" in s]
+
+
+def test_player_lookups_are_cached(initbot_state):
+    player = initbot_state.players.upsert_discord(discord_id=111222333, name="alice")
+    queries = _player_queries(initbot_state)
+    for _ in range(3):
+        assert initbot_state.players.get_from_id(player.id) == player
+        assert initbot_state.players.get_from_discord_id(111222333) == player
+    assert not queries()
+    info = initbot_state.players.cache_info()
+    # The upsert looked the player up before creating it.
+    assert (info.hits, info.misses, info.currsize) == (6, 1, 1)
+
+
+def test_player_cache_hands_out_copies(initbot_state):
+    player = initbot_state.players.upsert_discord(discord_id=111222333, name="alice")
+    initbot_state.players.get_from_id(player.id).name = "mallory"
+    assert initbot_state.players.get_from_id(player.id).name == "alice"
+
+
+def test_player_cache_counts_misses(initbot_state):
+    player = initbot_state.players.upsert_discord(discord_id=111222333, name="alice")
+    before = initbot_state.players.cache_info()
+    initbot_state.players.discard_cache()
+    initbot_state.players.get_from_id(player.id)
+    initbot_state.players.get_from_id(player.id)
+    with pytest.raises(KeyError):
+        initbot_state.players.get_from_id(99999)
+    info = initbot_state.players.cache_info()
+    assert (info.hits - before.hits, info.misses - before.misses) == (1, 2)
+
+
+def test_player_cache_follows_upserts(initbot_state):
+    player = initbot_state.players.upsert_discord(discord_id=111222333, name="alice")
+    initbot_state.players.get_from_id(player.id)
+    initbot_state.players.upsert_discord(discord_id=111222333, name="alice_renamed")
+    assert initbot_state.players.get_from_id(player.id).name == "alice_renamed"
+    assert initbot_state.players.get_from_discord_id(111222333).name == "alice_renamed"
+
+
+def test_player_cache_notices_other_connections(tmp_path):
+    db_path = tmp_path / "test.db"
+    state = create_state_from_source(f"sqlite:{db_path}")
+    player = state.players.upsert_discord(discord_id=111222333, name="alice")
+    assert state.players.get_from_id(player.id).name == "alice"
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE _sqlplayerdata SET name='bob' WHERE id=?", (player.id,))
+    conn.commit()
+    conn.close()
+    assert state.players.get_from_id(player.id).name == "bob"
+
+
+def test_player_cache_is_bounded(tmp_path):
+    with patch("initbot_core.state.sql.CORE_CFG.state_player_cache_size", 2):
+        state = SqlState(f"sqlite:{tmp_path / 'test.db'}")
+    ids = [
+        state.players.upsert_discord(discord_id=i, name=f"p{i}").id for i in range(3)
+    ]
+    assert state.players.cache_info().currsize == 2
+    queries = _player_queries(state)
+    state.players.get_from_id(ids[2])
+    assert not queries()
+    state.players.get_from_id(ids[0])
+    assert queries()
+
+
+def test_player_cache_discarded_on_rollback(initbot_state):
+    player = initbot_state.players.upsert_discord(discord_id=111222333, name="alice")
+
+    def rename_and_fail():
+        with initbot_state.transaction():
+            initbot_state.players.upsert_discord(discord_id=111222333, name="bob")
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        rename_and_fail()
+    assert initbot_state.players.get_from_id(player.id).name == "alice"
@@ -3,8 +3,12 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
 import time
+from unittest.mock import MagicMock
+
+import pytest
 
 from initbot_core.data.character import NewCharacterData, is_eligible_for_pruning
+from initbot_core.state.factory import create_state_from_source
 
 THRESHOLD = 90
 
@@ -24,3 +28,88 @@ def test_not_eligible_when_last_used_is_recent():
     recent_ts = int(time.time())
     cdi = NewCharacterData(name="X", player_id=1, last_used=recent_ts)
     assert not is_eligible_for_pruning(cdi, THRESHOLD)
+
+
+@pytest.fixture(name="state", params=[False, True], ids=["uncached", "cached"])
+def _state(tmp_path, request):
+    state = create_state_from_source(
+        f"sqlite:{tmp_path / 'test.db'}", cache=request.param
+    )
+    alice = state.players.upsert_discord(discord_id=1, name="alice")
+    bob = state.players.upsert_discord(discord_id=2, name="bob")
+    old_ts = int(time.time()) - (THRESHOLD + 1) * 86400
+    for name, player, last_used in (
+        ("OldMel", alice, old_ts),
+        ("NewMax", alice, None),
+        ("OldBrad", bob, old_ts),
+    ):
+        state.characters.add_store_and_get(
+            NewCharacterData(name=name, player_id=player.id)
+        )
+        state.character_actions.add(name, f"{name} attacks at d20")
+        state._db.execute(  # pylint: disable=protected-access
+            "UPDATE _sqlcharacterdata SET last_used=? WHERE name=?", (last_used, name)
+        )
+    state.characters.discard_cache()
+    return state
+
+
+def test_find_prunable_matches_is_eligible(state):
+    expected = {
+        cdi.name
+        for cdi in state.characters.get_all()
+        if is_eligible_for_pruning(cdi, THRESHOLD)
+    }
+    found = state.characters.find_prunable(THRESHOLD)
+    assert {cdi.name for cdi in found} == expected == {"OldMel", "NewMax", "OldBrad"}
+    alice = state.players.get_from_discord_id(1)
+    assert {
+        cdi.name for cdi in state.characters.find_prunable(THRESHOLD, alice.id)
+    } == {"OldMel", "NewMax"}
+
+
+def test_find_prunable_skips_recently_used(state):
+    max_ = state.characters.get_from_name("NewMax")
+    max_.last_used = int(time.time())
+    state.characters.update_and_store(max_)
+    assert {cdi.name for cdi in state.characters.find_prunable(THRESHOLD)} == {
+        "OldMel",
+        "OldBrad",
+    }
+
+
+def test_prune_many_removes_characters_and_actions(state):
+    alice = state.players.get_from_discord_id(1)
+    on_change = MagicMock()
+    state._notifier._on_change = on_change  # pylint: disable=protected-access
+    assert sorted(state.characters.prune_many(THRESHOLD, alice.id)) == [
+        "NewMax",
+        "OldMel",
+    ]
+    on_change.assert_called_once()
+    assert [cdi.name for cdi in state.characters.get_all()] == ["OldBrad"]
+    assert not state.character_actions.get_all_for_character("OldMel")
+    assert state.character_actions.get_all_for_character("OldBrad")
+    assert state.characters.prune_many(THRESHOLD, alice.id) == []
+    on_change.assert_called_once()
+
+
+def test_prune_many_joins_enclosing_transaction(state):
+    def prune_and_fail():
+        with state.transaction():
+            state.characters.prune_many(THRESHOLD)
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        prune_and_fail()
+    assert len(state.characters.get_all()) == 3
+    assert state.character_actions.get_all_for_character("OldMel")
+
+
+def test_find_prunable_uses_last_used_index(state):
+    plan = state._db.execute(  # pylint: disable=protected-access
+        "EXPLAIN QUERY PLAN SELECT name FROM _sqlcharacterdata"
+        " WHERE (last_used IS NULL OR last_used<?)",
+        (0,),
+    ).fetchall()
+    assert any("_sqlcharacterdata_last_used" in row[-1] for row in plan)
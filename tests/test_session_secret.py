@@ -2,6 +2,8 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
+from unittest.mock import patch
+
 import pytest
 
 import initbot_core.state.state as state_module
@@ -41,3 +43,19 @@ def test_get_or_rotate_new_secret_is_stable_after_rotation(state, monkeypatch):
     secret2 = state.session_secret.get_or_rotate()
     secret3 = state.session_secret.get_or_rotate()
     assert secret2 == secret3
+
+
+def test_get_or_rotate_is_cached_until_expiry(state):
+    secret = state.session_secret.get_or_rotate()
+    with patch.object(type(state.session_secret), "_load") as load:
+        assert state.session_secret.get_or_rotate() == secret
+    load.assert_not_called()
+
+
+def test_get_or_rotate_adopts_secret_rotated_elsewhere(state, tmp_path, monkeypatch):
+    state.session_secret.get_or_rotate()
+    other = create_state_from_source(f"sqlite:{tmp_path / 'test.db'}")
+    future = int(state_module.time.time()) + _SESSION_SECRET_TTL + 1
+    monkeypatch.setattr(state_module.time, "time", lambda: future)
+    rotated = other.session_secret.get_or_rotate()
+    assert state.session_secret.get_or_rotate() == rotated
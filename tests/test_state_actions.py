@@ -0,0 +1,263 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import sqlite3
+from itertools import pairwise
+
+import pytest
+
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.factory import create_state_from_source
+from initbot_core.state.sql import (
+    _ACTION_POSITION_GAP,
+    _MAX_PARAMS,
+    _MIGRATIONS,
+    _add_character_ids,
+    _spread_action_positions,
+)
+
+
+@pytest.fixture(name="state")
+def _state(initbot_state):
+    for name in ("Mel", "Bob"):
+        initbot_state.characters.add_store_and_get(
+            NewCharacterData(name=name, player_id=1)
+        )
+    return initbot_state
+
+
+def test_add_appends_after_remove(state):
+    actions = state.character_actions
+    assert [actions.add("Mel", t) for t in ("a", "b", "c")] == [1, 2, 3]
+    actions.remove("Mel", 2)
+    assert actions.add("Mel", "d") == 3
+    assert actions.get_all_for_character("Mel") == ["a", "c", "d"]
+
+
+@pytest.mark.parametrize("index", [0, 3, -1])
+def test_update_and_remove_out_of_range(state, index):
+    actions = state.character_actions
+    actions.add("Mel", "a")
+    actions.add("Mel", "b")
+    with pytest.raises(IndexError, match=r"\(1-2\)"):
+        actions.update("Mel", index, "x")
+    with pytest.raises(IndexError, match=r"\(1-2\)"):
+        actions.remove("Mel", index)
+    assert actions.get_all_for_character("Mel") == ["a", "b"]
+
+
+def test_get_all_for_characters(state):
+    actions = state.character_actions
+    for name, template in (("Mel", "m1"), ("Bob", "b1"), ("Mel", "m2")):
+        actions.add(name, template)
+    assert actions.get_all_for_characters(["Mel", "Max", "Bob"]) == {
+        "Mel": ["m1", "m2"],
+        "Max": [],
+        "Bob": ["b1"],
+    }
+
+
+def test_get_all_for_characters_beyond_parameter_limit(state):
+    names = [f"Char{i}" for i in range(_MAX_PARAMS + 2)]
+    state.characters.add_store_and_get(NewCharacterData(name=names[-1], player_id=1))
+    state.character_actions.add(names[-1], "last")
+    result = state.character_actions.get_all_for_characters(names)
+    assert len(result) == len(names)
+    assert result[names[-1]] == ["last"]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT template FROM _sqlcharacteraction WHERE character_id=?"
+        " ORDER BY position",
+        "SELECT MAX(position) FROM _sqlcharacteraction WHERE character_id=?",
+        "DELETE FROM _sqlcharacteraction WHERE character_id=?",
+    ],
+)
+def test_action_queries_use_index(state, query):
+    plan = state._db.execute(  # pylint: disable=protected-access
+        f"EXPLAIN QUERY PLAN {query}", ("Mel",)
+    ).fetchall()
+    assert any("_sqlcharacteraction_position" in row[-1] for row in plan)
+    assert not any("TEMP B-TREE" in row[-1] for row in plan)
+
+
+def _positions(state, character_name):
+    return [
+        row[0]
+        for row in state._db.execute(  # pylint: disable=protected-access
+            "SELECT position FROM _sqlcharacteraction WHERE character_id="
+            "(SELECT id FROM _sqlcharacterdata WHERE name=?) ORDER BY position",
+            (character_name,),
+        )
+    ]
+
+
+def test_remove_keeps_other_positions(state):
+    actions = state.character_actions
+    for template in "abcd":
+        actions.add("Mel", template)
+    before = _positions(state, "Mel")
+    actions.remove("Mel", 2)
+    assert _positions(state, "Mel") == [before[0], *before[2:]]
+    assert actions.get_all_for_character("Mel") == ["a", "c", "d"]
+
+
+@pytest.mark.parametrize(
+    ("from_index", "to_index", "expected"),
+    [
+        (1, 4, "bcda"),
+        (4, 1, "dabc"),
+        (2, 3, "acbd"),
+        (3, 2, "acbd"),
+        (2, 2, "abcd"),
+    ],
+)
+def test_move(state, from_index, to_index, expected):
+    actions = state.character_actions
+    for template in "abcd":
+        actions.add("Mel", template)
+    actions.add("Bob", "x")
+    actions.move("Mel", from_index, to_index)
+    assert "".join(actions.get_all_for_character("Mel")) == expected
+    assert actions.get_all_for_character("Bob") == ["x"]
+
+
+def test_move_writes_one_row(state):
+    actions = state.character_actions
+    for template in "abcd":
+        actions.add("Mel", template)
+    before = _positions(state, "Mel")
+    actions.move("Mel", 4, 2)
+    after = _positions(state, "Mel")
+    assert len(set(after) - set(before)) == 1
+
+
+def test_move_rebalances_when_gaps_run_out(state):
+    actions = state.character_actions
+    for template in "abc":
+        actions.add("Mel", template)
+    # Each move halves the gap between "a" and the action moved behind it.
+    expected = list("abc")
+    for _ in range(_ACTION_POSITION_GAP.bit_length() + 2):
+        actions.move("Mel", 3, 2)
+        expected.insert(1, expected.pop())
+        assert actions.get_all_for_character("Mel") == expected
+    positions = _positions(state, "Mel")
+    assert min(b - a for a, b in pairwise(positions)) > 1
+
+
+@pytest.mark.parametrize(("from_index", "to_index"), [(0, 1), (1, 3), (3, 1)])
+def test_move_out_of_range(state, from_index, to_index):
+    actions = state.character_actions
+    actions.add("Mel", "a")
+    actions.add("Mel", "b")
+    with pytest.raises(IndexError, match=r"\(1-2\)"):
+        actions.move("Mel", from_index, to_index)
+    assert actions.get_all_for_character("Mel") == ["a", "b"]
+
+
+def test_contiguous_positions_are_spread_by_migration(tmp_path):
+    db_path = tmp_path / "test.db"
+    conn = sqlite3.connect(db_path)
+    version = _MIGRATIONS.index(_spread_action_positions)
+    for migration in _MIGRATIONS[:version]:
+        migration(conn)
+    conn.execute(f"PRAGMA user_version={version}")
+    conn.executemany(
+        "INSERT INTO _sqlcharacterdata (name, name_key) VALUES (?, ?)",
+        [("Mel", "mel"), ("Bob", "bob")],
+    )
+    conn.executemany(
+        "INSERT INTO _sqlcharacteraction (character_name, position, template)"
+        " VALUES (?, ?, ?)",
+        [("Mel", 0, "a"), ("Mel", 1, "b"), ("Bob", 0, "x"), ("Mel", 2, "c")],
+    )
+    conn.commit()
+    conn.close()
+
+    state = create_state_from_source(f"sqlite:{db_path}")
+    assert _positions(state, "Mel") == [
+        0,
+        _ACTION_POSITION_GAP,
+        2 * _ACTION_POSITION_GAP,
+    ]
+    assert _positions(state, "Bob") == [0]
+    state.character_actions.move("Mel", 1, 2)
+    assert state.character_actions.get_all_for_character("Mel") == ["b", "a", "c"]
+
+
+def test_actions_follow_their_character(state):
+    actions = state.character_actions
+    actions.add("Mel", "a")
+    actions.add("Bob", "x")
+    mel = state.characters.get_from_name("Mel")
+    state.characters.rename_and_store(mel, "Max")
+    assert actions.get_all_for_characters(["Mel", "Max"]) == {"Mel": [], "Max": ["a"]}
+    state.characters.remove_and_store(state.characters.get_from_name("Max"))
+    bob = state.characters.get_from_name("Bob")
+    bob.last_used = 0
+    state.characters.update_and_store(bob)
+    assert state.characters.prune_many(90) == ["Bob"]
+    assert not state._db.execute(  # pylint: disable=protected-access
+        "SELECT * FROM _sqlcharacteraction"
+    ).fetchall()
+
+
+def test_add_for_unknown_character(state):
+    with pytest.raises(KeyError, match="Max"):
+        state.character_actions.add("Max", "a")
+    # Names are matched exactly, not by prefix or case.
+    with pytest.raises(KeyError):
+        state.character_actions.add("mel", "a")
+
+
+def test_character_ids_are_added_by_migration(tmp_path, caplog):
+    db_path = tmp_path / "test.db"
+    conn = sqlite3.connect(db_path)
+    version = _MIGRATIONS.index(_add_character_ids)
+    for migration in _MIGRATIONS[:version]:
+        migration(conn)
+    conn.execute(f"PRAGMA user_version={version}")
+    conn.executemany(
+        "INSERT INTO _sqlcharacterdata (name, name_key, player_id, scope)"
+        " VALUES (?, ?, 1, ?)",
+        [("Mel", "mel", 0), ("Bob", "bob", 7)],
+    )
+    conn.executemany(
+        "INSERT INTO _sqlcharacteraction (character_name, position, template)"
+        " VALUES (?, ?, ?)",
+        [("Mel", 0, "a"), ("Bob", 0, "x"), ("Gone", 0, "y"), ("Mel", 1, "b")],
+    )
+    conn.commit()
+    indexes = {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE tbl_name='_sqlcharacterdata'"
+            " AND sql IS NOT NULL"
+        )
+    }
+    conn.close()
+
+    state = create_state_from_source(f"sqlite:{db_path}")
+    revision = state.get_revision()
+    assert "Dropping 1 actions" in caplog.text
+    db = state._db  # pylint: disable=protected-access
+    assert db.execute(
+        "SELECT id, name FROM _sqlcharacterdata ORDER BY id"
+    ).fetchall() == [
+        (1, "Mel"),
+        (2, "Bob"),
+    ]
+    assert indexes <= {row[0] for row in db.execute("SELECT name FROM sqlite_master")}
+    assert state.character_actions.get_all_for_character("Mel") == ["a", "b"]
+    assert state.scoped(7).characters.get_from_name("Bob").player_id == 1
+    assert state.scoped(7).character_actions.get_all_for_character("Bob") == ["x"]
+    assert not db.execute("PRAGMA foreign_key_check").fetchall()
+    state.characters.remove_and_store(state.characters.get_from_name("Mel"))
+    assert state.get_revision() == revision + 1
+    assert not state.character_actions.get_all_for_character("Mel")
+    # Names are unique per scope only.
+    state.characters.add_store_and_get(NewCharacterData("Bob", player_id=1))
@@ -0,0 +1,101 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import asyncio
+import threading
+
+import pytest
+
+from initbot_chat.commands.character import chars
+from initbot_chat.commands.init import init
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.async_state import AsyncState, run_on_state
+from initbot_core.state.factory import create_state_from_source
+
+
+@pytest.fixture(name="async_state")
+def _async_state(initbot_state):
+    async_state = AsyncState(initbot_state, max_pending=4, max_batch=8)
+    yield async_state
+    async_state.close()
+
+
+async def test_run_executes_on_worker_thread(async_state):
+    thread_name = await async_state.run(lambda _: threading.current_thread().name)
+    assert thread_name == "initbot-state"
+    assert thread_name != threading.current_thread().name
+
+
+async def test_run_propagates_exceptions(async_state):
+    with pytest.raises(KeyError):
+        await async_state.run(lambda s: s.players.get_from_id(12345))
+    assert await async_state.run(lambda s: len(s.players.get_all())) == 0
+
+
+async def test_sub_state_proxies_are_awaitable(async_state):
+    player = await async_state.players.upsert_discord(discord_id=1, name="alice")
+    await async_state.characters.add_store_and_get(
+        NewCharacterData(name="Mel", player_id=player.id)
+    )
+    mel = await async_state.characters.get_from_name("mel")
+    assert mel.name == "Mel"
+
+
+async def test_queue_is_bounded_and_calls_are_batched(async_state):
+    release = threading.Event()
+    batches: list[int] = []
+    deliver = async_state._deliver  # pylint: disable=protected-access
+
+    def record(done):
+        batches.append(len(done))
+        deliver(done)
+
+    async_state._deliver = record  # pylint: disable=protected-access
+    blocker = asyncio.create_task(async_state.run(lambda _: release.wait()))
+    await asyncio.sleep(0.05)
+    tasks = [asyncio.create_task(async_state.run(lambda _, i=i: i)) for i in range(6)]
+    await asyncio.sleep(0.05)
+    # One slot is taken by the blocked call, so only three more calls can queue up.
+    assert async_state._requests.qsize() == 3  # pylint: disable=protected-access
+    release.set()
+    assert await blocker is True
+    assert await asyncio.gather(*tasks) == list(range(6))
+    assert batches[0] == 1
+    assert len(batches) < 7
+
+
+async def test_run_on_state_accepts_plain_state(initbot_state):
+    assert await run_on_state(initbot_state, lambda s: s is initbot_state)
+
+
+async def test_run_on_state_moves_slow_calls_off_the_event_loop(initbot_state):
+    loop_thread = threading.get_ident()
+    on_loop = await run_on_state(initbot_state, lambda s: threading.get_ident())
+    in_thread = await run_on_state(
+        initbot_state, lambda s: threading.get_ident(), in_thread=True
+    )
+    assert on_loop == loop_thread
+    assert in_thread != loop_thread
+
+
+def test_factory_creates_async_state(tmp_path):
+    async_state = create_state_from_source(
+        f"sqlite:{tmp_path / 'test.db'}", asynchronous=True
+    )
+    try:
+        assert isinstance(async_state, AsyncState)
+    finally:
+        async_state.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        asyncio.run(async_state.run(lambda _: None))
+
+
+async def test_commands_use_worker_thread(mock_ctx, async_state):
+    state = mock_ctx.bot.initbot_state
+    mock_ctx.bot.initbot_state = async_state
+    await init.callback(mock_ctx, "Mel", "12")
+    assert state.characters.get_from_name("Mel").initiative == 12
+    mock_ctx.send.reset_mock()
+    await chars.callback(mock_ctx)
+    assert "Mel" in mock_ctx.send.call_args[0][0]
@@ -0,0 +1,120 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import sys
+import threading
+
+import pytest
+
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.factory import create_state_from_source
+
+
+@pytest.fixture(name="db_path")
+def _db_path(tmp_path):
+    return tmp_path / "test.db"
+
+
+@pytest.fixture(name="cached_state")
+def _cached_state(db_path):
+    return create_state_from_source(f"sqlite:{db_path}", cache=True)
+
+
+def _add(state, name, discord_id=1):
+    player = state.players.upsert_discord(discord_id=discord_id, name="alice")
+    return state.characters.add_store_and_get(
+        NewCharacterData(name=name, player_id=player.id)
+    )
+
+
+def _trace_statements(state):
+    statements: list[str] = []
+    state._connections.set_trace_callback(  # pylint: disable=protected-access
+        statements.append
+    )
+    return statements
+
+
+def test_cached_reads_do_not_query_table(cached_state):
+    _add(cached_state, "Mediocre Mel")
+    cached_state.characters.get_all()
+    statements = _trace_statements(cached_state)
+    assert cached_state.characters.get_from_name("Mediocre Mel").name == "Mediocre Mel"
+    assert cached_state.characters.get_from_name("med").name == "Mediocre Mel"
+    assert len(cached_state.characters.get_all()) == 1
+    assert not [s for s in statements if "_sqlcharacterdata" in s]
+
+
+def test_cached_writes_are_visible_to_cached_reads(cached_state):
+    cdi = _add(cached_state, "Mel")
+    cdi.initiative = 12
+    cached_state.characters.update_and_store(cdi)
+    assert cached_state.characters.get_from_name("Mel").initiative == 12
+    renamed = cached_state.characters.rename_and_store(cdi, "Alex")
+    assert [c.name for c in cached_state.characters.get_all()] == ["Alex"]
+    cached_state.characters.remove_and_store(renamed)
+    assert not cached_state.characters.get_all()
+
+
+def test_cached_writes_reach_the_database(cached_state, db_path):
+    _add(cached_state, "Mel")
+    other = create_state_from_source(f"sqlite:{db_path}")
+    assert [c.name for c in other.characters.get_all()] == ["Mel"]
+
+
+def test_mutating_returned_character_does_not_change_cache(cached_state):
+    _add(cached_state, "Mel")
+    cdi = cached_state.characters.get_from_name("Mel")
+    cdi.initiative = 20
+    assert cached_state.characters.get_from_name("Mel").initiative is None
+
+
+def test_cache_picks_up_writes_from_other_connection(cached_state, db_path):
+    _add(cached_state, "Mel")
+    assert len(cached_state.characters.get_all()) == 1
+    other = create_state_from_source(f"sqlite:{db_path}")
+    mel = other.characters.get_from_name("Mel")
+    mel.initiative = 7
+    other.characters.update_and_store(mel)
+    other.characters.add_store_and_get(
+        NewCharacterData(name="Bob", player_id=mel.player_id)
+    )
+    assert cached_state.characters.get_from_name("Mel").initiative == 7
+    assert {c.name for c in cached_state.characters.get_all()} == {"Mel", "Bob"}
+
+
+def test_cached_state_enforces_unique_names(cached_state):
+    _add(cached_state, "Mel")
+    with pytest.raises(ValueError, match="already exists"):
+        _add(cached_state, "mel")
+
+
+def test_cached_reads_while_another_thread_writes(cached_state):
+    player = cached_state.players.upsert_discord(discord_id=1, name="alice")
+    for i in range(2000):
+        _add(cached_state, f"Old {i:04}")
+    cached_state.characters.get_all()
+    done = threading.Event()
+
+    def write():
+        try:
+            for i in range(500):
+                cached_state.characters.add_store_and_get(
+                    NewCharacterData(name=f"New {i:03}", player_id=player.id)
+                )
+        finally:
+            done.set()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    writer = threading.Thread(target=write)
+    try:
+        writer.start()
+        while not done.is_set():
+            cached_state.characters.get_all()
+            cached_state.characters.page("Old 1000", 100)
+    finally:
+        sys.setswitchinterval(interval)
+        writer.join()
+    assert len(cached_state.characters.get_all()) == 2500
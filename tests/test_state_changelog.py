@@ -0,0 +1,105 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import sqlite3
+
+import pytest
+
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.factory import create_state_from_source
+from initbot_core.state.sql import _CHANGELOG_RETAINED, _MAX_PARAMS
+
+
+@pytest.fixture(name="player")
+def _player(initbot_state):
+    return initbot_state.players.upsert_discord(discord_id=1, name="alice")
+
+
+def _add(state, name, player):
+    return state.characters.add_store_and_get(
+        NewCharacterData(name=name, player_id=player.id)
+    )
+
+
+def test_revision_grows_with_every_change(initbot_state, player):
+    start = initbot_state.get_revision()
+    mel = _add(initbot_state, "Mel", player)
+    after_add = initbot_state.get_revision()
+    mel.initiative = 3
+    initbot_state.characters.update_and_store(mel)
+    assert start < after_add < initbot_state.get_revision()
+
+
+def test_changes_since_report_current_rows(initbot_state, player):
+    revision = initbot_state.get_revision()
+    mel = _add(initbot_state, "Mel", player)
+    mel.initiative = 12
+    initbot_state.characters.update_and_store(mel)
+    bob = _add(initbot_state, "Bob", player)
+    initbot_state.characters.remove_and_store(bob)
+
+    changes = initbot_state.get_changes_since(revision)
+    assert changes.complete
+    assert changes.revision == initbot_state.get_revision()
+    assert [(c.name, c.initiative) for c in changes.characters] == [("Mel", 12)]
+    assert changes.removed_characters == ["Bob"]
+    assert not changes.players
+    assert initbot_state.get_changes_since(changes.revision).characters == []
+
+
+def test_rename_reports_old_name_as_removed(initbot_state, player):
+    mel = _add(initbot_state, "Mel", player)
+    revision = initbot_state.get_revision()
+    initbot_state.characters.rename_and_store(mel, "Alex")
+    changes = initbot_state.get_changes_since(revision)
+    assert [c.name for c in changes.characters] == ["Alex"]
+    assert changes.removed_characters == ["Mel"]
+
+
+def test_player_changes_are_reported(initbot_state, player):
+    revision = initbot_state.get_revision()
+    initbot_state.players.upsert_discord(discord_id=1, name="Alice B.")
+    changes = initbot_state.get_changes_since(revision)
+    assert [(p.id, p.name) for p in changes.players] == [(player.id, "Alice B.")]
+
+
+def test_changes_by_other_connection_are_reported(initbot_state, player, tmp_path):
+    revision = initbot_state.get_revision()
+    other = create_state_from_source(f"sqlite:{tmp_path / 'test.db'}")
+    _add(other, "Mel", player)
+    changes = initbot_state.get_changes_since(revision)
+    assert [c.name for c in changes.characters] == ["Mel"]
+
+
+def test_change_log_is_truncated(initbot_state, player):
+    mel = _add(initbot_state, "Mel", player)
+    with initbot_state.transaction():
+        for initiative in range(_CHANGELOG_RETAINED + 10):
+            mel.initiative = initiative
+            initbot_state.characters.update_and_store(mel)
+    count = initbot_state._db.execute(  # pylint: disable=protected-access
+        "SELECT COUNT(*) FROM _changelog"
+    ).fetchone()[0]
+    assert count == _CHANGELOG_RETAINED
+    assert not initbot_state.get_changes_since(0).complete
+    recent = initbot_state.get_changes_since(initbot_state.get_revision() - 5)
+    assert recent.complete
+    assert recent.characters[0].initiative == _CHANGELOG_RETAINED + 9
+
+
+def test_many_changes_are_read_in_chunks(initbot_state, player):
+    db = initbot_state._db  # pylint: disable=protected-access
+    if not hasattr(db, "setlimit"):
+        pytest.skip("Connection.setlimit() needs Python 3.11")
+    # Builds of SQLite since 3.32 accept more host parameters than older ones.
+    db.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, _MAX_PARAMS)
+    revision = initbot_state.get_revision()
+    names = [f"Char{i}" for i in range(_CHANGELOG_RETAINED)]
+    with initbot_state.transaction():
+        for name in names:
+            _add(initbot_state, name, player)
+    changes = initbot_state.get_changes_since(revision)
+    assert changes.complete
+    assert len(names) > _MAX_PARAMS
+    assert [c.name for c in changes.characters] == names
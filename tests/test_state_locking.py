@@ -0,0 +1,149 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import multiprocessing
+import sqlite3
+import threading
+
+import pytest
+
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.sql import SqlState
+from initbot_core.state.state import LOCK_WAIT_BUCKETS
+
+_CHARACTERS_PER_PROCESS = 50
+
+
+@pytest.fixture(name="db_path")
+def _db_path(tmp_path):
+    path = tmp_path / "test.db"
+    SqlState(f"sqlite:{path}").close()
+    return path
+
+
+def _lock(db_path):
+    holder = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    return holder
+
+
+def test_busy_write_is_retried(db_path):
+    state = SqlState(f"sqlite:{db_path}", busy_timeout=0, busy_retries=10)
+    holder = _lock(db_path)
+    release = threading.Timer(0.05, holder.execute, ("COMMIT",))
+    release.start()
+    try:
+        assert state.players.upsert_discord(discord_id=1, name="alice").id == 1
+    finally:
+        release.join()
+        holder.close()
+    stats = state.lock_stats()
+    assert stats.retries > 0
+    assert stats.busy == stats.retries
+    assert not stats.failures
+    assert stats.writes == 1
+    assert sum(stats.wait_histogram) == 1
+    assert stats.wait_seconds >= 0.05
+
+
+def test_busy_write_gives_up(db_path):
+    state = SqlState(f"sqlite:{db_path}", busy_timeout=0, busy_retries=2)
+    holder = _lock(db_path)
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            state.players.upsert_standalone("bob")
+    finally:
+        holder.close()
+    stats = state.lock_stats()
+    assert (stats.busy, stats.retries, stats.failures) == (3, 2, 1)
+    assert state.players.upsert_standalone("bob").id == 1
+
+
+def test_transaction_start_is_retried(db_path):
+    state = SqlState(f"sqlite:{db_path}", busy_timeout=0, busy_retries=10)
+    holder = _lock(db_path)
+    release = threading.Timer(0.05, holder.execute, ("COMMIT",))
+    release.start()
+    try:
+        with state.transaction():
+            state.characters.add_store_and_get(
+                NewCharacterData(name="Mel", player_id=1)
+            )
+    finally:
+        release.join()
+        holder.close()
+    assert state.lock_stats().retries > 0
+    assert state.characters.get_from_name("Mel")
+
+
+def test_migration_waits_for_the_write_lock(tmp_path):
+    db_path = tmp_path / "new.db"
+    # In WAL mode already, so that only the migrations need the write lock.
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    holder = _lock(db_path)
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            SqlState(f"sqlite:{db_path}", busy_timeout=0, busy_retries=0)
+        release = threading.Timer(0.05, holder.execute, ("COMMIT",))
+        release.start()
+        state = SqlState(f"sqlite:{db_path}", busy_timeout=0, busy_retries=10)
+        release.join()
+    finally:
+        holder.close()
+    assert state.players.upsert_standalone("bob").id == 1
+
+
+def test_reads_do_not_count_as_writes(db_path):
+    state = SqlState(f"sqlite:{db_path}")
+    bob = state.players.upsert_standalone("bob")
+    assert state.players.upsert_standalone("Bob") == bob
+    assert state.lock_stats().writes == 1
+
+
+def test_lock_wait_histogram_buckets(db_path):
+    state = SqlState(f"sqlite:{db_path}")
+    state.players.upsert_standalone("bob")
+    stats = state.lock_stats()
+    assert len(stats.wait_histogram) == len(LOCK_WAIT_BUCKETS)
+    assert sum(stats.wait_histogram) == stats.writes
+
+
+def _write_characters(db_path, prefix, barrier):
+    # Runs in a child process, like the chat bot and the web app sharing a database.
+    state = SqlState(f"sqlite:{db_path}", busy_timeout=0.1)
+    barrier.wait()
+    try:
+        for i in range(_CHARACTERS_PER_PROCESS):
+            with state.transaction():
+                name = f"{prefix}{i:03}"
+                state.characters.add_store_and_get(
+                    NewCharacterData(name=name, player_id=1)
+                )
+                state.character_actions.add(name, f"{name} attacks at d20")
+            state.players.upsert_discord(discord_id=1, name=f"{prefix}{i}")
+        return state.lock_stats()
+    finally:
+        state.close()
+
+
+def test_two_processes_write_concurrently(db_path):
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, context.Pool(2) as pool:
+        barrier = manager.Barrier(2)
+        stats = pool.starmap(
+            _write_characters, [(db_path, "Mel", barrier), (db_path, "Max", barrier)]
+        )
+    assert all(not s.failures for s in stats)
+    assert all(s.writes >= 2 * _CHARACTERS_PER_PROCESS for s in stats)
+    state = SqlState(f"sqlite:{db_path}")
+    assert len(state.characters.get_all()) == 2 * _CHARACTERS_PER_PROCESS
+    assert (
+        len(state.character_actions.get_all_for_characters(["Mel000", "Max049"])) == 2
+    )
+    assert state.players.get_from_discord_id(1).name in {
+        f"Mel{_CHARACTERS_PER_PROCESS - 1}",
+        f"Max{_CHARACTERS_PER_PROCESS - 1}",
+    }
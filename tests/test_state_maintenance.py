@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.factory import create_state_from_source
+from initbot_core.state.sql import SqlState
+
+
+def _fill(state, count=200):
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    for i in range(count):
+        state.characters.add_store_and_get(
+            NewCharacterData(name=f"Char{i:04}", player_id=player.id)
+        )
+
+
+def test_maintain_checkpoints_passively(initbot_state, tmp_path):
+    _fill(initbot_state)
+    report = initbot_state.maintain()
+    assert report.checkpoint_mode == "PASSIVE"
+    assert not report.checkpoint_busy
+    assert report.checkpointed_frames > 0
+    assert report.wal_bytes_before > 0
+    assert report.db_bytes == (tmp_path / "test.db").stat().st_size
+
+
+def test_maintain_truncates_large_wal(initbot_state):
+    _fill(initbot_state)
+    with patch("initbot_core.state.sql.CORE_CFG.state_wal_truncate_bytes", 0):
+        report = initbot_state.maintain()
+    assert report.checkpoint_mode == "TRUNCATE"
+    assert report.wal_bytes_before > 0
+    assert report.wal_bytes == 0
+
+
+def test_maintain_reports_free_pages(initbot_state):
+    # Enough rows that the change log, which logs every delete, is at its cap and
+    # does not reuse the freed pages.
+    _fill(initbot_state, count=1000)
+    for cdi in initbot_state.characters.get_all():
+        initbot_state.characters.remove_and_store(cdi)
+    initbot_state.maintain()
+    assert initbot_state.maintain().free_bytes > 0
+
+
+def test_maintain_goes_through_the_connection_stats(tmp_path):
+    state = SqlState(f"sqlite:{tmp_path / 'test.db'}", statement_stats=True)
+    _fill(state, count=10)
+    writes = state.lock_stats().writes
+    state.maintain()
+    assert state.lock_stats().writes > writes
+    assert any("wal_checkpoint" in sql for sql in state.stats().statements)
+
+
+@pytest.mark.parametrize("source", ["sqlite::memory:", "memory:"])
+def test_maintain_without_wal_file(source):
+    assert create_state_from_source(source).maintain() is None
+
+
+def test_vacuum_into(initbot_state, tmp_path):
+    _fill(initbot_state)
+    for cdi in initbot_state.characters.get_all()[1:]:
+        initbot_state.characters.remove_and_store(cdi)
+    target = tmp_path / "compact.db"
+    initbot_state.vacuum_into(target)
+    assert target.stat().st_size < (tmp_path / "test.db").stat().st_size
+    copy = SqlState(f"sqlite:{target}")
+    assert [cdi.name for cdi in copy.characters.get_all()] == ["Char0000"]
+    with pytest.raises(FileExistsError):
+        initbot_state.vacuum_into(target)
+    conn = sqlite3.connect(target)
+    assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+    conn.close()
@@ -0,0 +1,261 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import json
+import time
+from dataclasses import replace
+from unittest.mock import MagicMock
+
+import pytest
+
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.factory import create_state_from_source
+from initbot_core.state.memory import _CHANGES_RETAINED, MemoryState
+
+
+@pytest.fixture(name="on_change")
+def _on_change():
+    return MagicMock()
+
+
+@pytest.fixture(name="state")
+def _state(on_change):
+    return create_state_from_source("memory:", on_change=on_change)
+
+
+def _add(state, name, player_id=1, **kwargs):
+    return state.characters.add_store_and_get(
+        NewCharacterData(name=name, player_id=player_id, **kwargs)
+    )
+
+
+def _contents(state):
+    """The snapshot of state, with rows in a fixed order."""
+    tables = state._shared.tables  # pylint: disable=protected-access
+    data = json.loads(json.dumps(tables.to_json()))
+    for table in ("characters", "players", "actions"):
+        data[table].sort(key=lambda row: json.dumps(row, sort_keys=True))
+    return data
+
+
+def test_factory_creates_memory_state(state):
+    assert isinstance(state, MemoryState)
+
+
+def test_characters(state):
+    mel = _add(state, "Mediocre Mel", initiative_dice="d20+1")
+    _add(state, "Brad")
+    assert state.characters.get_from_name("med") == mel
+    assert state.characters.get_from_name("MEDIOCRE MEL") == mel
+    with pytest.raises(ValueError, match="already exists"):
+        _add(state, "brad")
+    mel.initiative = 12
+    state.characters.update_and_store(mel)
+    assert state.characters.get_from_name("Mediocre Mel").initiative == 12
+    renamed = state.characters.rename_and_store(mel, "Marvellous Mel")
+    assert {cdi.name for cdi in state.characters.get_all()} == {
+        "Brad",
+        "Marvellous Mel",
+    }
+    state.characters.remove_and_store(renamed)
+    assert [cdi.name for cdi in state.characters.get_all()] == ["Brad"]
+
+
+def test_characters_hand_out_copies(state):
+    _add(state, "Mel").initiative = 20
+    state.characters.get_from_name("Mel").initiative = 20
+    assert state.characters.get_from_name("Mel").initiative is None
+
+
+def test_players(state, on_change):
+    alice = state.players.upsert_discord(discord_id=1, name="alice")
+    on_change.reset_mock()
+    assert state.players.upsert_discord(discord_id=1, name="alice") == alice
+    on_change.assert_not_called()
+    renamed = state.players.upsert_discord(discord_id=1, name="alice2")
+    assert renamed.id == alice.id
+    assert state.players.get_from_id(alice.id).name == "alice2"
+    assert state.players.get_from_discord_id(1) == renamed
+    assert state.players.get_from_discord_id(2) is None
+    assert state.players.upsert_standalone("ALICE2") == "taken"
+    bob = state.players.upsert_standalone("bob")
+    assert bob.id != alice.id
+    assert state.players.upsert_standalone("Bob") == bob
+    with pytest.raises(KeyError):
+        state.players.get_from_id(99)
+
+
+def test_actions(state):
+    _add(state, "Mel")
+    actions = state.character_actions
+    assert [actions.add("Mel", t) for t in "abc"] == [1, 2, 3]
+    actions.update("Mel", 2, "B")
+    actions.move("Mel", 3, 1)
+    assert actions.get_all_for_character("Mel") == ["c", "a", "B"]
+    actions.remove("Mel", 1)
+    with pytest.raises(IndexError, match=r"\(1-2\)"):
+        actions.update("Mel", 3, "x")
+    with pytest.raises(KeyError):
+        actions.add("Bob", "x")
+    state.characters.rename_and_store(state.characters.get_from_name("Mel"), "Max")
+    assert actions.get_all_for_characters(["Mel", "Max"]) == {
+        "Mel": [],
+        "Max": ["a", "B"],
+    }
+    state.characters.remove_and_store(state.characters.get_from_name("Max"))
+    assert not actions.get_all_for_character("Max")
+
+
+def test_login_tokens_and_session_secret(state):
+    token = state.web_login_tokens.create(discord_id=7)
+    assert state.web_login_tokens.find_valid(token) == 7
+    state.web_login_tokens.mark_used(token)
+    assert state.web_login_tokens.find_valid(token) is None
+    token = state.web_login_tokens.create(discord_id=8)
+    assert state.web_login_tokens.consume(token) == 8
+    assert state.web_login_tokens.consume(token) is None
+    secret = state.session_secret.get_or_rotate()
+    assert state.session_secret.get_or_rotate() == secret
+
+
+def test_prune_many(state):
+    _add(state, "OldMel", last_used=0)
+    _add(state, "NewMax")
+    state.character_actions.add("OldMel", "OldMel attacks at d20")
+    assert state.characters.prune_many(90) == ["OldMel"]
+    assert [cdi.name for cdi in state.characters.get_all()] == ["NewMax"]
+    assert not state.character_actions.get_all_for_character("OldMel")
+
+
+def test_transaction_rolls_back_and_notifies_once(state, on_change):
+    _add(state, "Mel")
+    revision = state.get_revision()
+    on_change.reset_mock()
+
+    def add_and_fail():
+        with state.transaction():
+            _add(state, "Max")
+            state.character_actions.add("Mel", "Mel attacks at d20")
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        add_and_fail()
+    assert [cdi.name for cdi in state.characters.get_all()] == ["Mel"]
+    assert not state.character_actions.get_all_for_character("Mel")
+    assert state.get_revision() == revision
+    on_change.assert_not_called()
+
+    with state.transaction():
+        _add(state, "Max")
+        _add(state, "Brad")
+    on_change.assert_called_once()
+
+
+def test_transaction_rolls_back_every_kind_of_write(state):
+    alice = state.players.upsert_discord(discord_id=1, name="alice")
+    mel = _add(state, "Mel", alice.id, initiative=1)
+    bob = _add(state, "Bob", alice.id)
+    for template in ("Mel attacks at d20", "Mel casts at d20+1"):
+        state.character_actions.add("Mel", template)
+    token = state.web_login_tokens.create(discord_id=1)
+    state.session_secret.get_or_rotate()
+    before = _contents(state)
+
+    def failing_inner_block():
+        with state.transaction():
+            state.characters.remove_and_store(bob)
+            raise ValueError("inner")
+
+    def failing_edit():
+        with state.transaction():
+            state.players.upsert_discord(discord_id=1, name="alicia")
+            state.players.upsert_discord(discord_id=2, name="bert")
+            state.players.upsert_standalone("carl")
+            state.characters.update_and_store(replace(mel, initiative=20))
+            state.character_actions.move("Mel", 1, 2)
+            state.character_actions.update("Mel", 1, "Mel hides")
+            state.characters.rename_and_store(mel, "Max")
+            with pytest.raises(ValueError, match="inner"):
+                failing_inner_block()
+            state.character_actions.add("Bob", "Bob runs")
+            state.web_login_tokens.consume(token)
+            state.web_login_tokens.create(discord_id=2)
+            state.session_secret._store("rotated", 0)  # pylint: disable=protected-access
+            raise RuntimeError("outer")
+
+    with pytest.raises(RuntimeError, match="outer"):
+        failing_edit()
+    assert _contents(state) == before
+    assert state.players.upsert_discord(discord_id=2, name="bert").id == alice.id + 1
+    assert state.characters.get_from_name("Mel").initiative == 1
+
+
+def test_get_changes_since(state):
+    mel = _add(state, "Mel")
+    revision = state.get_revision()
+    alice = state.players.upsert_discord(discord_id=1, name="alice")
+    state.characters.rename_and_store(mel, "Max")
+    changes = state.get_changes_since(revision)
+    assert changes.complete
+    assert changes.revision == state.get_revision()
+    assert changes.players == [alice]
+    assert changes.removed_characters == ["Mel"]
+    assert [cdi.name for cdi in changes.characters] == ["Max"]
+    assert state.get_changes_since(changes.revision).characters == []
+
+
+def test_changes_are_truncated(state):
+    revision = state.get_revision()
+    for i in range(_CHANGES_RETAINED + 10):
+        _add(state, f"Char{i:04}")
+    tables = state._shared.tables  # pylint: disable=protected-access
+    assert len(tables.changes) == _CHANGES_RETAINED
+    assert not state.get_changes_since(revision).complete
+    recent = state.get_changes_since(state.get_revision() - _CHANGES_RETAINED)
+    assert recent.complete
+    assert len(recent.characters) == _CHANGES_RETAINED
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "snapshot.json"
+    state = MemoryState(f"memory:{path}", snapshot_interval=0)
+    alice = state.players.upsert_discord(discord_id=1, name="alice")
+    _add(state, "Mel", player_id=alice.id)
+    state.character_actions.add("Mel", "Mel attacks at d20")
+    secret = state.session_secret.get_or_rotate()
+    revision = state.get_revision()
+    state.close()
+
+    reloaded = MemoryState(f"memory:{path}", snapshot_interval=0)
+    assert reloaded.characters.get_from_name("Mel").player_id == alice.id
+    assert reloaded.players.get_from_discord_id(1) == alice
+    assert reloaded.character_actions.get_all_for_character("Mel") == [
+        "Mel attacks at d20"
+    ]
+    assert reloaded.session_secret.get_or_rotate() == secret
+    assert reloaded.get_revision() == revision
+    assert not reloaded.get_changes_since(revision - 1).complete
+    assert reloaded.players.upsert_standalone("bob").id != alice.id
+
+
+def test_snapshots_are_written_periodically(tmp_path):
+    path = tmp_path / "snapshot.json"
+    state = MemoryState(f"memory:{path}", snapshot_interval=0.01)
+    _add(state, "Mel")
+
+    def snapshot_names():
+        if not path.exists():
+            return []
+        return [cdi["name"] for cdi in json.loads(path.read_text())["characters"]]
+
+    deadline = time.monotonic() + 5
+    while not snapshot_names() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert snapshot_names() == ["Mel"]
+    state.close()
+
+
+def test_snapshot_requires_existing_directory(tmp_path):
+    with pytest.raises(SystemExit):
+        MemoryState(f"memory:{tmp_path / 'missing' / 'snapshot.json'}")
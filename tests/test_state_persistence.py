@@ -2,14 +2,18 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
+import logging
 import sqlite3
 import time
+from operator import attrgetter
 
 import pytest
 
 from initbot_core.config import CORE_CFG
 from initbot_core.data.character import NewCharacterData
 from initbot_core.state.factory import create_state_from_source
+from initbot_core.state.sql import _MIGRATIONS
+from initbot_core.utils import PrefixIndex
 
 
 def test_add_character_and_retrieve(initbot_state):
@@ -116,3 +120,287 @@ def test_legacy_creation_time_migration_sqlite(tmp_path):
     expected_ts = int(time.time()) - CORE_CFG.prune_threshold_days * 86400 // 2
     assert chars[0].last_used is not None
     assert abs(chars[0].last_used - expected_ts) < 5
+
+
+def test_lookup_is_case_insensitive_and_prefers_exact_match(initbot_state):
+    player = initbot_state.players.upsert_discord(discord_id=1, name="alice")
+    for name in ("Foo", "FooBar"):
+        initbot_state.characters.add_store_and_get(
+            NewCharacterData(name=name, player_id=player.id)
+        )
+    assert initbot_state.characters.get_from_name("foo").name == "Foo"
+    assert initbot_state.characters.get_from_name("foob").name == "FooBar"
+    with pytest.raises(KeyError):
+        initbot_state.characters.get_from_name("f")
+
+
+def test_rename_to_name_differing_only_in_case_is_rejected(initbot_state):
+    player = initbot_state.players.upsert_discord(discord_id=1, name="alice")
+    initbot_state.characters.add_store_and_get(
+        NewCharacterData(name="Mel", player_id=player.id)
+    )
+    bob = initbot_state.characters.add_store_and_get(
+        NewCharacterData(name="Bob", player_id=player.id)
+    )
+    with pytest.raises(ValueError, match="already exists"):
+        initbot_state.characters.rename_and_store(bob, "MEL")
+    assert initbot_state.characters.get_from_name("mel").name == "Mel"
+
+
+def test_name_key_index_enforces_uniqueness(initbot_state):
+    player = initbot_state.players.upsert_discord(discord_id=1, name="alice")
+    initbot_state.characters.add_store_and_get(
+        NewCharacterData(name="Mel", player_id=player.id)
+    )
+    with pytest.raises(ValueError, match="already exists"):
+        # Bypass the Python-side check, as a concurrent writer would.
+        initbot_state.characters._add_store_and_get(  # pylint: disable=protected-access
+            NewCharacterData(name="MEL", player_id=player.id)
+        )
+
+
+def test_name_key_migration_populates_legacy_rows(tmp_path):
+    db_path = tmp_path / "test.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE _sqlcharacterdata (name TEXT NOT NULL PRIMARY KEY, player_id INTEGER,"
+        " initiative INTEGER, initiative_dice TEXT, last_used INTEGER);"
+    )
+    conn.execute(
+        "INSERT INTO _sqlcharacterdata (name, player_id) VALUES ('Ärger Ünd', 1);"
+    )
+    conn.commit()
+    conn.close()
+
+    state = create_state_from_source(f"sqlite:{db_path}")
+    assert state.characters.get_from_name("ärger").name == "Ärger Ünd"
+    conn = sqlite3.connect(db_path)
+    keys = conn.execute("SELECT name_key FROM _sqlcharacterdata").fetchall()
+    conn.close()
+    assert keys == [("ärger ünd",)]
+
+
+def test_name_key_migration_tolerates_legacy_case_duplicates(tmp_path):
+    db_path = tmp_path / "test.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE _sqlcharacterdata (name TEXT NOT NULL PRIMARY KEY, player_id INTEGER,"
+        " initiative INTEGER, initiative_dice TEXT, last_used INTEGER);"
+    )
+    conn.executemany(
+        "INSERT INTO _sqlcharacterdata (name, player_id) VALUES (?, 1);",
+        [("Mel",), ("mel",)],
+    )
+    conn.commit()
+    conn.close()
+
+    state = create_state_from_source(f"sqlite:{db_path}")
+    assert state.characters.get_from_name("mel").name == "mel"
+    with pytest.raises(KeyError):
+        state.characters.get_from_name("MEL")
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_per_player_queries(tmp_path, cache):
+    state = create_state_from_source(f"sqlite:{tmp_path / 'test.db'}", cache=cache)
+    alice = state.players.upsert_discord(discord_id=1, name="alice")
+    bob = state.players.upsert_discord(discord_id=2, name="bob")
+    for name, player in (("Mel", alice), ("Max", alice), ("Brad", bob)):
+        state.characters.add_store_and_get(
+            NewCharacterData(name=name, player_id=player.id)
+        )
+    assert [c.name for c in state.characters.get_all_for_player(alice.id)] == [
+        "Mel",
+        "Max",
+    ]
+    assert state.characters.get_from_player_id(bob.id).name == "Brad"
+    with pytest.raises(KeyError):
+        state.characters.get_from_player_id(alice.id)
+
+
+def test_per_player_query_uses_index(initbot_state):
+    plan = initbot_state._db.execute(  # pylint: disable=protected-access
+        "EXPLAIN QUERY PLAN SELECT name FROM _sqlcharacterdata WHERE player_id=?",
+        (1,),
+    ).fetchall()
+    assert any("_sqlcharacterdata_player_id" in row[-1] for row in plan)
+
+
+def _user_version(db_path):
+    conn = sqlite3.connect(db_path)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    return version
+
+
+def test_migrations_are_recorded_in_user_version(tmp_path):
+    db_path = tmp_path / "test.db"
+    create_state_from_source(f"sqlite:{db_path}")
+    assert _user_version(db_path) == len(_MIGRATIONS)
+
+
+def test_warm_start_applies_no_migrations(tmp_path, caplog):
+    db_path = tmp_path / "test.db"
+    state = create_state_from_source(f"sqlite:{db_path}")
+    state.characters.add_store_and_get(NewCharacterData(name="Mel", player_id=1))
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE _sqlcharacterdata SET last_used=NULL")
+    conn.commit()
+    conn.close()
+
+    with caplog.at_level(logging.INFO, logger="initbot_core.state.sql"):
+        state = create_state_from_source(f"sqlite:{db_path}")
+    assert "(0 schema migrations applied)" in caplog.text
+    # The legacy last_used backfill ran on the first start only.
+    assert state.characters.get_from_name("Mel").last_used is None
+
+
+def test_legacy_database_is_migrated_once(tmp_path, caplog):
+    db_path = tmp_path / "test.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE _sqlcharacterdata (name TEXT NOT NULL PRIMARY KEY, player_id INTEGER,"
+        " initiative INTEGER);"
+    )
+    conn.commit()
+    conn.close()
+
+    with caplog.at_level(logging.INFO, logger="initbot_core.state.sql"):
+        create_state_from_source(f"sqlite:{db_path}")
+    assert f"({len(_MIGRATIONS)} schema migrations applied)" in caplog.text
+    assert _user_version(db_path) == len(_MIGRATIONS)
+
+
+def test_newer_schema_version_is_reported(tmp_path, caplog):
+    db_path = tmp_path / "test.db"
+    create_state_from_source(f"sqlite:{db_path}")
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"PRAGMA user_version={len(_MIGRATIONS) + 1}")
+    conn.close()
+
+    create_state_from_source(f"sqlite:{db_path}")
+    assert "newer than this release supports" in caplog.text
+
+
+def test_records_are_slotted(initbot_state):
+    player = initbot_state.players.upsert_discord(discord_id=1, name="alice")
+    cdi = initbot_state.characters.add_store_and_get(
+        NewCharacterData(name="Mel", player_id=player.id)
+    )
+    assert not hasattr(cdi, "__dict__")
+    assert not hasattr(player, "__dict__")
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_iter_all_matches_get_all(tmp_path, cache):
+    state = create_state_from_source(f"sqlite:{tmp_path / 'test.db'}", cache=cache)
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    for name in ("Mel", "Bob", "Max"):
+        state.characters.add_store_and_get(
+            NewCharacterData(name=name, player_id=player.id)
+        )
+    chars = state.characters.iter_all()
+    assert next(chars).name in {"Mel", "Bob", "Max"}
+    # Writes while an iterator is open must not block or break it.
+    state.characters.add_store_and_get(
+        NewCharacterData(name="Kim", player_id=player.id)
+    )
+    chars.close()
+    by_name = attrgetter("name")
+    assert sorted(state.characters.iter_all(), key=by_name) == sorted(
+        state.characters.get_all(), key=by_name
+    )
+    assert list(state.players.iter_all()) == [player]
+
+
+@pytest.mark.parametrize(
+    ("source", "cache"),
+    [("sqlite", False), ("sqlite", True), ("memory", None)],
+)
+def test_pages_and_batched_iteration(tmp_path, source, cache):
+    state = create_state_from_source(
+        f"sqlite:{tmp_path / 'test.db'}" if source == "sqlite" else "memory:",
+        cache=cache,
+    )
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    state.players.upsert_standalone("bob")
+    names = ["Mel", "Bob", "Max", "Kim", "Ann"]
+    for name in names:
+        state.characters.add_store_and_get(
+            NewCharacterData(name=name, player_id=player.id)
+        )
+    state.scoped(7).characters.add_store_and_get(
+        NewCharacterData(name="Guildie", player_id=player.id)
+    )
+    characters = state.characters
+    assert [cdi.name for cdi in characters.page(None, 2)] == ["Ann", "Bob"]
+    assert [cdi.name for cdi in characters.page("Bob", 2)] == ["Kim", "Max"]
+    assert [cdi.name for cdi in characters.page("Max", 2)] == ["Mel"]
+    assert not characters.page("Mel", 2)
+    assert [cdi.name for cdi in characters.iter_all(batch_size=2)] == sorted(names)
+    # Keyset pages continue after a name even when it is removed in between.
+    batches = characters.iter_all(batch_size=2)
+    assert [next(batches).name, next(batches).name] == ["Ann", "Bob"]
+    characters.remove_and_store(characters.get_from_name("Bob"))
+    assert [cdi.name for cdi in batches] == ["Kim", "Max", "Mel"]
+    assert [p.name for p in state.players.page(None, 1)] == ["alice"]
+    assert [p.name for p in state.players.page(player.id, 5)] == ["bob"]
+    assert list(state.players.iter_all(batch_size=1)) == sorted(
+        state.players.get_all(), key=lambda p: p.id
+    )
+
+
+def test_character_pages_use_index(initbot_state):
+    plan = initbot_state._db.execute(  # pylint: disable=protected-access
+        "EXPLAIN QUERY PLAN SELECT name FROM _sqlcharacterdata"
+        " WHERE scope=? AND (name_key, name)>(?, ?) ORDER BY name_key, name LIMIT ?",
+        (0, "", "", 10),
+    ).fetchall()
+    assert any("_sqlcharacterdata_scope_key_name" in row[-1] for row in plan)
+    assert not any("TEMP B-TREE" in row[-1] for row in plan)
+
+
+@pytest.mark.parametrize(
+    ("source", "cache"),
+    [("sqlite", False), ("sqlite", True), ("memory", None)],
+)
+def test_pages_ignore_case_like_prefix_matches(tmp_path, source, cache):
+    state = create_state_from_source(
+        f"sqlite:{tmp_path / 'test.db'}" if source == "sqlite" else "memory:",
+        cache=cache,
+    )
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    for name in ("bob", "Ann", "Zed", "alex", "Bo"):
+        state.characters.add_store_and_get(
+            NewCharacterData(name=name, player_id=player.id)
+        )
+    assert [cdi.name for cdi in state.characters.iter_all(batch_size=2)] == [
+        "alex",
+        "Ann",
+        "Bo",
+        "bob",
+        "Zed",
+    ]
+    assert [cdi.name for cdi in state.characters.page("Ann", 2)] == ["Bo", "bob"]
+
+
+@pytest.mark.parametrize(("source", "cache"), [("sqlite", True), ("memory", None)])
+def test_pages_do_not_walk_the_roster(tmp_path, monkeypatch, source, cache):
+    state = create_state_from_source(
+        f"sqlite:{tmp_path / 'test.db'}" if source == "sqlite" else "memory:",
+        cache=cache,
+    )
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    for i in range(50):
+        state.characters.add_store_and_get(
+            NewCharacterData(name=f"Char{i:02}", player_id=player.id)
+        )
+    state.characters.page(None, 1)  # loads the cached roster
+
+    def walk(_index):
+        raise AssertionError("page() walked the whole roster")
+
+    monkeypatch.setattr(PrefixIndex, "__iter__", walk)
+    pages = list(state.characters.iter_all(batch_size=7))
+    assert [cdi.name for cdi in pages] == [f"Char{i:02}" for i in range(50)]
+    assert [p.name for p in state.players.page(None, 5)] == ["alice"]
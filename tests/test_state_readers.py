@@ -0,0 +1,88 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import sqlite3
+import threading
+
+import pytest
+
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.sql import SqlState
+
+
+@pytest.fixture(name="state")
+def _state(tmp_path):
+    return SqlState(f"sqlite:{tmp_path / 'test.db'}", readers=2)
+
+
+def _add(state, name):
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    return state.characters.add_store_and_get(
+        NewCharacterData(name=name, player_id=player.id)
+    )
+
+
+def _writer_statements(state):
+    statements: list[str] = []
+    state._db.set_trace_callback(statements.append)  # pylint: disable=protected-access
+    return statements
+
+
+def test_reads_do_not_use_writer(state):
+    _add(state, "Mel")
+    statements = _writer_statements(state)
+    assert state.characters.get_from_name("mel").name == "Mel"
+    assert [p.name for p in state.players.get_all()] == ["alice"]
+    assert not statements
+
+
+def test_readers_are_read_only(state):
+    _add(state, "Mel")
+    reader = state._connections._acquire()  # pylint: disable=protected-access
+    with pytest.raises(sqlite3.OperationalError):
+        reader.execute("DELETE FROM _sqlcharacterdata")
+
+
+def test_reads_inside_transaction_see_uncommitted_writes(state):
+    statements = _writer_statements(state)
+    with state.transaction():
+        _add(state, "Mel")
+        assert state.characters.get_from_name("Mel").name == "Mel"
+    assert any("SELECT" in s for s in statements)
+
+
+def test_other_threads_read_last_commit_during_transaction(state):
+    _add(state, "Mel")
+    added = threading.Event()
+    release = threading.Event()
+
+    def write():
+        with state.transaction():
+            _add(state, "Bob")
+            added.set()
+            release.wait(5)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        assert added.wait(5)
+        assert [c.name for c in state.characters.get_all()] == ["Mel"]
+    finally:
+        release.set()
+        writer.join()
+    assert {c.name for c in state.characters.get_all()} == {"Mel", "Bob"}
+
+
+def test_reads_fall_back_to_writer_without_readers(tmp_path):
+    state = SqlState(f"sqlite:{tmp_path / 'test.db'}", readers=0)
+    _add(state, "Mel")
+    statements = _writer_statements(state)
+    assert [c.name for c in state.characters.get_all()] == ["Mel"]
+    assert statements
+
+
+def test_in_memory_database_reads_from_writer():
+    state = SqlState("sqlite::memory:")
+    _add(state, "Mel")
+    assert [c.name for c in state.characters.get_all()] == ["Mel"]
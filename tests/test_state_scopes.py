@@ -0,0 +1,252 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import json
+import sqlite3
+import time
+from unittest.mock import patch
+
+import pytest
+
+from initbot_chat.commands.actions import actions_cmd
+from initbot_chat.commands.init import inis, init
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.factory import create_state_from_source
+from initbot_core.state.memory import MemoryState
+from initbot_core.state.sql import SqlState
+
+_GUILD = 999000000000000001
+
+
+@pytest.fixture(
+    name="state", params=["sqlite", "sqlite-cached", "memory"], ids=lambda p: p
+)
+def _state(request, tmp_path):
+    if request.param == "memory":
+        return create_state_from_source("memory:")
+    return SqlState(
+        f"sqlite:{tmp_path / 'test.db'}", cache=request.param == "sqlite-cached"
+    )
+
+
+def _add(state, name, **kwargs):
+    return state.characters.add_store_and_get(
+        NewCharacterData(name=name, player_id=1, **kwargs)
+    )
+
+
+def test_scopes_partition_characters(state):
+    _add(state, "Mel")
+    guild = state.scoped(_GUILD)
+    _add(guild, "Max")
+    assert state.scoped(0) is state
+    assert [cdi.name for cdi in state.characters.get_all()] == ["Mel"]
+    assert [cdi.name for cdi in guild.characters.iter_all()] == ["Max"]
+    assert guild.characters.get_from_name("M").name == "Max"
+    with pytest.raises(KeyError):
+        guild.characters.get_from_name("Mel")
+    assert [cdi.name for cdi in guild.characters.get_all_for_player(1)] == ["Max"]
+    assert guild.scoped(0) is state
+
+
+def test_same_name_in_two_scopes(state):
+    _add(state, "Mel", initiative=1)
+    guild = state.scoped(_GUILD)
+    _add(guild, "mel", initiative=2)
+    assert state.characters.get_from_name("Mel").initiative == 1
+    assert guild.characters.get_from_name("Mel").initiative == 2
+    state.character_actions.add("Mel", "Mel attacks at d20")
+    guild.character_actions.add("mel", "mel hides")
+    assert state.character_actions.get_all_for_character("Mel") == [
+        "Mel attacks at d20"
+    ]
+    assert guild.character_actions.get_all_for_character("mel") == ["mel hides"]
+    guild.characters.remove_and_store(guild.characters.get_from_name("mel"))
+    assert state.character_actions.get_all_for_character("Mel") == [
+        "Mel attacks at d20"
+    ]
+    assert not guild.character_actions.get_all_for_character("mel")
+
+
+def test_names_are_unique_within_a_scope(state):
+    guild = state.scoped(_GUILD)
+    _add(guild, "Mel")
+    with pytest.raises(ValueError, match="already exists"):
+        _add(guild, "mel")
+    max_ = _add(guild, "Max")
+    with pytest.raises(ValueError, match="already exists"):
+        guild.characters.rename_and_store(max_, "MEL")
+    _add(state, "Max")
+    guild.characters.rename_and_store(max_, "Kim")
+    assert state.characters.get_from_name("Max").name == "Max"
+
+
+def test_actions_stay_in_scope(state):
+    guild = state.scoped(_GUILD)
+    _add(guild, "Max")
+    with pytest.raises(KeyError):
+        state.character_actions.add("Max", "Max attacks at d20")
+    guild.character_actions.add("Max", "Max attacks at d20")
+    assert not state.character_actions.get_all_for_character("Max")
+    assert guild.character_actions.get_all_for_characters(["Max"]) == {
+        "Max": ["Max attacks at d20"]
+    }
+
+
+def test_writes_stay_in_scope(state):
+    mel = _add(state, "Mel")
+    guild = state.scoped(_GUILD)
+    mel.initiative = 12
+    guild.characters.update_and_store(mel)
+    guild.characters.remove_and_store(mel)
+    assert state.characters.get_from_name("Mel").initiative is None
+
+
+def test_prune_many_stays_in_scope(state):
+    _add(state, "OldMel", last_used=0)
+    guild = state.scoped(_GUILD)
+    _add(guild, "OldMax", last_used=0)
+    assert [cdi.name for cdi in guild.characters.find_prunable(90)] == ["OldMax"]
+    assert guild.characters.prune_many(90) == ["OldMax"]
+    assert [cdi.name for cdi in state.characters.get_all()] == ["OldMel"]
+
+
+def test_get_by_initiative(state):
+    now = int(time.time())
+    guild = state.scoped(_GUILD)
+    _add(guild, "Mel", initiative=5, last_used=now)
+    _add(guild, "Max", initiative=15, last_used=now)
+    _add(guild, "Old", initiative=20, last_used=now - 100)
+    _add(guild, "None", last_used=now)
+    _add(state, "Other", initiative=10, last_used=now)
+    assert [cdi.name for cdi in guild.characters.get_by_initiative(now - 10)] == [
+        "Max",
+        "Mel",
+    ]
+
+
+def test_changes_stay_in_scope(state):
+    _add(state, "Mel")
+    revision = state.get_revision()
+    guild = state.scoped(_GUILD)
+    max_ = _add(guild, "Max")
+    guild_mel = _add(guild, "Mel")
+    guild.characters.remove_and_store(guild_mel)
+    assert guild.get_revision() == state.get_revision()
+    changes = guild.get_changes_since(revision)
+    assert [cdi.name for cdi in changes.characters] == ["Max"]
+    assert changes.removed_characters == ["Mel"]
+    assert not state.get_changes_since(revision).removed_characters
+    revision = state.get_revision()
+    guild.characters.rename_and_store(max_, "Kim")
+    assert not state.get_changes_since(revision).characters
+    changes = guild.get_changes_since(revision)
+    assert [cdi.name for cdi in changes.characters] == ["Kim"]
+    assert changes.removed_characters == ["Max"]
+
+
+def test_scoped_transaction_rolls_back(state):
+    guild = state.scoped(_GUILD)
+
+    def add_and_fail():
+        with guild.transaction():
+            _add(guild, "Max")
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        add_and_fail()
+    assert not guild.characters.get_all()
+
+
+def test_migration_indexes_scopes(tmp_path):
+    db_path = tmp_path / "test.db"
+    create_state_from_source(f"sqlite:{db_path}").close()
+    conn = sqlite3.connect(db_path)
+    indexes = {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE tbl_name='_sqlcharacterdata'"
+        )
+    }
+    assert {
+        "_sqlcharacterdata_scope_name_key",
+        "_sqlcharacterdata_scope_initiative",
+    } <= indexes
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT name FROM _sqlcharacterdata"
+        " WHERE scope=? AND initiative IS NOT NULL AND last_used>?"
+        " ORDER BY initiative DESC",
+        (_GUILD, 0),
+    ).fetchall()
+    assert any("_sqlcharacterdata_scope_initiative" in row[-1] for row in plan)
+    assert not any("TEMP B-TREE" in row[-1] for row in plan)
+
+
+def test_snapshot_keeps_scopes(tmp_path):
+    path = tmp_path / "snapshot.json"
+    state = MemoryState(f"memory:{path}", snapshot_interval=0)
+    _add(state.scoped(_GUILD), "Mel")
+    state.scoped(_GUILD).character_actions.add("Mel", "Mel hides")
+    _add(state, "Mel")
+    state.close()
+    reloaded = MemoryState(f"memory:{path}", snapshot_interval=0)
+    guild = reloaded.scoped(_GUILD)
+    assert [cdi.name for cdi in guild.characters.get_all()] == ["Mel"]
+    assert guild.character_actions.get_all_for_character("Mel") == ["Mel hides"]
+    assert [cdi.name for cdi in reloaded.characters.get_all()] == ["Mel"]
+    assert not reloaded.character_actions.get_all_for_character("Mel")
+
+
+def test_snapshot_format_2_actions_follow_their_character(tmp_path):
+    path = tmp_path / "snapshot.json"
+    path.write_text(
+        json.dumps({
+            "format": 2,
+            "revision": 3,
+            "characters": [
+                {
+                    "name": "Max",
+                    "player_id": 1,
+                    "initiative": None,
+                    "initiative_dice": None,
+                    "last_used": 0,
+                    "scope": _GUILD,
+                }
+            ],
+            "players": [],
+            "actions": {"Max": ["Max hides"]},
+            "tokens": {},
+            "session_secret": None,
+        })
+    )
+    state = MemoryState(f"memory:{path}", snapshot_interval=0)
+    assert state.scoped(_GUILD).character_actions.get_all_for_character("Max") == [
+        "Max hides"
+    ]
+
+
+async def test_guild_scopes_in_chat_commands(mock_ctx, initbot_state):
+    with patch("initbot_chat.commands.utils.CORE_CFG") as cfg:
+        cfg.state_guild_scopes = True
+        await init.callback(mock_ctx, "Mel", "12")  # type: ignore[call-arg]
+        await inis.callback(mock_ctx)  # type: ignore[call-arg]
+    assert not initbot_state.characters.get_all()
+    guild = initbot_state.scoped(_GUILD)
+    assert guild.characters.get_from_name("Mel").initiative == 12
+    embed = mock_ctx.send.call_args.kwargs["embed"]
+    assert "**Mel**" in embed.description
+    assert mock_ctx.bot.last_inis_message[_GUILD].scope == _GUILD
+
+
+async def test_guild_scopes_in_action_commands(mock_ctx, initbot_state):
+    initbot_state.characters.add_store_and_get(
+        NewCharacterData(name="Mel", player_id=mock_ctx.author.player_id)
+    )
+    with patch("initbot_chat.commands.utils.CORE_CFG") as cfg:
+        cfg.state_guild_scopes = True
+        await init.callback(mock_ctx, "Mel", "12")  # type: ignore[call-arg]
+        await actions_cmd.callback(mock_ctx, "Mel", "add", "hides", "at", "d20")
+    guild = initbot_state.scoped(_GUILD)
+    assert guild.character_actions.get_all_for_character("Mel") == ["hides at d20"]
+    assert not initbot_state.character_actions.get_all_for_character("Mel")
@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import logging
+from unittest.mock import patch
+
+import pytest
+
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.factory import create_state_from_source
+from initbot_core.state.sql import SqlState
+from initbot_core.state.state import STATEMENT_LATENCY_BUCKETS
+
+
+@pytest.fixture(name="state")
+def _state(tmp_path):
+    return SqlState(f"sqlite:{tmp_path / 'test.db'}", statement_stats=True)
+
+
+def _add(state, name):
+    state.characters.add_store_and_get(NewCharacterData(name=name, player_id=1))
+
+
+def test_statements_are_off_by_default(initbot_state):
+    _add(initbot_state, "Mel")
+    stats = initbot_state.stats()
+    assert not stats.statements
+    assert stats.locks.writes > 0
+    assert stats.player_cache == initbot_state.players.cache_info()
+
+
+def test_statements_are_counted_per_template(state):
+    actions = state.character_actions
+    actions.get_all_for_characters(["Mel", "Max"])
+    actions.get_all_for_characters(["Mel", "Max", "Bob", "Ann"])
+    statements = state.stats().statements
+    templates = [t for t in statements if "IN (?, ...)" in t]
+    assert len(templates) == 1
+    stats = statements[templates[0]]
+    assert stats.calls == 2
+    assert len(stats.histogram) == len(STATEMENT_LATENCY_BUCKETS)
+    assert sum(stats.histogram) == 2
+    assert 0 < stats.max_seconds <= stats.total_seconds
+
+
+def test_writes_and_commits_are_counted(state):
+    with state.transaction():
+        _add(state, "Mel")
+    statements = state.stats().statements
+    assert statements["BEGIN IMMEDIATE;"].calls == 1
+    assert statements["COMMIT;"].calls == 1
+    assert any(t.startswith("INSERT INTO _sqlcharacterdata") for t in statements)
+
+
+def test_slow_statements_are_logged(tmp_path, caplog):
+    with patch("initbot_core.state.sql.CORE_CFG.state_slow_statement_ms", 0):
+        state = SqlState(f"sqlite:{tmp_path / 'test.db'}", statement_stats=True)
+    with caplog.at_level(logging.WARNING, logger="initbot_core.state.sql"):
+        state.characters.get_all()
+    assert "Slow SQL statement" in caplog.text
+    assert "FROM _sqlcharacterdata" in caplog.text
+
+
+def test_maintenance_is_reported_and_logs_top_statements(state, caplog):
+    _add(state, "Mel")
+    assert state.stats().maintenance is None
+    with caplog.at_level(logging.INFO, logger="initbot_core.state.sql"):
+        report = state.maintain()
+    assert state.stats().maintenance == report
+    assert "INSERT INTO _sqlcharacterdata" in caplog.text
+
+
+def test_scoped_and_memory_states(state):
+    _add(state, "Mel")
+    assert state.scoped(7).stats().statements == state.stats().statements
+    memory = create_state_from_source("memory:").stats()
+    assert not memory.statements
+    assert memory.maintenance is None
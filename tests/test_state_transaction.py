@@ -0,0 +1,167 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from initbot_chat.commands.character import prune
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.factory import create_state_from_source
+
+
+@pytest.fixture(name="on_change")
+def _on_change():
+    return MagicMock()
+
+
+@pytest.fixture(name="state", params=[False, True], ids=["uncached", "cached"])
+def _state(tmp_path, on_change, request):
+    return create_state_from_source(
+        f"sqlite:{tmp_path / 'test.db'}", on_change=on_change, cache=request.param
+    )
+
+
+def _add(state, name, player_id):
+    return state.characters.add_store_and_get(
+        NewCharacterData(name=name, player_id=player_id)
+    )
+
+
+def test_transaction_notifies_once_after_commit(state, on_change):
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    on_change.reset_mock()
+    with state.transaction():
+        mel = _add(state, "Mel", player.id)
+        _add(state, "Bob", player.id)
+        mel.initiative = 10
+        state.characters.update_and_store(mel)
+        on_change.assert_not_called()
+    on_change.assert_called_once()
+    assert {c.name for c in state.characters.get_all()} == {"Mel", "Bob"}
+
+
+def test_transaction_rolls_back_on_error(state, on_change):
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    mel = _add(state, "Mel", player.id)
+    on_change.reset_mock()
+
+    def failing_edit():
+        with state.transaction():
+            state.character_actions.add("Mel", "Mel attacks at d20")
+            state.characters.rename_and_store(mel, "Alex")
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        failing_edit()
+    on_change.assert_not_called()
+    assert [c.name for c in state.characters.get_all()] == ["Mel"]
+    assert state.characters.get_from_name("mel").name == "Mel"
+    assert not state.character_actions.get_all_for_character("Mel")
+
+
+def test_nested_transaction_rolls_back_only_inner_block(state, on_change):
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    on_change.reset_mock()
+
+    def failing_add():
+        with state.transaction():
+            _add(state, "Bob", player.id)
+            raise ValueError("boom")
+
+    with state.transaction():
+        _add(state, "Mel", player.id)
+        with pytest.raises(ValueError, match="boom"):
+            failing_add()
+    assert [c.name for c in state.characters.get_all()] == ["Mel"]
+    on_change.assert_called_once()
+
+
+def test_transaction_is_invisible_to_other_connections_until_commit(tmp_path):
+    db_path = tmp_path / "test.db"
+    state = create_state_from_source(f"sqlite:{db_path}")
+    other = create_state_from_source(f"sqlite:{db_path}")
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    with state.transaction():
+        _add(state, "Mel", player.id)
+        assert not other.characters.get_all()
+    assert [c.name for c in other.characters.get_all()] == ["Mel"]
+
+
+def test_other_threads_do_not_write_into_a_transaction(state):
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    in_transaction = threading.Event()
+
+    def write_from_other_thread():
+        in_transaction.wait()
+        _add(state, "Max", player.id)
+        with state.transaction():
+            _add(state, "Kim", player.id)
+
+    def failing_add():
+        with state.transaction():
+            _add(state, "Mel", player.id)
+            in_transaction.set()
+            # Give the other thread time to attempt its writes.
+            time.sleep(0.05)
+            raise RuntimeError("boom")
+
+    other = threading.Thread(target=write_from_other_thread)
+    other.start()
+    with pytest.raises(RuntimeError, match="boom"):
+        failing_add()
+    other.join()
+    assert sorted(c.name for c in state.characters.get_all()) == ["Kim", "Max"]
+    with state.transaction():
+        _add(state, "Ann", player.id)
+    assert len(state.characters.get_all()) == 3
+
+
+async def test_prune_notifies_once(mock_ctx):
+    on_change = MagicMock()
+    state = mock_ctx.bot.initbot_state
+    state._notifier._on_change = on_change  # pylint: disable=protected-access
+    with patch("initbot_core.state.sql.time") as m_sql:
+        m_sql.time.return_value = 0
+        for name in ("OldMel", "OldBob", "OldMax"):
+            _add(state, name, mock_ctx.author.player_id)
+            state.character_actions.add(name, f"{name} attacks at d20")
+    on_change.reset_mock()
+    player = state.players.get_from_id(mock_ctx.author.player_id)
+    with (
+        patch("initbot_core.data.character.time") as mock_t,
+        patch("initbot_chat.commands.character.sync_player", return_value=player),
+    ):
+        mock_t.time.return_value = int(time.time())
+        await prune.callback(mock_ctx)
+    assert not state.characters.get_all()
+    on_change.assert_called_once()
+
+
+def test_player_lookups_while_another_thread_runs_transactions(state):
+    player = state.players.upsert_discord(discord_id=1, name="alice")
+    stop = threading.Event()
+
+    def look_up():
+        while not stop.is_set():
+            state.players.get_from_id(player.id)
+
+    def upsert():
+        for i in range(200):
+            with state.transaction():
+                state.players.upsert_discord(discord_id=1, name=f"alice {i}")
+
+    threads = [
+        threading.Thread(target=look_up, daemon=True),
+        threading.Thread(target=upsert, daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    threads[1].join(10)
+    stop.set()
+    threads[0].join(10)
+    assert not any(thread.is_alive() for thread in threads)
+    assert state.players.get_from_id(player.id).name == "alice 199"
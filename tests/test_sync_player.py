@@ -4,6 +4,7 @@
 
 from unittest.mock import MagicMock
 
+from initbot_chat.commands.character import chars
 from initbot_chat.commands.utils import player_name, sync_player
 from initbot_core.data.character import NewCharacterData
 
@@ -53,3 +54,32 @@ def test_character_display_uses_player_name_when_available(initbot_state):
         NewCharacterData(name="Harold", player_id=player.id)
     )
     assert player_name(initbot_state, char) == "alice_display"
+
+
+async def test_read_only_command_does_not_write(mock_ctx):
+    state = mock_ctx.bot.initbot_state
+    state.characters.add_store_and_get(
+        NewCharacterData(name="Mel", player_id=mock_ctx.author.player_id)
+    )
+    on_change = MagicMock()
+    state._notifier._on_change = on_change  # pylint: disable=protected-access
+    writer = state._connections.writer  # pylint: disable=protected-access
+    changes = writer.total_changes
+    revision = state.get_revision()
+    await chars.callback(mock_ctx)
+    mock_ctx.send.assert_awaited()
+    assert writer.total_changes == changes
+    assert state.get_revision() == revision
+    on_change.assert_not_called()
+
+
+def test_sync_player_notifies_only_on_name_change(initbot_state):
+    on_change = MagicMock()
+    initbot_state._notifier._on_change = on_change  # pylint: disable=protected-access
+    sync_player(initbot_state, _make_ctx())
+    sync_player(initbot_state, _make_ctx())
+    initbot_state.players.discard_cache()
+    sync_player(initbot_state, _make_ctx())
+    assert on_change.call_count == 1
+    sync_player(initbot_state, _make_ctx(name="alice_renamed"))
+    assert on_change.call_count == 2
@@ -4,7 +4,11 @@
 
 import pytest
 
-from initbot_core.utils import get_exact_or_unique_prefix_match
+from initbot_core.utils import (
+    PrefixIndex,
+    get_exact_or_unique_prefix_match,
+    prefix_upper_bound,
+)
 
 
 def test_ci_exact_match_resolves_ambiguous_prefix() -> None:
@@ -40,3 +44,90 @@ def test_ambiguous_prefix_raises() -> None:
     candidates = ["foo", "Foo"]
     with pytest.raises(KeyError):
         get_exact_or_unique_prefix_match("fo", candidates, str)
+
+
+def test_prefix_match_error_messages() -> None:
+    with pytest.raises(KeyError) as exc_info:
+        get_exact_or_unique_prefix_match("bar", ["foo", "Fox"], str)
+    assert exc_info.value.args[0] == "Unable to find unique match for bar"
+    candidates = [f"Goblin {i:03}" for i in range(8)]
+    with pytest.raises(KeyError) as exc_info:
+        get_exact_or_unique_prefix_match("gob", candidates, str)
+    assert exc_info.value.args[0] == (
+        "Unable to find unique match for gob in"
+        " ['Goblin 000', 'Goblin 001', 'Goblin 002', 'Goblin 003', 'Goblin 004']"
+        " and 3 more"
+    )
+    with pytest.raises(KeyError) as exc_info:
+        get_exact_or_unique_prefix_match("f", ["foo", "Fox"], str)
+    assert exc_info.value.args[0].endswith("in ['foo', 'Fox']")
+
+
+def test_prefix_upper_bound_bounds_exactly_the_prefixed_strings() -> None:
+    bound = prefix_upper_bound("med")
+    assert bound == "mee"
+    assert "med" <= "mediocre mel" < bound
+
+
+def test_prefix_upper_bound_skips_max_code_point() -> None:
+    assert prefix_upper_bound("a\U0010ffff") == "b"
+    assert prefix_upper_bound("\U0010ffff") is None
+    assert prefix_upper_bound("") is None
+
+
+def test_prefix_upper_bound_skips_surrogates() -> None:
+    assert prefix_upper_bound("\ud7ff") == "\ue000"
+
+
+@pytest.mark.parametrize(
+    ("candidates", "query"),
+    [
+        (["Foo", "FooBar"], "foo"),
+        (["foo", "Foo"], "foo"),
+        (["foo", "bar"], "FOO"),
+        (["Mediocre Mel", "Brash Brad"], "med"),
+        (["foo", "Foo"], "fo"),
+        (["Mel", "Mo"], "x"),
+        (["Mel ", "mel"], "MEL"),
+        ([], "x"),
+    ],
+)
+def test_prefix_index_agrees_with_linear_match(candidates, query) -> None:
+    index = PrefixIndex(candidates)
+    try:
+        expected = get_exact_or_unique_prefix_match(query, candidates, str)
+    except KeyError:
+        with pytest.raises(KeyError):
+            index.match(query)
+    else:
+        assert index.match(query) == expected
+
+
+def test_prefix_index_incremental_updates() -> None:
+    index = PrefixIndex(["Mediocre Mel"])
+    index.insert("Medium Max")
+    with pytest.raises(KeyError):
+        index.match("med")
+    index.delete("Medium Max")
+    assert index.match("med") == "Mediocre Mel"
+    index.rename("Mediocre Mel", "Brash Brad")
+    assert index.match("b") == "Brash Brad"
+    assert list(index) == ["Brash Brad"]
+    assert index.get_normalized("brash brad") == "Brash Brad"
+
+
+def test_prefix_index_suggestions_are_bounded() -> None:
+    index = PrefixIndex([f"Goblin {i:03}" for i in range(500)], max_suggestions=3)
+    with pytest.raises(KeyError) as exc_info:
+        index.match("gob")
+    assert "Goblin 000, Goblin 001, Goblin 002?" in str(exc_info.value)
+    assert index.suggest("zzz") == ["Goblin 497", "Goblin 498", "Goblin 499"]
+    assert index.suggest("Goblin 250x") == ["Goblin 250", "Goblin 251", "Goblin 252"]
+
+
+def test_prefix_index_pages_start_after_any_string() -> None:
+    index = PrefixIndex(["bob", "Ann", "Zed", "alex", "Bo"])
+    assert index.page(None, 2) == ["alex", "Ann"]
+    assert index.page("Ann", 2) == ["Bo", "bob"]
+    assert index.page("b", 10) == ["Bo", "bob", "Zed"]
+    assert index.page("Zed", 10) == []
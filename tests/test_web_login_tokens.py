@@ -3,10 +3,12 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
 from initbot_core.state.factory import create_state_from_source
+from initbot_core.state.sql import SqlState
 
 
 @pytest.fixture(name="token_state")
@@ -54,3 +56,43 @@ def test_prune_expired_removes_old_tokens(token_state, monkeypatch):
 
     # Token should be gone (find_valid returns None on missing too, but mark_used would KeyError)
     assert token_state.web_login_tokens.find_valid(token) is None
+
+
+def test_consume_returns_discord_id_once(token_state):
+    token = token_state.web_login_tokens.create(discord_id=303)
+    assert token_state.web_login_tokens.consume(token) == 303
+    assert token_state.web_login_tokens.consume(token) is None
+    assert token_state.web_login_tokens.find_valid(token) is None
+
+
+def test_consume_unknown_or_expired_token_returns_none(token_state, monkeypatch):
+    assert token_state.web_login_tokens.consume("no-such-token") is None
+    token = token_state.web_login_tokens.create(discord_id=404)
+    future = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: future)
+    assert token_state.web_login_tokens.consume(token) is None
+
+
+def test_concurrent_consume_succeeds_once(token_state):
+    token = token_state.web_login_tokens.create(discord_id=505)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(token_state.web_login_tokens.consume, [token] * 8))
+    assert results.count(505) == 1
+    assert results.count(None) == 7
+
+
+def test_spent_tokens_are_answered_from_memory(tmp_path):
+    state = SqlState(f"sqlite:{tmp_path / 'test.db'}", statement_stats=True)
+    token = state.web_login_tokens.create(discord_id=606)
+    state.web_login_tokens.consume(token)
+    calls = sum(stats.calls for stats in state.stats().statements.values())
+    assert state.web_login_tokens.find_valid(token) is None
+    assert state.web_login_tokens.consume(token) is None
+    assert sum(stats.calls for stats in state.stats().statements.values()) == calls
+
+
+def test_prune_expired_uses_index(token_state):
+    plan = token_state._db.execute(  # pylint: disable=protected-access
+        "EXPLAIN QUERY PLAN DELETE FROM _sqlweblogintoken WHERE expires_at<=?", (0,)
+    ).fetchall()
+    assert any("_sqlweblogintoken_expires_at" in row[-1] for row in plan)
@@ -0,0 +1,25 @@
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import asyncio
+import sqlite3
+from unittest.mock import MagicMock
+
+import pytest
+
+from initbot_web.app import _state_maintenance
+
+
+async def test_web_app_runs_maintenance_periodically():
+    state = MagicMock()
+    task = asyncio.create_task(_state_maintenance(state, 0.001))
+    while state.maintain.call_count < 2:
+        await asyncio.sleep(0.001)
+    state.maintain.side_effect = sqlite3.OperationalError("database is locked")
+    calls = state.maintain.call_count
+    while state.maintain.call_count < calls + 2:
+        await asyncio.sleep(0.001)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
@@ -3,11 +3,13 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
 import socket
+import threading
 import time
 
 import pytest
 from starlette.testclient import TestClient
 
+import initbot_core.config as core_config
 import initbot_core.state.state as state_module
 import initbot_web.routes.tracker as tracker_module
 from initbot_core.data.character import CharacterData, NewCharacterData
@@ -36,6 +38,7 @@ from initbot_web.routes.tracker import (
     _resolve_player_name,
     _safe_dice,
     _safe_int,
+    _sync_snapshot,
 )
 
 
@@ -990,3 +993,75 @@ def test_web_notifies_chat_bot_on_state_change(tmp_path):
             )
         data, _ = sock.recvfrom(16)
         assert data == b""
+
+
+def test_routes_work_with_state_worker_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(core_config.CORE_CFG, "state_worker_thread", True)
+    app, state, _ = _make_app_with_dice(tmp_path, "d6")
+    with TestClient(app, follow_redirects=False) as client:
+        assert "initbot-state" in {t.name for t in threading.enumerate()}
+        client.post("/testsecret/join/", data={"name": "Tester"})
+        resp = client.post("/testsecret/tracker/roll-initiative/Aldric")
+        assert resp.status_code in (200, 204)
+        assert state.characters.get_from_name("Aldric").initiative is not None
+        resp = client.post("/testsecret/tracker/delete-character/Aldric")
+        assert resp.status_code in (200, 204)
+        assert not state.characters.get_all()
+
+
+def test_sync_snapshot_applies_changes_and_reloads_when_needed(tmp_path):
+    state = create_state_from_source(f"sqlite:{tmp_path / 'test.db'}")
+    player = state.players.upsert_discord(discord_id=99, name="Alice")
+    state.characters.add_store_and_get(
+        NewCharacterData(name="Aldric", player_id=player.id)
+    )
+    chars_by_name: dict = {}
+    players_by_id: dict = {}
+    revision = _sync_snapshot(state, None, chars_by_name, players_by_id)
+    assert list(chars_by_name) == ["Aldric"]
+    assert list(players_by_id) == [player.id]
+
+    aldric = state.characters.get_from_name("Aldric")
+    state.characters.rename_and_store(aldric, "Brienne")
+    revision = _sync_snapshot(state, revision, chars_by_name, players_by_id)
+    assert list(chars_by_name) == ["Brienne"]
+    assert revision == state.get_revision()
+
+    chars_by_name["Stale"] = aldric
+    _sync_snapshot(state, -1, chars_by_name, players_by_id)
+    assert list(chars_by_name) == ["Brienne"]
+
+
+def test_sync_snapshot_reads_during_another_threads_transaction(tmp_path):
+    state = create_state_from_source(f"sqlite:{tmp_path / 'test.db'}")
+    player = state.players.upsert_discord(discord_id=99, name="Alice")
+    state.characters.add_store_and_get(
+        NewCharacterData(name="Aldric", player_id=player.id)
+    )
+    chars_by_name: dict = {}
+    players_by_id: dict = {}
+    revision = _sync_snapshot(state, None, chars_by_name, players_by_id)
+    in_transaction = threading.Event()
+    release = threading.Event()
+
+    def write():
+        with state.transaction():
+            state.characters.add_store_and_get(
+                NewCharacterData(name="Brienne", player_id=player.id)
+            )
+            in_transaction.set()
+            release.wait(5)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        assert in_transaction.wait(5)
+        started = time.monotonic()
+        _sync_snapshot(state, revision, chars_by_name, players_by_id)
+        assert time.monotonic() - started < 1
+        assert list(chars_by_name) == ["Aldric"]
+    finally:
+        release.set()
+        writer.join()
+    _sync_snapshot(state, revision, chars_by_name, players_by_id)
+    assert sorted(chars_by_name) == ["Aldric", "Brienne"]
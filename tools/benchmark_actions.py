@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+"""Measure adding and listing character actions on a large action table.
+
+Runs against a scratch database holding --actions stored actions, once with and
+once without the (character_id, position) index, and compares per-character
+listing with the batched get_all_for_characters().
+
+Run with: uv run tools/benchmark_actions.py [--actions 50000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.sql import SqlState
+
+
+def _best_seconds(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _populate(state: SqlState, actions: int, per_character: int) -> list[str]:
+    player = state.players.upsert_discord(discord_id=1, name="bench")
+    names = [f"Char{i:06}" for i in range(actions // per_character)]
+    with state.transaction():
+        for name in names:
+            state.characters.add_store_and_get(
+                NewCharacterData(name=name, player_id=player.id)
+            )
+            for position in range(per_character):
+                state.character_actions.add(name, f"{name} attacks at d20+{position}")
+    return names
+
+
+def _report(label: str, seconds: float, operations: int) -> None:
+    per_operation = seconds / operations
+    print(
+        f"  {label:<36} {per_operation * 1000:9.3f} ms {1 / per_operation:12,.0f} ops/s"
+    )
+
+
+def _benchmark(state: SqlState, names: list[str], repeat: int) -> None:
+    actions = state.character_actions
+    sample = names[:: max(1, len(names) // 100)]
+    counter = iter(range(10**9))
+
+    def add() -> None:
+        with state.transaction():
+            for name in sample:
+                actions.add(name, f"bench {next(counter)}")
+
+    def list_each() -> None:
+        for name in sample:
+            actions.get_all_for_character(name)
+
+    def list_batched() -> None:
+        actions.get_all_for_characters(sample)
+
+    for label, fn in (
+        ("add()", add),
+        ("get_all_for_character() per name", list_each),
+        ("get_all_for_characters() batched", list_batched),
+    ):
+        _report(label, _best_seconds(fn, repeat), len(sample))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--actions", type=int, default=50_000)
+    parser.add_argument("--per-character", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        state = SqlState(f"sqlite:{Path(tmp) / 'bench.db'}", cache=False)
+        names = _populate(state, args.actions, args.per_character)
+        print(f"{args.actions:,} actions, per operation, with index")
+        _benchmark(state, names, args.repeat)
+        state._db.execute(  # pylint: disable=protected-access
+            "DROP INDEX _sqlcharacteraction_position"
+        )
+        print(f"{args.actions:,} actions, per operation, without index")
+        _benchmark(state, names, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
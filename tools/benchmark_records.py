@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+"""Measure memory use and throughput of character records and roster reads.
+
+Compares slotted CharacterData against an equivalent dict-backed dataclass, and
+SqlState.characters.get_all() against the lazy iter_all() on a scratch database.
+
+Run with: uv run tools/benchmark_records.py [--sizes 10000 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from initbot_core.data.character import CharacterData
+from initbot_core.state.sql import SqlState
+
+
+@dataclass
+class _DictCharacterData:
+    """CharacterData as it was before slots=True, for comparison."""
+
+    name: str
+    player_id: int
+    initiative: int | None = None
+    initiative_dice: str | None = None
+    last_used: int | None = None
+
+
+def _peak_bytes(fn: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def _best_seconds(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _populate(state: SqlState, size: int) -> None:
+    player = state.players.upsert_discord(discord_id=1, name="bench")
+    with state.transaction():
+        state._db.executemany(  # pylint: disable=protected-access
+            "INSERT INTO _sqlcharacterdata"
+            " (name, player_id, initiative, initiative_dice, last_used, name_key)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    f"Char{i:06}",
+                    player.id,
+                    i % 20,
+                    "d20+1",
+                    1_700_000_000,
+                    f"char{i:06}",
+                )
+                for i in range(size)
+            ),
+        )
+
+
+def _report(label: str, seconds: float, peak: int, size: int) -> None:
+    print(
+        f"  {label:<34} {seconds * 1000:9.1f} ms"
+        f" {size / seconds:12,.0f} rows/s {peak / 1024 / 1024:9.1f} MiB peak"
+    )
+
+
+def _benchmark(size: int, repeat: int) -> None:
+    print(f"{size:,} characters")
+    rows = [(f"Char{i:06}", 1, i % 20, "d20+1", 1_700_000_000) for i in range(size)]
+    for label, cls in (
+        ("dict-backed records", _DictCharacterData),
+        ("slotted records", CharacterData),
+    ):
+        _report(
+            label,
+            _best_seconds(lambda cls=cls: [cls(*row) for row in rows], repeat),
+            _peak_bytes(lambda cls=cls: [cls(*row) for row in rows]),
+            size,
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state = SqlState(f"sqlite:{Path(tmp) / 'bench.db'}", cache=False)
+        _populate(state, size)
+
+        def scan_list() -> int:
+            return sum(1 for cdi in state.characters.get_all() if cdi.initiative)
+
+        def scan_iter() -> int:
+            return sum(1 for cdi in state.characters.iter_all() if cdi.initiative)
+
+        for label, fn in (
+            ("get_all() then filter", scan_list),
+            ("iter_all() streaming filter", scan_iter),
+        ):
+            _report(label, _best_seconds(fn, repeat), _peak_bytes(fn), size)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for size in args.sizes:
+        _benchmark(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2026 Stefan Götz <github.nooneelse@spamgourmet.com>
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+"""Measure how the state layer scales with synthetic rosters of 1k to 100k characters.
+
+Seeds each backend with --sizes characters, a tenth as many players and as many
+actions as characters, then times name lookups, character writes alone and in a
+committed or rolled back transaction, pruning, action and player operations. The in-memory data store ("memory") is the baseline that
+the SQLite backends are compared against.
+
+A table goes to stderr and the results as JSON to stdout or --output, so that runs
+on different commits can be compared.
+
+Run with: uv run tools/benchmark_state.py --output before.json
+          uv run tools/benchmark_state.py --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, suppress
+from pathlib import Path
+from typing import Any, Final
+
+from initbot_core.data.character import NewCharacterData
+from initbot_core.state.memory import MemoryState
+from initbot_core.state.sql import SqlState
+from initbot_core.state.state import State
+
+_BACKENDS: Final[tuple[str, ...]] = (
+    "memory",
+    "sqlite",
+    "sqlite-memory",
+    "sqlite-cached",
+)
+_DAY: Final[int] = 24 * 60 * 60
+_PRUNE_THRESHOLD_DAYS: Final[int] = 90
+_ACTIONS_PER_CHARACTER: Final[int] = 5
+
+
+class _Rollback(Exception):
+    """Raised to roll back a timed transaction."""
+
+
+def _name(i: int) -> str:
+    # The "son" suffix makes every name minus the suffix a unique prefix.
+    return f"Char{i:06}son"
+
+
+@contextmanager
+def _open(backend: str) -> Iterator[State]:
+    with tempfile.TemporaryDirectory() as tmp:
+        if backend == "memory":
+            state: State = MemoryState("memory:", snapshot_interval=0)
+        elif backend == "sqlite-memory":
+            state = SqlState("sqlite::memory:", cache=False)
+        else:
+            state = SqlState(
+                f"sqlite:{Path(tmp) / 'bench.db'}", cache=backend == "sqlite-cached"
+            )
+        try:
+            yield state
+        finally:
+            state.close()
+
+
+def _seed(state: State, size: int) -> None:
+    """Add size characters, a tenth as many players and size actions.
+
+    Every tenth character was last used long enough ago to be pruned.
+    """
+    now = int(time.time())
+    with state.transaction():
+        players = [
+            state.players.upsert_discord(discord_id=i + 1, name=f"player{i}").id
+            for i in range(max(1, size // 10))
+        ]
+        for i in range(size):
+            state.characters.add_store_and_get(
+                NewCharacterData(
+                    name=_name(i),
+                    player_id=players[i % len(players)],
+                    initiative=i % 20,
+                    last_used=now - (200 * _DAY if i % 10 == 0 else 0),
+                )
+            )
+        for i in range(size):
+            name = _name(i // _ACTIONS_PER_CHARACTER)
+            state.character_actions.add(name, f"{name} attacks at d20+{i}")
+
+
+def _best_per_call(fn: Callable[[], object], calls: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, (time.perf_counter() - started) / calls)
+    return best
+
+
+def _operations(
+    state: State, size: int, rng: random.Random
+) -> list[tuple[str, Callable[[], object], int]]:
+    """(name, one call, calls per run) of every timed operation, in running order.
+
+    Operations that write use fresh names from a counter, so that repeated runs do
+    the same amount of work.
+    """
+    characters = state.characters
+    actions = state.character_actions
+    players = state.players
+    counter = itertools.count()
+    added: list[Any] = []
+    acted_on: list[str] = []
+    acted = max(1, size // _ACTIONS_PER_CHARACTER)
+    player_count = max(1, size // 10)
+
+    def get_exact() -> object:
+        return characters.get_from_name(_name(rng.randrange(size)))
+
+    def get_prefix() -> object:
+        return characters.get_from_name(_name(rng.randrange(size))[:-3])
+
+    def get_miss() -> object:
+        try:
+            return characters.get_from_name(f"Nobody{rng.randrange(size)}")
+        except KeyError:
+            return None
+
+    def add() -> object:
+        new = characters.add_store_and_get(
+            NewCharacterData(name=f"New{next(counter):07}", player_id=1)
+        )
+        added.append(new)
+        return new
+
+    def update() -> None:
+        character = characters.get_from_name(_name(rng.randrange(size)))
+        character.initiative = rng.randrange(20)
+        characters.update_and_store(character)
+
+    def rename() -> object:
+        return characters.rename_and_store(added.pop(), f"Renamed{next(counter):07}")
+
+    def update_in_transaction() -> None:
+        with state.transaction():
+            update()
+
+    def update_rolled_back() -> None:
+        with suppress(_Rollback), state.transaction():
+            update()
+            raise _Rollback
+
+    def find_prunable() -> object:
+        return characters.find_prunable(_PRUNE_THRESHOLD_DAYS)
+
+    def list_actions() -> object:
+        return actions.get_all_for_character(_name(rng.randrange(acted)))
+
+    def add_action() -> object:
+        name = _name(rng.randrange(acted))
+        acted_on.append(name)
+        return actions.add(name, "bench at d20")
+
+    def remove_action() -> None:
+        # From a character that add_action() added to, so that small sizes do not
+        # run out of actions.
+        actions.remove(acted_on.pop(), 1)
+
+    def get_player() -> object:
+        return players.get_from_id(rng.randrange(player_count) + 1)
+
+    def upsert_player() -> object:
+        i = rng.randrange(player_count)
+        return players.upsert_discord(discord_id=i + 1, name=f"player{i}")
+
+    return [
+        ("characters.get_from_name exact", get_exact, 200),
+        ("characters.get_from_name prefix", get_prefix, 200),
+        ("characters.get_from_name miss", get_miss, 200),
+        ("characters.add_store_and_get", add, 100),
+        ("characters.update_and_store", update, 100),
+        ("characters.rename_and_store", rename, 100),
+        ("transaction update_and_store", update_in_transaction, 100),
+        ("transaction update_and_store rolled back", update_rolled_back, 100),
+        ("characters.find_prunable", find_prunable, 3),
+        ("character_actions.get_all_for_character", list_actions, 200),
+        ("character_actions.add", add_action, 100),
+        ("character_actions.remove", remove_action, 100),
+        ("players.get_from_id", get_player, 200),
+        ("players.upsert_discord unchanged", upsert_player, 200),
+    ]
+
+
+def _benchmark(backend: str, size: int, repeat: int) -> list[dict[str, Any]]:
+    results = []
+
+    def record(operation: str, seconds: float, calls: int) -> None:
+        results.append({
+            "backend": backend,
+            "size": size,
+            "operation": operation,
+            "calls": calls,
+            "us_per_call": round(seconds * 1e6, 3),
+        })
+
+    with _open(backend) as state:
+        started = time.perf_counter()
+        _seed(state, size)
+        record("seed", time.perf_counter() - started, 1)
+        rng = random.Random(size)  # seeded, so that every run does the same calls
+        for operation, fn, calls in _operations(state, size, rng):
+            record(operation, _best_per_call(fn, calls, repeat), calls)
+        # Destructive, so timed once: removes every tenth character and its actions.
+        started = time.perf_counter()
+        state.characters.prune_many(_PRUNE_THRESHOLD_DAYS)
+        record("characters.prune_many", time.perf_counter() - started, 1)
+    return results
+
+
+def _print_table(results: list[dict[str, Any]], baseline: dict[tuple, float]) -> None:
+    """Print times per call, relative to the memory backend and to the baseline run."""
+    memory = {
+        (r["size"], r["operation"]): r["us_per_call"]
+        for r in results
+        if r["backend"] == "memory"
+    }
+    print(
+        f"{'backend':<14} {'size':>7} {'operation':<42} {'per call':>15}"
+        f" {'/memory':>8} {'/compare':>8}",
+        file=sys.stderr,
+    )
+    for result in results:
+        us_per_call = result["us_per_call"]
+        line = (
+            f"{result['backend']:<14} {result['size']:>7,} {result['operation']:<42}"
+            f" {us_per_call:>12,.1f} us"
+        )
+        for reference in (
+            memory.get((result["size"], result["operation"])),
+            baseline.get((result["backend"], result["size"], result["operation"])),
+        ):
+            line += f" {us_per_call / reference:7.2f}x" if reference else " " * 9
+        print(line.rstrip(), file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=_BACKENDS,
+        default=["memory", "sqlite", "sqlite-memory"],
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--output", type=Path, help="write the JSON results here instead of stdout"
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        help="JSON results of an earlier run; print each time relative to it",
+    )
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        baseline = {
+            (r["backend"], r["size"], r["operation"]): r["us_per_call"]
+            for r in json.loads(args.compare.read_text(encoding="utf-8"))["results"]
+        }
+    results = []
+    for size in args.sizes:
+        for backend in args.backends:
+            results.extend(_benchmark(backend, size, args.repeat))
+    _print_table(results, baseline)
+    report = json.dumps(
+        {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "repeat": args.repeat,
+            "results": results,
+        },
+        indent=2,
+    )
+    if args.output:
+        args.output.write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()